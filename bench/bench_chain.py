@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# bench_chain.py
+"""Compare merging the matches of an index chain: the sorted union of every
+index's matches, as matchPaths() used to, and the lazy heap merge of each
+index's ranked matches.
+
+Writes a chain of K synthetic indices of N entries each (see bench_rank),
+nested under a temp dir, and times matchPaths() on the innermost for a broad
+pattern, fully ranked and with limit=1 as for `to <pattern> 0`.  The union
+re-sorts every match at each level of the chain; the merge takes each
+index's matches in rank order, and with a limit reads only the top of each.
+
+    python3 bench/bench_chain.py [N] [K]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import navdex_core  # noqa: E402
+from bench_rank import timed, writeIndex  # noqa: E402
+from setutils import IndexedSet  # noqa: E402
+
+
+def unionSorted(ix, patterns, fullDirname=False, limit=None):
+    """ matchPaths() as it was: sort the union at every level """
+    ranked = sorted(ix.iterMatches(patterns, fullDirname, limit), key=navdex_core.rankKey)[:limit]
+    if ix.outer is not None:
+        pp = unionSorted(ix.outer, patterns, True, limit)
+        ranked = sorted(IndexedSet(ranked).union(pp), key=navdex_core.rankKey)[:limit]
+    return ranked
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = [os.path.join(tmp, *["d%d" % j for j in range(i)]) for i in range(k)]
+        for d in dirs:
+            os.makedirs(d, exist_ok=True)
+            writeIndex(os.path.join(d, ".navdex-index"), n)
+        os.environ["HOME"] = tmp
+        navdex_core.file_sys_root = "/"
+        ix = navdex_core.loadIndex(dirs[-1], True)
+        ix.matchPaths(["*"])  # Write the rank sidecars
+        print("chain of %d indices of %d entries" % (k, n))
+        for pattern in ("*core4*", "*a*"):
+            for limit in (None, 1):
+                assert ix.matchPaths([pattern], limit=limit) == unionSorted(ix, [pattern], limit=limit)
+                union = timed(lambda: unionSorted(ix, [pattern], limit=limit))
+                merged = timed(lambda: ix.matchPaths([pattern], limit=limit))
+                count = len(ix.matchPaths([pattern]))
+                print("%-10s limit=%-4s %7d matches: union %6.3fs, merge %6.3fs"
+                      % (pattern, limit, count, union, merged))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# bench_gitindex.py
+"""Compare re-indexing a git checkout by walking it (`to --scan`) and from its
+.git/index (`to --scan --git`).
+
+Builds a synthetic checkout of N dirs, with 3 files in each (see bench_scan),
+and writes a .git/index listing every file, in index format 2 or 4.  It then
+times collecting every dir both ways.  Reading the index is one file read
+however many dirs there are; walking is a scandir per dir.  With --cold, the
+page cache is dropped before each (needs root), so the walk waits on the disk
+for each dir, as when re-indexing a tree not visited lately.
+
+    python3 bench/bench_gitindex.py [N] [VERSION] [--cold]
+"""
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from bench_scan import buildTree  # noqa: E402
+from navdex_scan import TreeScanner  # noqa: E402
+
+
+def writeIndex(root: str, version: int) -> int:
+    """ Write root/.git/index listing the files below root.  Returns its size. """
+    paths = []
+    for r, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d != ".git"]
+        rel = os.path.relpath(r, root)
+        paths.extend(f if rel == "." else rel + "/" + f for f in files)
+    paths = sorted(p.encode() for p in paths)
+    out = [struct.pack(">4sII", b"DIRC", version, len(paths))]
+    prev = b""
+    for path in paths:
+        entry = struct.pack(">10I", 0, 0, 0, 0, 0, 0, 0o100644, 0, 0, 0) + b"\0" * 20
+        entry += struct.pack(">H", min(len(path), 0xfff))
+        if version == 4:
+            common = len(os.path.commonprefix([prev, path]))
+            entry += bytes([len(prev) - common]) + path[common:] + b"\0"  # Drops < 128 here
+        else:
+            entry += path + b"\0" * (8 - (len(entry) + len(path)) % 8)
+        out.append(entry)
+        prev = path
+    os.makedirs(os.path.join(root, ".git"), exist_ok=True)
+    data = b"".join(out) + b"\0" * 20  # The checksum isn't checked
+    with open(os.path.join(root, ".git", "index"), "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def dropCaches(cold: bool) -> None:
+    if cold:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+
+
+def main():
+    cold = "--cold" in sys.argv
+    args = [a for a in sys.argv[1:] if a != "--cold"]
+    n = int(args[0]) if len(args) > 0 else 100000
+    version = int(args[1]) if len(args) > 1 else 2
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        buildTree(tmp, n)
+        size = writeIndex(tmp, version)
+        print("built %d dirs and a %.1fMB v%d index in %.1fs" % (n, size / 1e6, version, time.perf_counter() - t0))
+        TreeScanner(tmp).scan()  # Warm the cache
+        dropCaches(cold)
+        t0 = time.perf_counter()
+        walked = TreeScanner(tmp).scan()
+        walkTime = time.perf_counter() - t0
+        dropCaches(cold)
+        t0 = time.perf_counter()
+        scanner = TreeScanner(tmp, gitIndex=True)
+        indexed = scanner.scan()
+        indexTime = time.perf_counter() - t0
+        assert walked == indexed and scanner.repos == [tmp]
+        print("walk:       %6.2fs (%d dirs)" % (walkTime, len(walked)))
+        print("git index:  %6.2fs" % indexTime)
+
+
+if __name__ == "__main__":
+    main()
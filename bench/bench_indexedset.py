@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# bench_indexedset.py
+"""Time IndexedSet's positional access after deletions.
+
+Removed items leave gaps in an IndexedSet until it compacts.  Each workload
+starts from N items and removes or pops some, then reads by position:
+
+- getitem:  remove 10% at random, then index at random positions
+- index:    the same gaps, then index() of random items
+- pop(i):   pop at random positions until half are gone
+- tail:     remove 10% at random, then take short slices near the end
+- add:      add N items, no deletions (the common use, for comparison)
+
+Given the path of another setutils.py (e.g. the version before the Fenwick
+tree), times both side by side:
+
+    git show <commit>:bin/setutils.py > /tmp/old_setutils.py
+    python3 bench/bench_indexedset.py [N] [/tmp/old_setutils.py]
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import setutils  # noqa: E402
+
+
+def loadModule(path: str):
+    spec = importlib.util.spec_from_file_location("other_setutils", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def withGaps(cls, n: int, rng: random.Random):
+    s = cls(range(n))
+    for item in rng.sample(range(n), n // 10):
+        s.remove(item)
+    return s
+
+
+def getitem(cls, n: int, rng: random.Random) -> None:
+    s = withGaps(cls, n, rng)
+    size = len(s)
+    for _ in range(n // 10):
+        s[rng.randrange(size)]
+
+
+def index(cls, n: int, rng: random.Random) -> None:
+    s = withGaps(cls, n, rng)
+    items = list(s)
+    for _ in range(n // 10):
+        s.index(rng.choice(items))
+
+
+def popAt(cls, n: int, rng: random.Random) -> None:
+    s = cls(range(n))
+    for _ in range(n // 2):
+        s.pop(rng.randrange(len(s)))
+
+
+def tail(cls, n: int, rng: random.Random) -> None:
+    s = withGaps(cls, n, rng)
+    size = len(s)
+    for _ in range(1000):
+        start = size - rng.randrange(1, 100)
+        s[start:start + 10]
+
+
+def add(cls, n: int, rng: random.Random) -> None:
+    s = cls()
+    for i in range(n):
+        s.add(i)
+
+
+def timed(fn, cls, n: int) -> float:
+    t0 = time.perf_counter()
+    fn(cls, n, random.Random(1))
+    return time.perf_counter() - t0
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    other = loadModule(sys.argv[2]) if len(sys.argv) > 2 else None
+    print("%d items" % n)
+    for name, fn in (("getitem", getitem), ("index", index), ("pop(i)", popAt), ("tail", tail), ("add", add)):
+        line = "%-8s  this %7.3fs" % (name, timed(fn, setutils.IndexedSet, n))
+        if other is not None:
+            line += "  other %7.3fs" % timed(fn, other.IndexedSet, n)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# bench_rank.py
+"""Compare matching with and without the precomputed rank order
+(.navdex-rank, see navdex_rank).
+
+Writes a synthetic index of N entries under a temp dir, then times
+IndexContent.matchPaths() for a narrow and a broad pattern: fully ranked, and
+with limit=1 as for `to <pattern> 0`.  Without the rank order every match
+is rendered (a stat each) and sorted.  With it, matches come in rank order,
+and a limit stops the search once the best are known.  The first search of
+an index writes its sidecar; that cost is reported separately.
+
+    python3 bench/bench_rank.py [N]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import navdex_core  # noqa: E402
+
+
+def writeIndex(path: str, n: int) -> None:
+    rng = random.Random(1)
+    words = ["src", "lib", "app", "docs", "test", "build", "core", "util", "web", "api", "data", "tmp"]
+    lines = set()
+    while len(lines) < n:
+        parts = [rng.choice(words) + str(rng.randrange(100)) for _ in range(rng.randint(2, 6))]
+        lines.add("%s %d\n" % ("/".join(parts), rng.randint(1, 3)))
+    with open(path, "w") as f:
+        f.writelines(sorted(lines))
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, ".navdex-index")
+        writeIndex(path, n)
+        ix = navdex_core.IndexContent(path)
+        t0 = time.perf_counter()
+        ix.rankFor(False)
+        print("%d entries, rank sidecar written in %.2fs" % (n, time.perf_counter() - t0))
+        for pattern in ("*core42*", "*a*"):
+            for limit in (None, 1):
+                ranked = timed(lambda: ix.matchPaths([pattern], limit=limit))
+                minEntries, navdex_core.rankMinEntries = navdex_core.rankMinEntries, 1 << 30
+                try:
+                    unranked = timed(lambda: ix.matchPaths([pattern], limit=limit))
+                finally:
+                    navdex_core.rankMinEntries = minEntries
+                count = len(ix.matchPaths([pattern]))
+                print("%-10s limit=%-4s %7d matches: sorted %6.3fs, ranked %6.3fs"
+                      % (pattern, limit, count, unranked, ranked))
+
+
+if __name__ == "__main__":
+    main()
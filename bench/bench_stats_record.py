@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# bench_stats_record.py
+"""Measure what recording a search in the navdex_stats ring buffer costs.
+
+Times N complete recordings (Invocation setup, phases, pack and write) into
+a scratch stats file, and reports the mean and p99 per record.
+
+    python3 bench/bench_stats_record.py [N]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import navdex_stats  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stats")
+        costs = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            inv = navdex_stats.Invocation(1, 1)
+            with inv.phase("load"):
+                inv.note(index="/home/user/.navdex-index", chainSize=1000)
+            with inv.phase("match"):
+                inv.note(outcome="unique", matches=1)
+            inv.write(path)
+            costs.append(time.perf_counter_ns() - t0)
+        costs.sort()
+        print("%d records: mean %.1f us, p99 %.1f us, file %d bytes" % (
+            n, sum(costs) / n / 1000, navdex_stats.percentile(costs, 99) / 1000, os.path.getsize(path)))
+
+
+if __name__ == "__main__":
+    main()
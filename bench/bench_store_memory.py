@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# bench_store_memory.py
+"""Compare resident memory of the IndexContent entry stores.
+
+Builds a synthetic index of N deep, prefix-sharing paths and measures the
+memory held by each store with tracemalloc.
+
+    python3 bench/bench_store_memory.py [N]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from navdex_store import storeKinds  # noqa: E402
+
+
+def syntheticPaths(n: int):
+    """ Yield n paths shaped like a recursively indexed tree ('to -a -r'):
+    every directory is an entry, and each one adds a level below its parent """
+    names = ["src", "build", "common", "include", "lib", "test", "docs", "tools", "frontend", "api"]
+    frontier = ["projects/fishhead"]
+    yield frontier[0]
+    count = 1
+    while True:
+        deeper = []
+        for parent in frontier:
+            for k in range(8):
+                if count >= n:
+                    return
+                # Build a fresh string, as parsing an index file would:
+                path = "/".join((parent, "%s%d" % (names[(count + k) % len(names)], k)))
+                yield path
+                deeper.append(path)
+                count += 1
+        frontier = deeper
+
+
+def measure(kind: str, n: int):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    store = storeKinds[kind]()
+    for path in syntheticPaths(n):
+        store.append((path, 1))
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for _ in store:
+        pass
+    iterate = time.perf_counter() - t0
+    del store
+    return size, elapsed, iterate
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("entries: %d" % n)
+    print("%-8s %12s %10s %10s %10s" % ("store", "bytes", "B/entry", "build s", "iter s"))
+    baseline = None
+    for kind in storeKinds:
+        size, build, iterate = measure(kind, n)
+        if baseline is None:
+            baseline = size
+        print("%-8s %12d %10.1f %10.3f %10.3f" % (kind, size, size / n, build, iterate))
+        if size != baseline:
+            print("         savings vs list: %.1f%%" % (100.0 * (baseline - size) / baseline))
+
+
+if __name__ == "__main__":
+    main()
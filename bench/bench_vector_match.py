@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# bench_vector_match.py
+"""Time matchPaths() with and without the NumPy backend.
+
+Writes a synthetic index of N paths to a temp dir, then times a few searches
+through the pure-Python loop and through navdex_vector.
+
+    python3 bench/bench_vector_match.py [N]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import navdex_core  # noqa: E402
+import navdex_vector  # noqa: E402
+from bench_store_memory import syntheticPaths  # noqa: E402
+
+PATTERNS = ["*build*", "*test3*", "api4", "tools*", "*nomatch*"]
+
+
+def timeMatches(ix, pattern: str, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        mx = ix.matchPaths([pattern], True)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, mx
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    if navdex_vector.numpy is None:
+        print("NumPy is not installed: nothing to compare")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, ".navdex-index")
+        with open(path, "w") as f:
+            for i, p in enumerate(syntheticPaths(n)):
+                f.write("%s %d\n" % (p, 1 + i % 3))
+        ix = navdex_core.IndexContent(path, store="columnar")
+        print("entries: %d (columnar store)" % n)
+        print("%-12s %8s %10s %10s %8s" % ("pattern", "matches", "python s", "numpy s", "speedup"))
+        for pattern in PATTERNS:
+            saved, navdex_vector.numpy = navdex_vector.numpy, None
+            slow, ref = timeMatches(ix, pattern)
+            navdex_vector.numpy = saved
+            fast, mx = timeMatches(ix, pattern)
+            assert mx == ref
+            print("%-12s %8d %10.3f %10.3f %7.1fx" % (pattern, len(mx), slow, fast, slow / fast))
+
+
+if __name__ == "__main__":
+    main()
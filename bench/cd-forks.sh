@@ -0,0 +1,52 @@
+#!/usr/bin/env bash
+# cd-forks.sh - count the forks and time per 'cd' through the cdpp wrapper
+#
+#     bench/cd-forks.sh [N]
+#
+# Runs N rounds of cd to an absolute dir, a relative dir, a $CDPATH entry and
+# 'cd -', through the cd() of bin/cdpp.bashrc and through the previous
+# wrapper's trial-cd-in-a-subshell probe.  Forks are counted from the kernel's
+# last-allocated pid (Linux only), so other activity on the machine may add a
+# little noise.
+
+N=${1:-1000}
+scriptDir=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+lastPid=/proc/sys/kernel/ns_last_pid
+[[ -r $lastPid ]] || { echo "$lastPid isn't readable: can't count forks here" >&2; exit 1; }
+
+HOME=$(mktemp -d)
+trap 'builtin cd /; rm -rf "$HOME"' EXIT
+mkdir -p "$HOME/a/b" "$HOME/cdp/proj"
+source "$scriptDir/../bin/cdpp.bashrc"
+CDPATH=$HOME/cdp
+fallbacks=0
+navdex_w() { (( fallbacks++ )); }  # Every target exists, so this shouldn't run
+
+cd_subshell_probe() {
+    # The wrapper's previous probe, for comparison:
+    ( builtin cd "$@" &> /dev/null ) && builtin cd "$@"
+}
+
+run() {
+    local label=$1 fn=$2 pid0 pid1 t0 t1 i
+    builtin cd "$HOME"
+    read pid0 < $lastPid
+    t0=${EPOCHREALTIME/./}
+    for (( i = 0; i < N; i++ )); do
+        $fn "$HOME/a/b"
+        $fn ..
+        $fn proj >/dev/null
+        $fn - >/dev/null
+        builtin dirs -c  # Keep pushd's stack from growing over the run
+    done
+    t1=${EPOCHREALTIME/./}
+    read pid1 < $lastPid
+    local cds=$(( N * 4 ))
+    printf "%-20s %6d cds  %6.2f forks/cd  %7.1f us/cd\n" "$label" $cds \
+        "$(( (pid1 - pid0) * 100 / cds ))e-2" "$(( (t1 - t0) * 10 / cds ))e-1"
+}
+
+run "cd (cdpp.bashrc)" cd
+run "subshell probe" cd_subshell_probe
+(( fallbacks )) && echo "navdex_w was called $fallbacks times" >&2
+true
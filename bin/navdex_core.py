@@ -2,10 +2,12 @@
 import os
 import sys
 import subprocess
-from termios_proxy import getraw_kbd, use_ansiterm
+from termios_proxy import raw_kbd_session, SpecialKey, use_ansiterm
 from tempfile import NamedTemporaryFile
-from typing import Callable, List, Dict, Tuple
-from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, List, Dict, Set, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import MutableSequence
 
 use_pwuid=True
 winpaths=False
@@ -16,6 +18,13 @@ except:
     use_pwuid=False
     winpaths=True
 
+use_flock=True
+try:
+    import fcntl
+except:
+    # Nor this: index writes are then unlocked, as before
+    use_flock=False
+
 def normalize_path(path:str, to_unix=True) -> str:
     '''
     In general within navdex_core, we only deal with Unix paths.  But when we're calling a Windows api, we
@@ -46,15 +55,29 @@ sys.path.insert(0, navdex_core_root)
 
 
 from io import StringIO
+from contextlib import contextmanager
 import re
+import json
 import bisect
+import heapq
+import posixpath
 import argparse
 import fnmatch
 import shutil
 from subprocess import call
 from setutils import IndexedSet
+from navdex_store import openStore
+from navdex_shard import (shardDirBase, manifestBase, defaultShardCount, BloomFilter,
+                          buildBloom, shardMayMatch, shardId, shardPath, readManifest, writeManifest,
+                          readSummary, writeSummary)
+import navdex_vector
+import navdex_stats
+from navdex_history import HistoryLearner, learnedPriority
+from navdex_scan import TreeScanner
+from navdex_rank import RankOrder, rankMinEntries, readRank, writeRank
 
 navdexRootKey:str = "NavdexSysRoot"
+navdexHintKeysKey:str = "NavdexHintKeys"  # Alphabet for menu hint labels, e.g. "asdfghjkl"
 file_sys_root:str = os.getenv(navdexRootKey, "/")
 # Swap this for chroot-like testing
 
@@ -80,6 +103,8 @@ class UserSelectionTrap(UserTrap):
     ...
 class UserBadEntryTrap(UserTrap):
     ...
+class UserFilterTrap(UserTrap):
+    ...
 
 class AddEntryAlreadyPresent(BaseException):
     ...
@@ -145,25 +170,222 @@ def trace(msg: str) -> None:
     sys.stderr.write(f"\033[;33m{msg}\033[;0m\n")
 
 
-class IndexContent(list):
+def rankKey(entry:Tuple[str,int]) -> float:
+    """ Sort key for ranking (path,priority) matches: shorter paths and higher
+    priorities come first.  Priority 0 ranks last. """
+    return len(entry[0])/entry[1] if entry[1] else float("inf")
+
+
+@contextmanager
+def lockedFile(path:str, exclusive:bool=False, mode:str="r"):
+    """ Open path holding an advisory flock() on it: shared for readers,
+    exclusive for writers.  The lock goes with the file on close. """
+    with open(normalize_path(path,to_unix=False), mode) as f:
+        if use_flock:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield f
+
+
+def readIndexText(path:str) -> str:
+    # The shared lock keeps us from reading a half-rewritten index
+    with lockedFile(path) as f:
+        return f.read()
+
+
+def parseEntries(text:str, store:str=None) -> MutableSequence:
+    """ Parse the 'path priority' lines of an index into a new entry store """
+    entries = openStore(store)
+    for line in text.splitlines():
+        path,_,priority=line.rstrip().rpartition(' ')
+        if not path or path[0]=='#':
+            continue
+        try:
+            pri=int(priority)
+        except:
+            pri=1
+        entries.append((path,pri))
+    return entries
+
+
+def readEntries(path:str, store:str=None) -> MutableSequence:
+    """ Parse the 'path priority' lines of an index file into a new entry store """
+    return parseEntries(readIndexText(path), store)
+
+
+def rewriteInPlace(path:str, text:str) -> None:
+    # We want to write back to the index without recreating the inode: this allows symlinks
+    # to behave without surprises:
+    with lockedFile(path, True, "r+") as outfile:
+        outfile.seek(0)
+        outfile.write(text)
+        outfile.truncate()
+
+
+def addSortedEntry(entries:MutableSequence, dir:str, priority:int) -> bool:
+    """ Add or update (dir,priority) in entries, keeping them sorted by path """
+    if dir in entries:
+        return False  # no change
+    entry=(dir,priority)
+    n = bisect.bisect([p[0] for p in entries], dir)
+    try:
+        if entries[n-1][0]==dir:
+            if entries[n-1][1] == priority:
+                raise AddEntryAlreadyPresent()
+            entries[n-1]=entry  # Update existing entry
+            return True
+    except IndexError:
+        ...
+    entries.insert(n, entry)
+    return True
+
+
+def delEntry(entries:MutableSequence, dir:str) -> bool:
+    for e in entries:
+        if e[0]==dir:
+            entries.remove(e)
+            return True
+    return False
+
+
+def mergeEntries(entries:MutableSequence, dirs:Iterable[Tuple[str,int]]) -> List[Tuple[str,int]]:
+    """ Add each (dir,priority) to sorted entries, or raise the priority of the
+    dir's entry if it's lower: one sort in all, rather than a bisect and an
+    insert per dir.  Returns the entries added or changed. """
+    merged = list(entries)
+    where = {entry[0]: i for i, entry in enumerate(merged)}
+    changes = []
+    for dir, priority in dirs:
+        i = where.get(dir)
+        if i is None:
+            where[dir] = len(merged)
+            merged.append((dir, priority))
+        elif merged[i][1] < priority:
+            merged[i] = (dir, priority)
+        else:
+            continue
+        changes.append((dir, priority))
+    if changes:
+        merged.sort()
+        entries[:] = merged
+    return changes
+
+
+def cleanEntries(entries:Iterable[Tuple[str,int]], absPath:Callable[[str],str]) -> List[Tuple[str,int]]:
+    """ The entries whose dirs still exist, reporting the others """
+    okEntries = set()
+    for entry in entries:
+        full = absPath(entry[0])
+        if not isdir(full):
+            sys.stderr.write("Stale dir removed: %s\n" % full)
+        else:
+            okEntries.add(entry)
+    return list(okEntries)
+
+
+def canonicalDir(dir:str, root:str) -> str:
+    """ dir, as held in the index rooted at root, in canonical form: normalized
+    (lexically: '.', '..', '//' and a trailing '/' go), and relative to root if
+    it's below it, else absolute """
+    if dir[0] == "~":
+        return dir  # Not expanded anywhere, so left as it is
+    full = posixpath.normpath(dir if dir[0] == "/" else "/".join([root, dir]))
+    if full.startswith("//"):
+        full = full[1:]  # normpath keeps a leading '//'
+    prefix = root.rstrip("/") + "/"
+    if full.startswith(prefix) and len(full) > len(prefix):
+        return full[len(prefix):]
+    return full
+
+
+def absoluteDir(dir:str, root:str) -> str:
+    """ The absolute path of dir, in canonical form in the index rooted at root """
+    return dir if dir[0] in "/~" else "/".join([root.rstrip("/"), dir])
+
+
+def compactEntries(entries:Iterable[Tuple[str,int]], root:str, shadowed:Set[str]=frozenset()) -> List[Tuple[str,int]]:
+    """ entries in canonical form (see canonicalDir()), sorted, one per dir
+    with the highest of its priorities, leaving out the dirs in shadowed """
+    best = {}
+    for dir, priority in entries:
+        dir = canonicalDir(dir, root)
+        if dir not in shadowed and (dir not in best or best[dir] < priority):
+            best[dir] = priority
+    return sorted(best.items())
+
+
+def replayChanges(entries:MutableSequence, journal:List[tuple], absPath:Callable[[str],str]) -> None:
+    """ Apply the addDir/delDir/clean/compact changes logged in journal to entries
+    freshly read from an index someone else has written meanwhile """
+    for change in journal:
+        if change[0] == "add":
+            try:
+                addSortedEntry(entries, change[1], change[2])
+            except AddEntryAlreadyPresent:
+                ...
+        elif change[0] == "del":
+            delEntry(entries, change[1])
+        elif change[0] == "clean":
+            entries[:] = cleanEntries(entries, absPath)
+        elif change[0] == "compact":
+            entries[:] = compactEntries(entries, change[1], change[2])
+
+
+class IndexContent(MutableSequence):
     ''' Each index entry is a [path,priority] tuple.  Higher priority numbers cause
     an entry to move to the top of the match list.  Default priority is 1.  Absent
-    priority, entries or ordered by ascending length alone. '''
-    def __init__(self, path: str):
+    priority, entries or ordered by ascending length alone.
+
+    Entries are held in self.entries, a store from navdex_store: a plain list by
+    default, or a more compact (radix, columnar) store selected by 'store' or
+    $NavdexStore.  The IndexContent itself behaves as a list of the entries.
+
+    Other shells may write the index while we hold it.  addDir(), delDir(),
+    clean() and compact() are logged in self.journal, and write() takes an exclusive lock,
+    re-reads the index if it has changed since we read it, and replays the
+    journal onto that before writing.  Any other change (through the list
+    interface) can't be replayed, so it sets journal to None. '''
+    def __init__(self, path: str, store:str=None):
         self.path: str = path
         self.protect: bool = False
         self.outer = None  # If we are chaining indices
+        self.store = store
+        text = readIndexText(path)
+        self.entries = parseEntries(text, store)
+        self.digest:int = hash(text)  # Of the index text as we read or last wrote it
+        self.journal:List[tuple] = []
+        self.asRead:bool = True  # Entries are as in the file, in its order (see rankFor())
+        self.ranks:List[RankOrder] = [None, None]  # Local and full rank orders, once read
 
-        with open(normalize_path(self.path,to_unix=False), "r") as f:
-            for line in f.readlines():
-                path,_,priority=line.rstrip().rpartition(' ')
-                if not path or path[0]=='#':
-                    continue
-                try:
-                    pri=int(priority)
-                except:
-                    pri=1
-                self.append((path,pri))
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __setitem__(self, index, entry) -> None:
+        self.journal = None
+        self.entries[index] = entry
+
+    def __delitem__(self, index) -> None:
+        self.journal = None
+        del self.entries[index]
+
+    def insert(self, index:int, entry:Tuple[str,int]) -> None:
+        self.journal = None
+        self.entries.insert(index, entry)
+
+    def append(self, entry:Tuple[str,int]) -> None:
+        self.journal = None
+        self.entries.append(entry)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, entry) -> bool:
+        return entry in self.entries
+
+    def __repr__(self) -> str:
+        return "%s(%r, %r)" % (self.__class__.__name__, self.path, list(self.entries))
 
     def Empty(self) -> bool:
         """ Return true if index chain has no entries at all """
@@ -194,93 +416,531 @@ class IndexContent(list):
             pass
         return dir
 
+    def logChange(self, *change) -> None:
+        if self.journal is not None:
+            self.journal.append(change)
+
     def addDir(self, xdir: str, priority: int) -> bool:
         dir = self.relativePath(xdir)
-        if dir in self:
-            return False  # no change
-        entry=(dir,priority)
-        n = bisect.bisect([p[0] for p in self], dir)
-        try:
-            if self[n-1][0]==dir:
-                if self[n-1][1] == priority:
-                    raise AddEntryAlreadyPresent()
-                self[n-1]=entry  # Update existing entry
-                return True
-        except IndexError:
-            ...
-        self.insert(n, entry)
-        return True
+        if addSortedEntry(self.entries, dir, priority):
+            self.logChange("add", dir, priority)
+            return True
+        return False
 
     def delDir(self, xdir: str) -> bool:
         dir = self.relativePath(xdir)
-        for e in self:
-            if e[0]==dir:
-                self.remove(e)
-                return True
+        if delEntry(self.entries, dir):
+            self.logChange("del", dir)
+            return True
         return False
 
+    def mergeDirs(self, dirs:Iterable[Tuple[str,int]]) -> int:
+        """ Bulk addDir(), which only ever raises priorities.  Returns the
+        number of entries added or changed. """
+        changes = mergeEntries(self.entries, [(self.relativePath(xdir), pri) for xdir, pri in dirs])
+        for dir, priority in changes:
+            self.logChange("add", dir, priority)
+        return len(changes)
+
     def clean(self) -> None:
         # Remove dead paths from index
-        okEntries = set()
-        for entry in self:
-            path=entry[0]
-            full = self.absPath(path)
-            if not isdir(full):
-                sys.stderr.write("Stale dir removed: %s\n" % full)
-            else:
-                okEntries.add(entry)
-
-        del self[:]
-        self.extend(okEntries)
+        self.entries[:] = cleanEntries(self.entries, self.absPath)
+        self.logChange("clean")
         self.write()
         sys.stderr.write("Cleaned index %s, %s dirs remain\n" % (self.path, len(self)))
 
+    def compact(self, shadowed:Set[str]=frozenset()) -> bool:
+        """ Replace the entries by compactEntries() of them, dropping the dirs
+        in shadowed (in canonical form).  Returns whether that changed any. """
+        compacted = compactEntries(self.entries, self.indexRoot(), shadowed)
+        if compacted == list(self.entries):
+            return False
+        self.entries[:] = compacted
+        self.logChange("compact", self.indexRoot(), shadowed)
+        return True
+
+    def merge(self, text:str) -> None:
+        """ Take text, the index as another process has written it since we
+        read it, and replay our changes onto it """
+        if self.journal is None:
+            logging.warning(f"{self.path} changed since it was read; overwriting those changes")
+            return
+        self.entries = parseEntries(text, self.store)
+        replayChanges(self.entries, self.journal, self.absPath)
+
     def write(self) ->None:
-        # Write the index back to file
-        tmpname:str
-        with NamedTemporaryFile(mode='w', delete=False) as tmpfile:
-            tmpname=tmpfile.name
-            for entry in sorted(self):
-                tmpfile.write("%s %d\n" % entry)
-        # We want to write back to the index without recreating the inode: this allows symlinks
-        # to behave without surprises:
-        with open(tmpname, "r") as infile, open(normalize_path(self.path,to_unix=False),"r+") as outfile:
-            outfile.seek(0)
-            outfile.write(infile.read())
-            outfile.truncate()
-        os.remove(tmpname)
-
-    def matchPaths(self, patterns:List[str], fullDirname:bool=False) ->List[str]:
-        """ Returns matches of items in the index. """
-
-        # Identify all the potential matches, filter by all patterns:
-        cand_entries = self[:]
-        for pattern in patterns:
+        # Write the index back to file, in place to keep its inode (and any symlinks to it).
+        # The lock is held from re-reading it to truncating it, so no update is lost and
+        # readers never see it half-written:
+        with lockedFile(self.path, True, "r+") as f:
+            current = f.read()
+            if hash(current) != self.digest:
+                self.merge(current)
+            text = ''.join("%s %d\n" % entry for entry in sorted(self))
+            f.seek(0)
+            f.write(text)
+            f.truncate()
+        self.digest = hash(text)
+        self.journal = []
+        self.asRead = False
+        self.updateSummary()
+
+    def updateSummary(self) -> None:
+        """ Rewrite the .navdex-summary sidecar if it's stale, so that later
+        chain searches can skip this index without parsing it.  Done when the
+        index is written, never by a search. """
+        fname = normalize_path(self.path,to_unix=False)
+        if readSummary(fname) is None:
+            writeSummary(fname, (entry[0] for entry in self))
+
+    def rankFor(self, full:bool) -> RankOrder:
+        """ The rank order of our entries as matchPaths() renders them, locally
+        or in full (see navdex_rank), from the .navdex-rank sidecar, which is
+        rewritten if it's stale.  None for a small index, or one changed since
+        it was read. """
+        if len(self) < rankMinEntries or not self.asRead or self.journal != []:
+            return None
+        if self.ranks[full] is None:
+            fname = normalize_path(self.path,to_unix=False)
+            rootLen = len(self.indexRoot())
+            self.ranks[full] = readRank(fname, rootLen, len(self), full)
+            if self.ranks[full] is None:
+                self.ranks = list(writeRank(fname, rootLen, list(self.entries)))
+        return self.ranks[full]
+
+    def rankedMatches(self, patterns:List[str], render:Callable, rank:RankOrder, full:bool,
+                      limit:int=None) -> Iterator[Tuple[str,int]]:
+        """ The rendered matches of patterns, deduplicated, lazily in rank
+        order, taking candidates in the precomputed order.  A match is held
+        back until no later candidate can rank above it, so a caller wanting
+        only the best few stops the search early.  Without a 'limit' (how
+        many are likely wanted), all are, and they're sorted once at the
+        end instead, as they are if any priority isn't positive. """
+        entries = self.entries
+        n = len(entries)
+        ids = list(entries.candidates(patterns[0]))
+        if limit is not None and len(ids) * 8 >= n:
+            # Most entries are candidates: walk the order, and likely stop early
+            member = bytearray(n)
+            for i in ids:
+                member[i] = 1
+            ordered = (i for i in rank.order if member[i])
+        else:
+            ordered = sorted(ids, key=rank.positions.__getitem__)
+        extra = len(self.indexRoot()) + 1 if full else 0
+        pending = []  # Heap of ((rank key, index), match) not yet yielded
+        least = {}  # match -> the least index of the entries rendered as it, which places it among ties
+        for i in ordered:
+            entry = entries[i]
+            path, pri = entry
+            if limit is not None and rank.monotone:
+                # Rendering only ever lengthens a path, so (with positive
+                # priorities) no match from here on ranks above:
+                bound = ((len(path) + (0 if path[0] == "/" else extra)) / pri if pri else float("inf"), i)
+                while pending and pending[0][0] < bound:
+                    (_, j), match = heapq.heappop(pending)
+                    if least[match] == j:
+                        yield match
+            for pattern in patterns:
+                if not any(fnmatch.fnmatch(frag, pattern) for frag in entry[0].split("/")):
+                    break
+                entry = render(entry)
+            else:
+                # A duplicate with a lower index replaces the pending match (it
+                # can't have been yielded: this entry's bound held it back)
+                if least.get(entry, n) > i:
+                    least[entry] = i
+                    heapq.heappush(pending, ((rankKey(entry), i), entry))
+        # Without a limit all are wanted anyway, so sort what's left in one go:
+        pending.sort()
+        for (_, j), match in pending:
+            if least[match] == j:
+                yield match
+
+    def candidateEntries(self, patterns:List[str]) -> List[Tuple[str,int]]:
+        """ Entries which may match all of patterns.  The store prefilters on
+        the first pattern's literal text, so entries which can't match are
+        skipped without being materialized. """
+        if not patterns:
+            return self[:]
+        entries = self.entries
+        return [entries[i] for i in entries.candidates(patterns[0])]
+
+    def vectorMatches(self, pattern:str) -> List[Tuple[str,int]]:
+        """ Entries matching pattern from the NumPy backend, in index order, or
+        None if it doesn't apply here (see navdex_vector) """
+        try:
+            return navdex_vector.vectorMatches(self.entries, pattern)
+        except MemoryError:
+            logging.warning(f"Out of memory in vector match of {self.path}, falling back")
+            return None
+
+    def iterMatches(self, patterns:List[str], fullDirname:bool=False, limit:int=None) -> Iterator[Tuple[str,int]]:
+        """ Matches of patterns in this index alone, in rank order.  With a
+        limit, only the best 'limit' of them are needed. """
+
+        def render(entry:Tuple[str,int]) -> Tuple[str,int]:
+            # If fullDirname is set, we'll render an absolute path.
+            # Or... if the relative path is not a dir, we'll also
+            # render it as absolute.  This allows for cases where an
+            # outer index path happens to match a local relative path
+            # which isn't indexed.
+            path=entry[0]
+            if fullDirname or not isdir(path):
+                return (self.absPath(path),entry[1])
+            return entry
+
+        # For big indices, the vector backend may apply the first pattern:
+        matched = self.vectorMatches(patterns[0]) if patterns else None
+        rank = self.rankFor(fullDirname) if patterns and matched is None else None
+        if rank is not None:
+            return self.rankedMatches(patterns, render, rank, fullDirname, limit)
+        if matched is not None:
+            cand_entries = [render(entry) for entry in matched]
+            remaining = patterns[1:]
+        else:
+            # Identify all the potential matches, filter by all patterns:
+            cand_entries = self.candidateEntries(patterns)
+            remaining = patterns
+        for pattern in remaining:
             qual_entries = []
             for entry in cand_entries:
                 path=entry[0]
                 for frag in path.split("/"):
                     if fnmatch.fnmatch(frag, pattern):
-                        # If fullDirname is set, we'll render an absolute path.
-                        # Or... if the relative path is not a dir, we'll also
-                        # render it as absolute.  This allows for cases where an
-                        # outer index path happens to match a local relative path
-                        # which isn't indexed.
-                        if fullDirname or not isdir(path):
-                            qual_entries.append((self.absPath(path),entry[1]))
-                        else:
-                            qual_entries.append((path,entry[1]))
+                        qual_entries.append(render(entry))
             cand_entries = qual_entries
 
         # Remove dupes:
         xs = IndexedSet()
         for entry in cand_entries:
             xs.add(entry)
-        if self.outer is not None:
-            # We're a chain, so recurse:
-            pp = self.outer.matchPaths(patterns, True)
-            xs = xs.union(pp)
-        return sorted(list(xs),key=lambda entry: len(entry[0])/entry[1])
+        return iter(sorted(list(xs),key=rankKey)[:limit])
+
+    def matchPaths(self, patterns:List[str], fullDirname:bool=False, limit:int=None) ->List[str]:
+        """ Returns matches of items in the index chain, ranked.  With a
+        limit, only the best 'limit' of them.
+
+        Each index yields its matches in rank order (outer ones rendered in
+        full), and those streams are merged lazily on a heap: ties go to the
+        inner index, and a dir matched again further out is dropped.  The
+        merge stops as soon as it has 'limit' matches. """
+        if limit == 0:
+            return []
+        streams = []
+        ix, full = self, fullDirname
+        while ix is not None:
+            streams.append(ix.iterMatches(patterns, full, limit))
+            ix, full = ix.outer, True
+        ranked, seen = [], set()
+        for entry in heapq.merge(*streams, key=rankKey):
+            if entry in seen:
+                continue
+            seen.add(entry)
+            ranked.append(entry)
+            if len(ranked) == limit:
+                break
+        return ranked
+
+
+class ShardedIndexContent(IndexContent):
+    """ An index whose entries live in shard files under .navdex-shards/,
+    split by top-level path component (see navdex_shard).  The .navdex-index
+    itself only holds comments.  Shards are read on demand: matchPaths() skips
+    those whose Bloom filter rules out a pattern, and addDir()/delDir() read
+    and rewrite only the shard of the dir concerned.
+
+    Writers lock the .navdex-index itself.  Each shard keeps its own journal,
+    replayed as for IndexContent when that shard has changed since we read it,
+    and the manifest keeps other writers' filters for shards we didn't touch. """
+    def __init__(self, path: str, store:str=None, manifest:dict=None):
+        self.path: str = path
+        self.protect: bool = False
+        self.outer = None
+        self.store = store
+        self.shardDir = "/".join([dirname(path), shardDirBase])
+        if manifest is None:
+            manifest = readManifest(normalize_path(self.shardDir,to_unix=False)) or {"count":defaultShardCount, "shards":{}}
+        self.shardCount:int = manifest["count"]
+        self.summary:Dict[str,dict] = manifest["shards"]  # sid -> {"entries":n, "bloom":{...}}
+        self.blooms:Dict[str,BloomFilter] = {}
+        self.shards:Dict[str,MutableSequence] = {}  # Loaded shard stores
+        self.dirty = set()  # sids modified since write()
+        self.digests:Dict[str,int] = {}  # sid -> hash of the shard text we read
+        self.journals:Dict[str,List[tuple]] = {}  # sid -> changes since write(), or None
+        self._all = None  # All shards merged in path order, for indexed access
+
+    @staticmethod
+    def create(path:str, entries:Iterable[Tuple[str,int]], count:int=defaultShardCount, store:str=None) -> "ShardedIndexContent":
+        """ Split entries into shards beside the index file 'path', and reduce
+        that file to its comments """
+        shardDir = normalize_path("/".join([dirname(path), shardDirBase]),to_unix=False)
+        os.makedirs(shardDir, exist_ok=True)
+        for name in os.listdir(shardDir):
+            if name.endswith(".idx"):
+                os.remove(os.path.join(shardDir, name))
+        ix = ShardedIndexContent(path, store, {"count":count, "shards":{}})
+        for entry in entries:
+            ix.append(entry)
+        ix.write()
+        with open(normalize_path(path,to_unix=False), "r") as f:
+            comments = [line for line in f if line.startswith('#') and not line.startswith('#sharded')]
+        rewriteInPlace(path, ''.join(comments) + f"#sharded: entries are in {shardDirBase}/\n")
+        return ix
+
+    def unshard(self) -> IndexContent:
+        """ Move all entries back into the index file and remove the shards """
+        entries = sorted(self)
+        with open(normalize_path(self.path,to_unix=False), "r") as f:
+            comments = [line for line in f if line.startswith('#') and not line.startswith('#sharded')]
+        rewriteInPlace(self.path, ''.join(comments) + ''.join("%s %d\n" % entry for entry in entries))
+        shardDir = normalize_path(self.shardDir,to_unix=False)
+        for name in os.listdir(shardDir):
+            if name.endswith(".idx") or name == manifestBase:
+                os.remove(os.path.join(shardDir, name))
+        os.rmdir(shardDir)
+        return IndexContent(self.path, self.store)
+
+    def shardIds(self) -> List[str]:
+        return sorted(set(self.summary) | set(self.shards))
+
+    def shard(self, sid:str) -> MutableSequence:
+        """ The entry store of shard 'sid', read on first use """
+        entries = self.shards.get(sid)
+        if entries is None:
+            fname = normalize_path(shardPath(self.shardDir, sid),to_unix=False)
+            text = readIndexText(fname) if isfile(fname) else ""
+            entries = self.shards[sid] = parseEntries(text, self.store)
+            self.digests[sid] = hash(text)
+        return entries
+
+    def shardFor(self, dir:str) -> str:
+        return shardId(dir, self.shardCount)
+
+    def touch(self, sid:str, *change) -> None:
+        """ Mark shard sid modified by change, an addDir/delDir/clean/compact
+        journal entry, or by some unlogged change if none is given """
+        self.dirty.add(sid)
+        self._all = None
+        journal = self.journals.setdefault(sid, [])
+        if not change or journal is None:
+            self.journals[sid] = None
+        else:
+            journal.append(change)
+
+    def bloom(self, sid:str) -> BloomFilter:
+        bloom = self.blooms.get(sid)
+        if bloom is None:
+            bloom = self.blooms[sid] = BloomFilter.fromJson(self.summary[sid]["bloom"])
+        return bloom
+
+    def allEntries(self) -> List[Tuple[str,int]]:
+        # Each shard is sorted, so merging them gives the order the unsharded
+        # index would have, which rankKey() ties fall back on:
+        if self._all is None:
+            self._all = list(heapq.merge(*(self.shard(sid) for sid in self.shardIds())))
+        return self._all
+
+    def __len__(self) -> int:
+        # Counts come from the manifest, so this doesn't read any shards:
+        return sum(len(self.shards[sid]) if sid in self.shards else self.summary[sid]["entries"]
+                   for sid in self.shardIds())
+
+    def __getitem__(self, index):
+        return self.allEntries()[index]
+
+    def __setitem__(self, index, entry) -> None:
+        if isinstance(index, slice):
+            del self[index]
+            self.extend(entry)
+            return
+        old = self[index]
+        delEntry(self.shard(self.shardFor(old[0])), old[0])
+        self.touch(self.shardFor(old[0]))
+        self.append(entry)
+
+    def __delitem__(self, index) -> None:
+        olds = self[index] if isinstance(index, slice) else [self[index]]
+        for old in olds:
+            sid = self.shardFor(old[0])
+            self.shard(sid).remove(old)
+            self.touch(sid)
+
+    def insert(self, index:int, entry:Tuple[str,int]) -> None:
+        # Shards are kept in path order, so the position is ignored
+        sid = self.shardFor(entry[0])
+        bisect.insort(self.shard(sid), entry)
+        self.touch(sid)
+
+    def append(self, entry:Tuple[str,int]) -> None:
+        self.insert(len(self), entry)
+
+    def __iter__(self):
+        return iter(self.allEntries())
+
+    def __contains__(self, entry) -> bool:
+        if not isinstance(entry, tuple) or len(entry) != 2:
+            return False
+        return entry in self.shard(self.shardFor(entry[0]))
+
+    def __repr__(self) -> str:
+        return "%s(%r, %d shards)" % (self.__class__.__name__, self.path, len(self.shardIds()))
+
+    def addDir(self, xdir: str, priority: int) -> bool:
+        dir = self.relativePath(xdir)
+        sid = self.shardFor(dir)
+        if addSortedEntry(self.shard(sid), dir, priority):
+            self.touch(sid, "add", dir, priority)
+            return True
+        return False
+
+    def delDir(self, xdir: str) -> bool:
+        dir = self.relativePath(xdir)
+        sid = self.shardFor(dir)
+        if delEntry(self.shard(sid), dir):
+            self.touch(sid, "del", dir)
+            return True
+        return False
+
+    def mergeDirs(self, dirs:Iterable[Tuple[str,int]]) -> int:
+        bySid = {}
+        for xdir, priority in dirs:
+            dir = self.relativePath(xdir)
+            bySid.setdefault(self.shardFor(dir), []).append((dir, priority))
+        count = 0
+        for sid, group in bySid.items():
+            for change in mergeEntries(self.shard(sid), group):
+                self.touch(sid, "add", *change)
+                count += 1
+        return count
+
+    def clean(self) -> None:
+        for sid in self.shardIds():
+            entries = self.shard(sid)
+            okEntries = sorted(cleanEntries(entries, self.absPath))
+            if len(okEntries) != len(entries):
+                entries[:] = okEntries
+                self.touch(sid, "clean")
+        self.write()
+        sys.stderr.write("Cleaned index %s, %s dirs remain\n" % (self.path, len(self)))
+
+    def compact(self, shadowed:Set[str]=frozenset()) -> bool:
+        # Canonical forms may belong in other shards, so all are compacted together:
+        bySid = {}
+        for entry in compactEntries(self, self.indexRoot(), shadowed):
+            bySid.setdefault(self.shardFor(entry[0]), []).append(entry)
+        changed = False
+        for sid in set(self.shardIds()) | set(bySid):
+            entries = self.shard(sid)
+            group = bySid.get(sid, [])
+            if list(entries) != group:
+                entries[:] = group
+                self.touch(sid, "compact", self.indexRoot(), shadowed)
+                changed = True
+        return changed
+
+    def mergeShard(self, sid:str, text:str) -> None:
+        """ Replay our changes to shard sid onto text, the shard as another
+        process has written it since we read it """
+        journal = self.journals.get(sid)
+        if journal is None:
+            logging.warning(f"Shard {sid} of {self.path} changed since it was read; overwriting those changes")
+            return
+        entries = self.shards[sid] = parseEntries(text, self.store)
+        replayChanges(entries, journal, self.absPath)
+        entries[:] = sorted(entries)
+
+    def write(self) -> None:
+        # Holding the index file's lock, rewrite only the modified shards, then the manifest
+        # with their new filters:
+        with lockedFile(self.path, True):
+            self.writeShards()
+        self.dirty.clear()
+        self.journals.clear()
+        self._all = None
+
+    def writeShards(self) -> None:
+        shardDir = normalize_path(self.shardDir,to_unix=False)
+        manifest = readManifest(shardDir)
+        if manifest is not None and manifest["count"] == self.shardCount:
+            # Take the latest filters of the shards other writers may have changed:
+            for sid in set(self.summary) | set(manifest["shards"]):
+                if sid in self.dirty or manifest["shards"].get(sid) == self.summary.get(sid):
+                    continue
+                if sid in manifest["shards"]:
+                    self.summary[sid] = manifest["shards"][sid]
+                else:
+                    self.summary.pop(sid, None)
+                self.blooms.pop(sid, None)
+                self.shards.pop(sid, None)  # Re-read on next use
+        for sid in sorted(self.dirty):
+            fname = normalize_path(shardPath(self.shardDir, sid),to_unix=False)
+            current = readIndexText(fname) if isfile(fname) else ""
+            if hash(current) != self.digests.get(sid, hash("")):
+                self.mergeShard(sid, current)
+            entries = self.shards[sid]
+            if not len(entries):
+                if isfile(fname):
+                    os.remove(fname)
+                self.summary.pop(sid, None)
+                self.blooms.pop(sid, None)
+                del self.shards[sid]
+                continue
+            # Shards are replaced whole, so readers see the old or the new one:
+            text = ''.join("%s %d\n" % entry for entry in sorted(entries))
+            with open(fname + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(fname + ".tmp", fname)
+            self.digests[sid] = hash(text)
+            bloom = self.blooms[sid] = buildBloom(entry[0] for entry in entries)
+            self.summary[sid] = {"entries": len(entries), "bloom": bloom.toJson()}
+        writeManifest(shardDir, self.shardCount, self.summary)
+
+    def updateSummary(self) -> None:
+        ...  # The shard manifest is our summary
+
+    def vectorMatches(self, pattern:str) -> List[Tuple[str,int]]:
+        return None  # Shards are narrowed by their Bloom filters instead
+
+    def rankFor(self, full:bool) -> RankOrder:
+        return None  # Matches come from the shards which may hold them
+
+    def candidateEntries(self, patterns:List[str]) -> List[Tuple[str,int]]:
+        if not patterns:
+            return self[:]
+        rootSegments = self.indexRoot().split("/")
+        perShard = []
+        for sid in self.shardIds():
+            # Shards changed since the last write() have no valid filter yet:
+            if sid not in self.dirty and sid in self.summary \
+                    and not shardMayMatch(self.bloom(sid), patterns, rootSegments):
+                continue
+            entries = self.shard(sid)
+            perShard.append([entries[i] for i in entries.candidates(patterns[0])])
+        return list(heapq.merge(*perShard))  # In path order, as allEntries()
+
+
+def openIndex(path:str, store:str=None) -> IndexContent:
+    """ Open the index file 'path', sharded or not """
+    shardDir = "/".join([dirname(path), shardDirBase])
+    manifest = readManifest(normalize_path(shardDir,to_unix=False)) if isdir(shardDir) else None
+    if manifest is not None:
+        return ShardedIndexContent(path, store, manifest)
+    return IndexContent(path, store)
+
+
+def indexMayMatch(path:str, patterns:List[str]) -> bool:
+    """ False if the index file 'path' surely has no entry matching all of
+    patterns, judging by its shard manifest or summary alone.  True if
+    there's no current summary. """
+    rootSegments = dirname(path).split("/")
+    shardDir = "/".join([dirname(path), shardDirBase])
+    manifest = readManifest(normalize_path(shardDir,to_unix=False)) if isdir(shardDir) else None
+    if manifest is not None:
+        return any(shardMayMatch(BloomFilter.fromJson(shard["bloom"]), patterns, rootSegments)
+                   for shard in manifest["shards"].values())
+    bloom = readSummary(normalize_path(path,to_unix=False))
+    return bloom is None or shardMayMatch(bloom, patterns, rootSegments)
 
 
 class AutoContent(list):
@@ -380,9 +1040,11 @@ def findIndex(xdir:str=None, only_mine:bool=True) -> IndexContent:
     return findIndex(dirname(xdir))
 
 
-def loadIndex(xdir:str=None, deep:bool=False, inner=None) -> IndexContent:
+def loadIndex(xdir:str=None, deep:bool=False, inner=None, patterns:List[str]=None) -> IndexContent:
     """Load the index for current xdir.  If deep is specified,
-    also search up the tree for additional indices"""
+    also search up the tree for additional indices.  If patterns are given,
+    outer indices whose summary shows they can't match are left out of the
+    chain without being parsed.  Loading never writes anything."""
     if xdir and not isdir(xdir):
         if xdir=='//':
             xdir=file_sys_root
@@ -393,14 +1055,18 @@ def loadIndex(xdir:str=None, deep:bool=False, inner=None) -> IndexContent:
     if not ix:
         return None
 
-    ic = IndexContent(ix)
-    if not inner is None:
-        inner.outer = ic
+    if not inner is None and patterns and not indexMayMatch(ix, patterns):
+        logging.info(f"loadIndex skips {ix}, its summary can't match {patterns}")
+        ic = None
+    else:
+        ic = openIndex(ix)
+        if not inner is None:
+            inner.outer = ic
     if deep and not xdir == environ_path("HOME"):
-        ix = findIndex(dirname(ic.indexRoot()))  # Bug?
+        ix = findIndex(dirname(dirname(ix)))  # Bug?
         # ix = findIndex(ic.indexRoot())
         if ix:
-            loadIndex(dirname(ix), True, ic)
+            loadIndex(dirname(ix), True, inner if ic is None else ic, patterns)
     return inner if not inner is None else ic
 
 
@@ -436,7 +1102,9 @@ def resolvePatternToDir(patterns:List[str], mode:ResolveMode=ResolveMode.userio)
         ...
 
     # ix is the directory index:
-    ix:IndexContent = loadIndex(pwd(), K in ["//", "/"])
+    with navdex_stats.phase("load"):
+        ix:IndexContent = loadIndex(pwd(), K in ["//", "/"], patterns=[pattern_0])
+    navdex_stats.note(index=ix.path, chainSize=chainSize(ix))
     if K == "/":
         # Skip inner index, which can be achieved by walking the index chain up
         # one level
@@ -447,6 +1115,7 @@ def resolvePatternToDir(patterns:List[str], mode:ResolveMode=ResolveMode.userio)
         K = None
 
     if ix.Empty():
+        navdex_stats.note(outcome="nomatch", matches=0)
         return (None, "!No matches for [%s]" % "+".join(patterns))
 
     # Do we have any glob chars in pattern?
@@ -469,8 +1138,12 @@ def resolvePatternToDir(patterns:List[str], mode:ResolveMode=ResolveMode.userio)
         # If there's more patterns, we shall recurse:
         return resolvePatternToDir(patterns[next_pattern:],  mode)
 
-    mx = ix.matchPaths([pattern_0])
+    with navdex_stats.phase("match"):
+        # An offset from the top only needs the matches up to it:
+        mx = ix.matchPaths([pattern_0], limit=N + 1 if type(N) is int and N >= 0 else None)
+    navdex_stats.note(matches=len(mx))
     if len(mx) == 0:
+        navdex_stats.note(outcome="nomatch")
         return (None, "!No matches for pattern [%s]" % "+".join(patterns))
     if type(N) is int:
         if abs(N) >= len(mx):
@@ -480,23 +1153,43 @@ def resolvePatternToDir(patterns:List[str], mode:ResolveMode=ResolveMode.userio)
             )
             N = (len(mx)-1) * (1 if N >= 0 else -1)
         rk = ix.absPath(mx[N][0])
+        navdex_stats.note(outcome="offset")
         return recurse_or_return([rk],rk)
 
     if mode == ResolveMode.printonly:
+        navdex_stats.note(outcome="print")
         return printMatchingEntries(mx, ix)
     if len(mx) == 1:
         rk = ix.absPath(mx[0][0])
+        navdex_stats.note(outcome="unique")
         return ([rk], rk)
     if mode == ResolveMode.calc:
         return [mx, None]
+    navdex_stats.note(outcome="menu")
     try:
-        r0 = promptMatchingEntry(mx, ix)
+        with navdex_stats.phase("menu"):
+            r0 = promptMatchingEntry(mx, ix)
     except UserUpTrap:
         raise UserUpTrap(dirname(ix.path))
 
     return recurse_or_return( r0[0],r0[1] )
 
 
+def chainSize(ix:IndexContent) -> int:
+    """ Number of entries in the index chain starting at ix """
+    n = 0
+    while ix is not None:
+        n += len(ix)
+        ix = ix.outer
+    return n
+
+
+def printStats() -> None:
+    """ Print the latency summary of the searches recorded by navdex_stats """
+    lines = navdex_stats.statsReport(navdex_stats.readRecords(navdex_stats.statsPath()), home_path)
+    print("!" + "\n".join(lines))
+
+
 def printMatchingEntries(mx, ix):
     px = []
     for i in range(1, len(mx) + 1):
@@ -527,22 +1220,163 @@ def purp(txt:str) -> str:
     return f"\033[38;5;13m{txt}\033[;0m"
 
 
-def displayMatchingEntries(dx:OrderedDict,ix_path:str) -> None:
-    menu_items=[]
-    for i in dx:
-        if i[0] == '%':
-            menu_items.append(f"{red(i[1:])}{grey(dx[i][0])}")
+def invert(txt:str) -> str:
+    if not use_ansiterm:
+        return txt
+    return f"\033[7m{txt}\033[;0m"
+
+
+def menu_commands(dx:OrderedDict) -> List[str]:
+    # The command keys ('%q' etc.) of a menu dict.  They're always at the
+    # end, so this doesn't walk the numbered entries.
+    commands = []
+    for k in reversed(dx):
+        if k[0] != '%':
+            break
+        commands.append(k)
+    commands.reverse()
+    return commands
+
+def entry_count(dx:OrderedDict) -> int:
+    # Number of numbered entries in a menu dict
+    return len(dx) - len(menu_commands(dx))
+
+
+class HintLabels(object):
+    """ Prefix-free labels for the first menu entries, so that each of them can
+    be picked in at most two keystrokes.  With k keys, the best ranked entries
+    get one-key labels and the rest two-key labels, for up to k*k entries;
+    keys used as the first of a two-key label are never whole labels.  Entries
+    beyond that still have their numbers. """
+    def __init__(self, count:int, alphabet:str):
+        self.alphabet = hint_alphabet(alphabet)
+        k = len(self.alphabet)
+        count = min(count, k * k)
+        if k < 2 or count <= k:
+            singles = count
         else:
-            sys.stderr.write(f"  {dx[i][0]} {red(i)}\n")
-    sys.stderr.write('   '.join(menu_items))
-    sys.stderr.write('\n')
+            singles = (k * k - count) // (k - 1)
+        self.labels:List[str] = list(self.alphabet[:singles])
+        for first in self.alphabet[singles:]:
+            self.labels.extend(first + c for c in self.alphabet)
+        del self.labels[count:]
+        self.lookup:Dict[str,int] = {label:n for n,label in enumerate(self.labels)}
+        self.prefixes = {label[0] for label in self.labels if len(label) == 2}
+
+    def label(self, n:int) -> str:
+        return self.labels[n] if n < len(self.labels) else ""
+
+
+def hint_alphabet(keys:str) -> str:
+    # Unique printable keys, minus digits and the menu's command keys
+    alphabet = []
+    for c in keys:
+        if c.isprintable() and not c.isdigit() and not c.isspace() and c not in "q\\/" and c not in alphabet:
+            alphabet.append(c)
+    return ''.join(alphabet)
+
+
+class MenuView(object):
+    """ Draws the chooser on stderr: one viewport-sized page of rows plus the
+    command line, composed into a single write.  Only the visible page is ever
+    formatted, so drawing costs the same for 20 matches or 100k.  On redraw,
+    only rows which changed are rewritten; the cursor is walked over the others. """
+    def __init__(self, hints:HintLabels=None):
+        self.hints = hints
+        self.rows:List[str] = None  # What's on screen now, None before first draw
+        self.menu_line:str = None
+        self.below:int = 0  # Lines written under the command line since the draw
+        self.top:int = 0  # Index of the first visible entry
+        self.selected:int = 0
+
+    @property
+    def page(self) -> int:
+        # Leave room for the index header, command line and prompt
+        return max(3, shutil.get_terminal_size().lines - 3)
+
+    def fit(self, text:str, key:str, width:int) -> str:
+        # Trim long paths from the left so that each row is one screen line
+        hint = self.hints.label(int(key)) if self.hints else ""
+        width -= len(key) + len(hint) + 5
+        if width > 3 and len(text) > width:
+            text = "..." + text[len(text) - width + 3:]
+        if key == str(self.selected):
+            text = invert(text)
+        if hint:
+            return f"  {text} {red(key)} {purp(hint)}"
+        return f"  {text} {red(key)}"
+
+    def follow(self, value:str) -> bool:
+        # Keep the selection typed/arrowed into the prompt buffer on screen.
+        # Returns True if the view needs a redraw.
+        try:
+            sel = int(value)
+        except (TypeError, ValueError):
+            return False
+        top = self.top
+        if sel < top:
+            top = sel
+        elif sel >= top + self.page:
+            top = sel - self.page + 1
+        changed = top != self.top or (use_ansiterm and sel != self.selected)
+        self.top, self.selected = top, sel
+        return changed
+
+    def reset(self) -> None:
+        self.top = self.selected = 0
+
+    def draw(self, dx:OrderedDict) -> None:
+        commands = menu_commands(dx)
+        count = len(dx) - len(commands)
+        page = self.page
+        self.top = max(0, min(self.top, count - page))
+        width = shutil.get_terminal_size().columns
+        stop = min(count, self.top + page)
+        rows=[ self.fit(dx[str(n)][0], str(n), width) for n in range(self.top, stop) ]
+        menu_items=[ f"{red(i[1:])}{grey(dx[i][0])}" for i in commands ]
+        if count > page:
+            menu_items.append(grey(f"[{self.top + 1}-{stop} of {count}, PgUp/PgDn]"))
+        menu_line = '   '.join(menu_items)
+        old = self.rows
+        out = []
+        if old is None or not use_ansiterm:
+            out.extend(f"{row}\n" for row in rows)
+            out.append(menu_line)
+            out.append('\n')
+        else:
+            # Back up to the first row, then rewrite only what changed:
+            out.append(f"\033[{len(old) + 1 + self.below}A\r")
+            for n, row in enumerate(rows):
+                if n < len(old) and old[n] == row:
+                    out.append("\033[1B")
+                else:
+                    out.append(f"\033[K{row}\n")
+            if len(rows) != len(old) or menu_line != self.menu_line:
+                out.append(f"\033[K{menu_line}\n")
+            else:
+                out.append("\033[1B")
+            out.append("\033[J")  # Clear leftovers when the list got shorter
+        sys.stderr.write(''.join(out))
+        sys.stderr.flush()
+        self.rows = rows
+        self.menu_line = menu_line
+        self.below = 0
+
+
+def displayMatchingEntries(dx:OrderedDict,ix_path:str) -> None:
+    MenuView().draw(dx)
 
-def prompt(msg:str,defValue:str,handler:Callable[[str],str]) -> str:
+def prompt(msg:str,defValue:str,handler:Callable[[str],str],keys:Iterator[str]=None) -> str:
     # Ansi codes from https://tldp.org/HOWTO/Bash-Prompt-HOWTO/x361.html
     #  esc[nnD << Move cursor left nn columns
     #  esc[K << Clear to end of line
     #  esc[s << Save cursor position
     #  esc[u << Restore saved cursor position
+    # keys comes from a raw_kbd_session() owned by the caller; if there's none,
+    # we open one just for this prompt.
+    if keys is None:
+        with raw_kbd_session() as keys:
+            return prompt(msg,defValue,handler,keys)
     try:
         value=defValue
         while True:
@@ -551,7 +1385,7 @@ def prompt(msg:str,defValue:str,handler:Callable[[str],str]) -> str:
             else:
                 sys.stderr.write(f"{msg}: {value}")
             sys.stderr.flush()
-            c = next(getraw_kbd())
+            c = next(keys)
             value = handler(c)
     finally:
         sys.stderr.write('\n')
@@ -569,14 +1403,45 @@ def multiple_numeric_candidates(buff:str, dx:OrderedDict):
         return False
     return True
 
-def prompt_editor(vstrbuff:List[str],dx:OrderedDict,c:str) -> str:
+navigation_steps = {'up': -1, 'down': 1, 'pgup': -10, 'pgdn': 10}
+
+def navigate_selection(vstrbuff:List[str],dx:OrderedDict,key:SpecialKey,page:int=None) -> str:
+    # Arrow and paging keys move the numeric selection shown in the prompt
+    # buffer; Enter then chooses it.  'page' overrides the PgUp/PgDn step.
+    count = entry_count(dx)
+    try:
+        cur = int(vstrbuff[0])
+    except ValueError:
+        cur = 0
+    if key.name == 'home':
+        cur = 0
+    elif key.name == 'end':
+        cur = count - 1
+    elif page and key.name in ('pgup', 'pgdn'):
+        cur += page if key.name == 'pgdn' else -page
+    elif key.name in navigation_steps:
+        cur += navigation_steps[key.name]
+    else:
+        return vstrbuff[0]
+    vstrbuff[0] = str(max(0, min(count - 1, cur)))
+    return vstrbuff[0]
+
+def prompt_editor(vstrbuff:List[str],dx:OrderedDict,c:str,filter_text:str=None,page:int=None,hints:HintLabels=None) -> str:
     # this is called from prompt() for each char read from kbd.  If we
     # return a buffer, that becomes the new edit contents.  If we
     # throw a trap, that bubbles up to the editor's caller.
+    # If filter_text isn't None, type-to-filter is on: letters (anything that's
+    # not a digit or a command key) raise UserFilterTrap with the new filter.
+    # If hints are given, their keys select by label instead.
+    if isinstance(c, SpecialKey):
+        logging.info(f"prompt_editor({c!r})")
+        return navigate_selection(vstrbuff,dx,c,page)
     logging.info(f"prompt_editor({ord(c)}:{c})")
     if ord(c) == 3: # Ctrl+C
         raise KeyboardInterrupt
     elif ord(c) == 127:  # Backspace
+        if filter_text and vstrbuff[0] in ("", "0"):
+            raise UserFilterTrap(filter_text[:-1])
         vstrbuff[0] = vstrbuff[0][:-1]
         logging.info(f"Erase, now: {vstrbuff[0]}")
         return vstrbuff[0]
@@ -590,9 +1455,19 @@ def prompt_editor(vstrbuff:List[str],dx:OrderedDict,c:str) -> str:
             raise UserBadEntryTrap(vstrbuff[0])
 
     elif ord(c) == 27:  # Esc
+        if filter_text:
+            raise UserFilterTrap("")
         logging.info('[esc]: reset buffer')
         vstrbuff[0]=""
         return vstrbuff[0]
+    elif hints is not None and c in hints.alphabet:
+        label = vstrbuff[0] + c if vstrbuff[0] in hints.prefixes else c
+        if label in hints.lookup:
+            raise UserSelectionTrap(hints.lookup[label])
+        vstrbuff[0] = label if label in hints.prefixes else ""
+        return vstrbuff[0]
+    elif filter_text is not None and c.isprintable() and not c.isdigit() and f"%{c}" not in dx:
+        raise UserFilterTrap(filter_text + c)
     elif vstrbuff[0]=="0":
         if c=='0':
             raise UserSelectionTrap(0)
@@ -621,39 +1496,80 @@ def prompt_editor(vstrbuff:List[str],dx:OrderedDict,c:str) -> str:
         logging.info(f"User input [{vstrbuff[0]}] doesn't match anything")
         return vstrbuff[0]
 
+def menu_dict(cands:List[Tuple[str,int,str]]) -> OrderedDict:
+    # Number the candidates for the menu and add the command keys:
+    dx = OrderedDict( {str(n):(m[0],None) for n,m in enumerate(cands)} )
+    dx['%q'] = ('<Quit>',KeyboardInterrupt)
+    dx['%\\'] = ('<Up Tree>',UserUpTrap)
+    dx['%/'] = ('<Down Tree>', UserDownTrap)
+    return dx
+
+
 def promptMatchingEntry(mx:List[Tuple[str,int]], ix:IndexContent ) ->Tuple[IndexContent,str]:
     # Prompt user to select from set of matching entries.  Return
     # tuple of (mx, selected-entry)
-    def get_selector():
-        c = -1
-        while True:
-            c += 1
-            yield c
-
-    sel = iter(get_selector())
+    #
+    # Typing letters narrows the list in place: each one filters the
+    # previous candidate set (not the whole index), and Backspace/Esc widen
+    # it again from the stack of earlier sets.  If $NavdexHintKeys is set,
+    # its keys select entries by hint label instead of filtering.
     ixdir=dirname(ix.path)
+    # mx is ranked already, and numbered as for 'to <pattern> N':
     mx_ord=[ ( abbreviate_path( e[0],ixdir ), e[1], e[0] ) for e in mx ]
-    mx_ord=sorted( mx_ord, key=lambda e: len(e[0])/e[1] )
-    dx = OrderedDict( {str(next(sel)):(m[0],None) for m in mx_ord} )
+    narrowed=[mx_ord]  # narrowed[n] is the candidate set for filter_text[:n]
+    filter_text=""
+    dx = menu_dict(mx_ord)
+    hints = None
+    if os.environ.get(navdexHintKeysKey):
+        hints = HintLabels(len(mx_ord), os.environ[navdexHintKeysKey])
+        filter_text = None  # Letters are labels now
     sys.stderr.write(f"{yellow(':: Index:')} {green(dirname(ix.path))}\n")
-    dx['%q'] = ('<Quit>',KeyboardInterrupt)
-    dx['%\\'] = ('<Up Tree>',UserUpTrap)
-    dx['%/'] = ('<Down Tree>', UserDownTrap)
-    displayMatchingEntries(dx,dirname(ix.path))
-    while True:
-        vstrbuff=["0"]
-        try:
-            prompt("Choose", 0,lambda c: prompt_editor(vstrbuff,dx,c))
-        except UserSelectionTrap as s:
-            selection_ofs=s.args[0]
-            logging.info(f"UserSelectionTrap:{s}")
-            return (mx_ord, mx_ord[selection_ofs][2])
-        except UserBadEntryTrap as sv:
-            logging.error(f"Bad user entry: {sv}")
-            continue
-        except KeyboardInterrupt:
-            logging.info("User Ctrl+C in promptMatchingEntry")
-            return (mx_ord, "!echo Ctrl+C")
+    view = MenuView(hints)
+    view.draw(dx)
+
+    def editor(vstrbuff:List[str], c:str) -> str:
+        value = prompt_editor(vstrbuff,dx,c,filter_text,view.page,hints)
+        if view.follow(value):
+            view.draw(dx)  # Scroll/highlight; prompt() rewrites its line after
+        return value
+
+    # One raw terminal session for the whole menu, rather than per keystroke:
+    with raw_kbd_session() as keys:
+        while True:
+            vstrbuff=["0"]
+            msg = f"Choose [{filter_text}]" if filter_text else "Choose"
+            try:
+                prompt(msg, 0,lambda c: editor(vstrbuff,c),keys)
+            except UserSelectionTrap as s:
+                selection_ofs=s.args[0]
+                logging.info(f"UserSelectionTrap:{s}")
+                return (mx_ord, narrowed[-1][selection_ofs][2])
+            except UserBadEntryTrap as sv:
+                logging.error(f"Bad user entry: {sv}")
+                view.below += 1
+                continue
+            except UserFilterTrap as f:
+                view.below += 1
+                new_filter = f.args[0]
+                if len(new_filter) <= len(filter_text):
+                    del narrowed[len(new_filter)+1:]
+                else:
+                    needle = new_filter.lower()
+                    cands = [m for m in narrowed[-1] if needle in m[0].lower()]
+                    if not cands:
+                        sys.stderr.write('\a')  # Nothing left: ignore that key
+                        continue
+                    if len(cands) == 1:
+                        logging.info(f"Filter [{new_filter}] selects {cands[0][2]}")
+                        return (mx_ord, cands[0][2])
+                    narrowed.append(cands)
+                filter_text = new_filter
+                dx = menu_dict(narrowed[-1])
+                view.reset()
+                view.draw(dx)
+            except KeyboardInterrupt:
+                logging.info("User Ctrl+C in promptMatchingEntry")
+                return (mx_ord, "!echo Ctrl+C")
 
 
 
@@ -698,6 +1614,50 @@ def addDirsToIndex(xargs:List[str], recurse:bool):
                     xAdd(r + "/" + d,priority)
 
 
+def learnHistory(histfile:str=None) -> None:
+    """ Merge the dirs cd'd to in a shell history file into the active index
+    (see navdex_history), reading only what was added since the last time """
+    histfile = histfile or environ_path("HISTFILE") or "/".join([home_path, ".bash_history"])
+    if not isfile(histfile):
+        sys.stderr.write("No history file %s\n" % histfile)
+        return
+    ix = loadIndex()
+    learner = HistoryLearner(normalize_path(histfile,to_unix=False), home_path)
+    seen = learner.read()
+    root = ix.indexRoot()
+    dirs = sorted(dir for dir in seen if dir not in (root, "/"))
+    exists = dict(zip(dirs, orderedParallelMap(isdir, dirs)))
+    survivors = [(dir, learnedPriority(seen[dir])) for dir in dirs if exists[dir]]
+    learner.forget([dir for dir in seen if not exists.get(dir)])
+    changed = ix.mergeDirs(survivors)
+    if changed:
+        ix.write()
+    learner.save()
+    sys.stderr.write("%s: %d new lines, %d dirs found, %d added or raised in %s\n"
+                     % (histfile, learner.lines, len(survivors), changed, ix.path))
+
+
+def scanIntoIndex(root:str=None, maxDepth:int=None, maxDirs:int=None, priority:int=1, gitIndex:bool=False) -> None:
+    """ Add root and the dirs below it to the active index, crawling them in
+    parallel (see navdex_scan) and merging them in one batch.  With gitIndex,
+    the dirs of git checkouts are read from their .git/index instead. """
+    root = normalize_path(os.path.abspath(normalize_path(root or pwd(),to_unix=False)),to_unix=True)
+    if not isdir(root):
+        sys.stderr.write("%s is not a dir\n" % root)
+        return
+    ix = loadIndex()
+    scanner = TreeScanner(normalize_path(root,to_unix=False), maxDepth, maxDirs, gitIndex=gitIndex)
+    dirs = [normalize_path(dir,to_unix=True) for dir in scanner.scan()]
+    if root != ix.indexRoot():
+        dirs.append(root)
+    changed = ix.mergeDirs((dir, priority) for dir in dirs)
+    if changed:
+        ix.write()
+    repos = ", %d git indexes read" % len(scanner.repos) if scanner.repos else ""
+    sys.stderr.write("%s: %d dirs found%s%s, %d added or raised in %s\n"
+                     % (root, len(dirs), " (capped)" if scanner.truncated else "", repos, changed, ix.path))
+
+
 def delCwdFromIndex():
     """ Delete current dir from active index """
     cwd = pwd()
@@ -750,6 +1710,75 @@ def cleanIndex():
     ix.clean()
 
 
+def shardIndex(count:int) -> None:
+    """ Split the active index into 'count' shards, or merge it back if 0 """
+    ix = loadIndex()
+    if count > 0:
+        ix = ShardedIndexContent.create(ix.path, list(ix), count)
+        sys.stderr.write("%s: %d dirs in %d shards under %s\n" % (ix.path, len(ix), len(ix.shardIds()), ix.shardDir))
+    elif isinstance(ix, ShardedIndexContent):
+        ix = ix.unshard()
+        sys.stderr.write("%s: %d dirs merged back from shards\n" % (ix.path, len(ix)))
+    else:
+        sys.stderr.write("%s is not sharded\n" % ix.path)
+
+
+def indexBytes(ix:IndexContent) -> int:
+    """ Size of ix's entries as written to its file(s) """
+    return sum(len(("%s %d\n" % entry).encode()) for entry in ix)
+
+
+def compactChain(xdir:str=None) -> None:
+    """ Compact each index of the chain from xdir (default the current dir)
+    up, as `to //` searches it.  The precedence:
+
+    - each entry is put in canonical form (canonicalDir()), and a dir held
+      more than once by an index keeps one entry, with the highest priority
+    - a dir strictly below the root of an inner index which also holds it is
+      shadowed there: the outer entry is removed, and the inner one keeps the
+      higher of the two priorities.  Inner index roots themselves stay in outer
+      indices, so `to proj src` still gets from outside to the inner entries.
+    - other duplicates across the chain are kept: each index is also searched
+      without the others """
+    ix = loadIndex(xdir or pwd(), True)
+    chain, seen = [], set()
+    while ix is not None:
+        if ix.path not in seen:
+            seen.add(ix.path)
+            chain.append(ix)
+        ix = ix.outer
+    inner = []  # (root prefix, {absolute dir: priority}, index) of the indices compacted so far, innermost first
+    before, changed = {}, set()
+    for ix in chain:
+        root = ix.indexRoot()
+        before[ix.path] = (len(ix), indexBytes(ix))
+        shadowed = set()
+        for dir, priority in ix:
+            dir = canonicalDir(dir, root)
+            full = absoluteDir(dir, root)
+            for prefix, dirs, innerIx in inner:
+                if full.startswith(prefix) and full in dirs:
+                    shadowed.add(dir)
+                    if dirs[full] < priority:
+                        dirs[full] = priority
+                        innerIx.mergeDirs([(full, priority)])
+                        changed.add(innerIx.path)
+                    break
+        if ix.compact(frozenset(shadowed)):
+            changed.add(ix.path)
+        inner.insert(0, (root.rstrip("/") + "/", {absoluteDir(dir, root): priority for dir, priority in ix}, ix))
+    totals = [0, 0, 0, 0]
+    for ix in chain:
+        if ix.path in changed:
+            ix.write()
+        counts = before[ix.path] + (len(ix), indexBytes(ix))  # Dirs and bytes before, then after
+        sys.stderr.write("%s: %d -> %d dirs, %d -> %d bytes\n" % (ix.path, counts[0], counts[2], counts[1], counts[3]))
+        totals = [total + n for total, n in zip(totals, counts)]
+    if len(chain) > 1:
+        sys.stderr.write("Chain of %d indices: %d -> %d dirs, %d -> %d bytes\n"
+                         % (len(chain), totals[0], totals[2], totals[1], totals[3]))
+
+
 def hasNavdexAuto(dir:str) -> bool:
     xf = "/".join([dir, ".navdex-auto"])
     return isfile(xf), xf
@@ -764,40 +1793,278 @@ def editNavdexAutoHere(templateFile:str) -> None:
     print("!!$EDITOR %s" % ".navdex-auto")
 
 
+grepWorkers:int = 8  # Threads reading .navdex-auto metadata for printGrep
+grepWindow:int = 256  # Max metadata reads in flight ahead of the output
+
+
+def orderedParallelMap(fn:Callable, items:Iterable, workers:int=grepWorkers, window:int=grepWindow) -> Iterator:
+    """ Like map(fn, items), but fn runs on a thread pool.  Results are yielded
+    in input order as soon as each one (and all before it) is ready, with at most
+    'window' calls in flight, so memory stays bounded for huge inputs. """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def readAutoMeta(dir:str) -> Tuple[List[str],str]:
+    """ Return (tags, desc) from dir/.navdex-auto, or None if there's no such
+    file.  Same results as AutoContent.tags()/desc(), but reads only as far as
+    needed to find both lines. """
+    tags, desc = None, None
+    try:
+        with open(normalize_path("/".join([dir, ".navdex-auto"]),to_unix=False), "r") as f:
+            for line in f:
+                if tags is None and line.startswith("# .TAGS:"):
+                    tags = line[8:].split()
+                elif desc is None and line.startswith("# .DESC:"):
+                    desc = line[8:].rstrip()
+                if tags is not None and desc is not None:
+                    break
+    except OSError:
+        return None
+    return (tags or [], desc or "")
+
+
+metaFileBase:str = ".navdex-meta"
+metaBatch:int = 64  # Dirs per thread-pool task when refreshing metadata
+
+
+class MetaCache(dict):
+    """Sidecar cache of parsed .navdex-auto TAGS/DESC for one index.
+
+    Maps absolute dir -> [mtime_ns, size, tags, desc] of its .navdex-auto, and is
+    persisted as JSON in .navdex-meta next to the index file.  lookup() costs one
+    stat() of the .navdex-auto; the file is only opened and parsed when its
+    mtime or size no longer matches the cached values.
+
+    Alongside, tagIndex is an inverted index of tag -> set of dirs, kept in step
+    with every change to the cache, so tag queries need no parsing beyond the
+    .navdex-auto files changed since the last search.
+
+    Worker threads only probe() the filesystem; the cache and tagIndex are
+    changed (apply()) on the thread that owns the MetaCache.
+    """
+
+    def __init__(self, ix:IndexContent):
+        self.path:str = "/".join([ix.indexRoot(), metaFileBase])
+        self.dirty:bool = False
+        self.loaded:bool = False  # True if the sidecar existed and was read
+        self.tagIndex:Dict[str,set] = {}
+        try:
+            with open(normalize_path(self.path,to_unix=False), "r") as f:
+                content = json.load(f)
+            if content.get("version") == 1:
+                for dir, cached in content["entries"].items():
+                    self[dir] = cached
+                self.loaded = True
+        except (OSError, ValueError, KeyError, AttributeError, TypeError, IndexError):
+            # Missing or unreadable cache: start empty
+            self.clear()
+            self.tagIndex.clear()
+
+    def __setitem__(self, dir:str, cached:list) -> None:
+        self._unindexTags(dir)
+        dict.__setitem__(self, dir, cached)
+        for tag in cached[2]:
+            self.tagIndex.setdefault(tag, set()).add(dir)
+
+    def __delitem__(self, dir:str) -> None:
+        self._unindexTags(dir)
+        dict.__delitem__(self, dir)
+
+    def pop(self, dir:str, default=None):
+        self._unindexTags(dir)
+        return dict.pop(self, dir, default)
+
+    def _unindexTags(self, dir:str) -> None:
+        cached = self.get(dir)
+        if not cached:
+            return
+        for tag in cached[2]:
+            posting = self.tagIndex.get(tag)
+            if posting is not None:
+                posting.discard(dir)
+                if not posting:
+                    del self.tagIndex[tag]
+
+    def dirsWithTags(self, tags:List[str]) -> set:
+        """ Return the set of dirs having all of 'tags', intersecting the
+        posting lists smallest-first """
+        postings = sorted((self.tagIndex.get(t, set()) for t in tags), key=len)
+        if not postings:
+            return set()
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def cached(self, dir:str) -> Tuple[List[str],str]:
+        """ Return cached (tags, desc) for dir without touching the filesystem """
+        cached = self.get(dir)
+        if not cached:
+            return None
+        return (cached[2], cached[3])
+
+    def probe(self, dir:str) -> Tuple[list,Tuple[List[str],str]]:
+        """ Return (cache entry, (tags, desc)) for dir, both None if it has no
+        .navdex-auto, stat()ing it and parsing it if changed.  The cache isn't
+        modified, so this is safe on a worker thread. """
+        try:
+            st = os.stat(normalize_path("/".join([dir, ".navdex-auto"]),to_unix=False))
+        except OSError:
+            return None, None
+        cached = self.get(dir)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached, (cached[2], cached[3])
+        meta = readAutoMeta(dir)
+        if meta is None:
+            return None, None
+        return [st.st_mtime_ns, st.st_size, meta[0], meta[1]], meta
+
+    def apply(self, dir:str, cached:list) -> None:
+        """ Record the cache entry probe() returned for dir """
+        if cached is None:
+            if self.pop(dir, None) is not None:
+                self.dirty = True
+        elif self.get(dir) is not cached:
+            self[dir] = cached
+            self.dirty = True
+
+    def lookup(self, dir:str) -> Tuple[List[str],str]:
+        """ Return (tags, desc) for dir, or None if it has no .navdex-auto """
+        cached, meta = self.probe(dir)
+        self.apply(dir, cached)
+        return meta
+
+    def recheck(self, dirs:Iterable[str]) -> Iterator[Tuple[str,Tuple[List[str],str]]]:
+        """ Yield (dir, meta) for each of dirs, in order, bringing their cache
+        entries up to date.  Probes are made in batches of metaBatch dirs
+        fanned out to the thread pool; the results are applied here. """
+
+        def batches():
+            batch = []
+            for d in dirs:
+                batch.append(d)
+                if len(batch) >= metaBatch:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        for batch, probes in orderedParallelMap(lambda b: (b, [self.probe(d) for d in b]), batches()):
+            for dir, (cached, meta) in zip(batch, probes):
+                self.apply(dir, cached)
+                yield dir, meta
+
+    def refresh(self, dirs:Iterable[str]) -> Iterator[Tuple[str,Tuple[List[str],str]]]:
+        """ Like recheck(), but cached dirs which aren't in 'dirs' are then
+        dropped. """
+        seen = set()
+
+        def tracked():
+            for d in dirs:
+                seen.add(d)
+                yield d
+
+        yield from self.recheck(tracked())
+        for stale in [d for d in self if d not in seen]:
+            del self[stale]
+            self.dirty = True
+
+    def save(self) -> None:
+        """ Write the cache back if anything changed.  The cache is optional, so
+        failure to write it (e.g. read-only index dir) is only logged. """
+        if not self.dirty:
+            return
+        ospath = normalize_path(self.path,to_unix=False)
+        try:
+            with NamedTemporaryFile(mode='w', dir=os.path.dirname(ospath), prefix=metaFileBase, delete=False) as tmpfile:
+                json.dump({"version": 1, "entries": self}, tmpfile)
+            os.replace(tmpfile.name, ospath)
+            self.dirty = False
+        except OSError as e:
+            logging.warning(f"Unable to write {self.path}: {e}")
+
+
+def grepLine(dir:str, meta:Tuple[List[str],str]) -> str:
+    """ Render one line of 'to -g' output """
+    if meta is None:
+        return dir
+    return "%s [.TAGS: %s] %s" % (dir, ",".join(meta[0]), meta[1])
+
+
+def printTagQuery(tags:List[str], ostream=None) -> bool:
+    """ Print index dirs whose .TAGS include every one of 'tags', in the index's
+    ranking order.  Answered from the MetaCache tag index, once it's brought
+    up to date: every indexed dir's .navdex-auto is stat()ed (on the thread
+    pool), and only those added or changed since the last search are parsed.
+    Returns True if anything was printed. """
+    ostream = ostream or sys.stdout
+    ix = loadIndex()
+    meta = MetaCache(ix)
+    for _ in meta.refresh(ix.absPath(entry[0]) for entry in ix):
+        ...
+    meta.save()
+    hits = meta.dirsWithTags(tags)
+    if hits:
+        matched = ((ix.absPath(entry[0]), entry[1]) for entry in ix)
+        ranked = sorted((entry for entry in matched if entry[0] in hits), key=rankKey)
+    else:
+        ranked = []
+    sys.stdout.write("!")
+    matchCnt = 0
+    for dir, _ in ranked:
+        if dir in hits:
+            hits.discard(dir)  # Print each dir once, even if indexed twice
+            matchCnt += 1
+            ostream.write(grepLine(dir, meta.cached(dir)))
+            ostream.write("\n")
+    return matchCnt > 0
+
+
 def printGrep(pattern, ostream=None):
+    """ Print index dirs (with .navdex-auto tags and description) matching the
+    regular expression 'pattern', or all of them if there's no pattern.
+    Metadata comes from the index's MetaCache, refreshed on a thread pool, and
+    lines are streamed out in index order as they're matched.  Returns True if
+    anything was printed.
+
+    A pattern of the form 'tag:foo,bar' is a tag query instead: see
+    printTagQuery(). """
+    if pattern and pattern.startswith("tag:"):
+        return printTagQuery([t for t in pattern[4:].split(",") if t], ostream)
+    rx = None
     if pattern:
-        ostream = StringIO()
-    else:
-        ostream = sys.stdout
+        try:
+            rx = re.compile(pattern)
+        except re.error as e:
+            sys.stderr.write("Bad regular expression [%s]: %s\n" % (pattern, e))
+            return False
+    ostream = ostream or sys.stdout
     ix = loadIndex()
+    meta = MetaCache(ix)
     sys.stdout.write("!")
-    for entry in ix:
-        dir=entry[0]
-        dir = ix.absPath(dir)
-        ostream.write(dir)
-        has, autoPath = hasNavdexAuto(dir)
-        if has:
-            cnt = AutoContent(autoPath)
-            ostream.write(" [.TAGS: %s] " % (",".join(cnt.tags())))
-            ostream.write(cnt.desc())
-        ostream.write("\n")
 
     matchCnt = 0
-    if not pattern:
-        return len(ix) > 0
-    else:
-        # Match the pattern and print matches
-        lines = ostream.getvalue().split("\n")
-        for line in lines:
-            try:
-                vv = re.search(pattern, line)
-                if vv:
-                    matchCnt += 1
-                    print(line)
-            except:
-                pass
-
-        return matchCnt > 0
+    try:
+        for dir, m in meta.refresh(ix.absPath(entry[0]) for entry in ix):
+            line = grepLine(dir, m)
+            if rx is None or rx.search(line):
+                matchCnt += 1
+                ostream.write(line)
+                ostream.write("\n")
+                if rx is not None:
+                    ostream.flush()
+    finally:
+        meta.save()
+    return matchCnt > 0
 
 
 if __name__ == "__main__":
@@ -829,6 +2096,42 @@ if __name__ == "__main__":
         dest="add_to_index",
         help="Add to index: <priority> <path> (-r to recurse all)",
     )
+    p.add_argument(
+        "--scan",
+        nargs="?",
+        const="",
+        dest="scan",
+        metavar="ROOT",
+        help="Add ROOT (default the current dir) and the dirs below it to the index, skipping hidden dirs, those excluded by .gitignore/.navdexignore files, and other filesystems",
+    )
+    p.add_argument(
+        "--depth",
+        type=int,
+        dest="scan_depth",
+        metavar="N",
+        help="With --scan, go at most N levels below ROOT",
+    )
+    p.add_argument(
+        "--max-dirs",
+        type=int,
+        dest="scan_max",
+        metavar="N",
+        help="With --scan, add at most N dirs",
+    )
+    p.add_argument(
+        "--git",
+        action="store_true",
+        dest="scan_git",
+        help="With --scan, take the dirs of git checkouts from their .git/index instead of walking them",
+    )
+    p.add_argument(
+        "--learn-history",
+        nargs="?",
+        const="",
+        dest="learn_history",
+        metavar="FILE",
+        help="Add the dirs cd'd to in a shell history file (default $HISTFILE or ~/.bash_history) to the index, with priorities from how often they were visited.  Only lines added since the last run are read",
+    )
     p.add_argument(
         "-d",
         "--del-dir",
@@ -839,6 +2142,21 @@ if __name__ == "__main__":
     p.add_argument(
         "-c", "--cleanup", action="store_true", dest="cleanindex", help="Cleanup index"
     )
+    p.add_argument(
+        "--shard",
+        nargs="?",
+        type=int,
+        const=defaultShardCount,
+        dest="shard",
+        metavar="N",
+        help=f"Split the active index into N shard files (default {defaultShardCount}) for faster search of large indices; 0 merges them back",
+    )
+    p.add_argument(
+        "--compact",
+        action="store_true",
+        dest="compact",
+        help="Normalize the entries of each index from here up, and remove duplicates: within an index, and outer entries for dirs an inner index already holds below its root",
+    )
     p.add_argument(
         "-q",
         "--query",
@@ -846,6 +2164,12 @@ if __name__ == "__main__":
         dest="indexinfo",
         help="Print index information/location",
     )
+    p.add_argument(
+        "--stats",
+        action="store_true",
+        dest="stats",
+        help="Print p50/p95/p99 search latencies per phase and per index, from the records in $NavdexStatsFile (default ~/.navdex-stats)",
+    )
     p.add_argument(
         "-e", "--edit", action="store_true", dest="editindex", help="Edit the index"
     )
@@ -868,7 +2192,7 @@ if __name__ == "__main__":
         "--grep",
         action="store_true",
         dest="do_grep",
-        help="Match dirnames and .navdex-auto search properties against a regular expression",
+        help="Match dirnames and .navdex-auto search properties against a regular expression, or use 'tag:foo,bar' to list dirs having all the given .TAGS",
     )
     # p.add_argument("patterns", nargs='?', help="Pattern(s) to match. If final arg is integer, it is treated as list index. ")
     # p.add_argument(
@@ -907,10 +2231,22 @@ if __name__ == "__main__":
         delCwdFromIndex()
         empty = False
 
+    if args.scan is not None:
+        scanIntoIndex(args.scan, args.scan_depth, args.scan_max, gitIndex=args.scan_git)
+        empty = False
+
+    if args.learn_history is not None:
+        learnHistory(args.learn_history)
+        empty = False
+
     if args.indexinfo:
         printIndexInfo(findIndex())
         empty = False
 
+    if args.stats:
+        printStats()
+        empty = False
+
     if args.editindex:
         editIndex()
         sys.exit(0)
@@ -919,6 +2255,14 @@ if __name__ == "__main__":
         cleanIndex()
         empty = False
 
+    if args.shard is not None:
+        shardIndex(args.shard)
+        empty = False
+
+    if args.compact:
+        compactChain()
+        empty = False
+
     if not patterns:
         if not empty:
             sys.exit(0)
@@ -929,6 +2273,7 @@ if __name__ == "__main__":
     rmode = ResolveMode.printonly if args.printonly else ResolveMode.userio
     res = (None,None)
     dirstack=[pwd()]
+    navdex_stats.begin(rmode, len(patterns))
     while True:
         try:
             res = resolvePatternToDir(patterns, rmode)
@@ -949,7 +2294,7 @@ if __name__ == "__main__":
             sys.stderr.write(f" ::: Relocating to {xdir}\n")
             os.chdir(xdir)
             os.environ['PWD'] = xdir
-
+    navdex_stats.end()
 
     if res[1]:
         print(res[1])
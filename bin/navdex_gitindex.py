@@ -0,0 +1,175 @@
+# navdex_gitindex.py
+"""Dirs of a git checkout, from its .git/index.
+
+git's index lists every tracked path, so the dirs of a checkout can be had
+from one read of that file instead of walking the working tree.  This parses
+the index format documented in git's Documentation/gitformat-index.txt:
+
+- a 12-byte header: "DIRC", version (2, 3 or 4), entry count
+- the entries, sorted by path.  Each has 40 bytes of stat data (mode at
+  offset 24), the object hash (20 bytes, or 32 in sha256 repos), 16 bits of
+  flags (low 12 bits: path length; 0x4000: v3+ extended flags follow), then
+  the path.  v2/v3 paths are NUL-terminated and padded so each entry is a
+  multiple of 8 bytes.  v4 paths are prefix-compressed: a varint count of
+  bytes to drop from the end of the previous path, then a NUL-terminated
+  suffix, with no padding.
+
+Entries with the gitlink mode are submodules.  Entries with the
+skip-worktree flag, which include the dir entries of a sparse index, aren't
+in the checkout and are left out.  A split index ("link" extension) holds
+only part of the entries, so it's reported as unreadable and the caller falls
+back to walking the tree.  Dirs are as of the last git command which wrote
+the index: a tracked dir deleted since is still listed until then.
+"""
+import logging
+import os
+import struct
+from typing import List, Set, Tuple
+
+modeGitlink: int = 0o160000
+skipWorktree: int = 0x4000  # In the extended flags
+_header = struct.Struct(">4sII")
+_u32 = struct.Struct(">I").unpack_from
+_u16 = struct.Struct(">H").unpack_from
+_statBytes = 40
+
+
+def gitDir(repo: str) -> str:
+    """ The git dir of the checkout at repo, or None if it isn't one: .git
+    itself, or where a .git file ('gitdir: ...', in worktrees and submodules)
+    points """
+    dotgit = os.path.join(repo, ".git")
+    if os.path.isdir(dotgit):
+        return dotgit
+    try:
+        with open(dotgit, "r") as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+    if not line.startswith("gitdir:"):
+        return None
+    return os.path.normpath(os.path.join(repo, line[7:].strip()))
+
+
+def hashSize(gitdir: str) -> int:
+    """ Bytes per object hash: 32 if the repo's config says objectformat =
+    sha256, else 20 """
+    configs = [os.path.join(gitdir, "config")]
+    try:
+        with open(os.path.join(gitdir, "commondir"), "r") as f:
+            configs.append(os.path.join(gitdir, f.read().strip(), "config"))
+    except OSError:
+        ...
+    for config in configs:
+        try:
+            with open(config, "r") as f:
+                for line in f:
+                    key, _, value = line.partition("=")
+                    if key.strip().lower() == "objectformat":
+                        return 32 if value.strip().lower() == "sha256" else 20
+        except OSError:
+            continue
+    return 20
+
+
+def _varint(data: bytes, pos: int) -> Tuple[int, int]:
+    # git's offset encoding: each continuation adds one before shifting
+    c = data[pos]
+    pos += 1
+    value = c & 0x7f
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7f)
+    return value, pos
+
+
+def parseIndex(data: bytes, hashBytes: int = 20) -> List[Tuple[bytes, int, int]]:
+    """ (path, mode, extended flags) of each entry of an index file's
+    contents.  Raises ValueError if it isn't one we can read. """
+    if len(data) < _header.size:
+        raise ValueError("truncated header")
+    signature, version, count = _header.unpack_from(data)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"not a git index (signature {signature!r}, version {version})")
+    entries = []
+    pos = _header.size
+    fixed = _statBytes + hashBytes + 2  # Bytes before the path, without extended flags
+    prev = b""
+    find = data.find
+    for _ in range(count):
+        if pos + fixed > len(data):
+            raise ValueError("truncated entry")
+        mode = _u32(data, pos + 24)[0]
+        flags = _u16(data, pos + fixed - 2)[0]
+        start = pos + fixed
+        extended = 0
+        if flags & 0x4000:
+            extended = _u16(data, start)[0]
+            start += 2
+        if version == 4:
+            drop, start = _varint(data, start)
+            end = find(b"\0", start)
+            if end < 0 or drop > len(prev):
+                raise ValueError("bad path")
+            path = prev[:len(prev) - drop] + data[start:end]
+            pos = end + 1
+        else:
+            length = flags & 0xfff
+            if length == 0xfff:
+                end = find(b"\0", start + length)  # Longer paths aren't counted
+            else:
+                end = start + length
+            if end < 0 or end > len(data):
+                raise ValueError("bad path")
+            path = data[start:end]
+            pos += (end - pos + 8) & ~7  # NUL padding to a multiple of 8
+        entries.append((path, mode, extended))
+        prev = path
+    if data.find(b"link", pos, pos + 4) == pos:
+        raise ValueError("split index")
+    return entries
+
+
+def readIndexFile(gitdir: str) -> List[Tuple[bytes, int, int]]:
+    """ The entries of gitdir/index, or None if there's no readable one """
+    fname = os.path.join(gitdir, "index")
+    try:
+        with open(fname, "rb") as f:
+            data = f.read()
+        return parseIndex(data, hashSize(gitdir))
+    except (OSError, ValueError) as e:
+        logging.info(f"Can't use git index {fname}: {e}")
+        return None
+
+
+def trackedDirs(repo: str, fileNames: Tuple[str, ...] = ()) -> Tuple[List[str], List[str], List[str]]:
+    """ (dirs, submodules, files) of the checkout at repo, relative to it and
+    sorted: every dir holding a checked out path, the submodule paths (also
+    among the dirs), and the checked out files named one of fileNames.  None
+    if repo has no index we can read. """
+    gitdir = gitDir(repo)
+    entries = readIndexFile(gitdir) if gitdir else None
+    if entries is None:
+        return None
+    dirs: Set[bytes] = set()
+    submodules, files = [], []
+    names = {name.encode("utf-8", "surrogateescape") for name in fileNames}
+    lastParent = None
+    for path, mode, extended in entries:
+        if extended & skipWorktree:
+            continue
+        if mode & 0o170000 == modeGitlink:
+            submodules.append(path)
+            dirs.add(path)
+        parent, _, name = path.rpartition(b"/")
+        if name in names:
+            files.append(path)
+        if parent == lastParent:
+            continue  # Entries are sorted, so siblings come together
+        lastParent = parent
+        while parent and parent not in dirs:
+            dirs.add(parent)
+            parent = parent.rpartition(b"/")[0]
+    decode = lambda p: p.decode("utf-8", "surrogateescape")  # noqa: E731
+    return sorted(map(decode, dirs)), [decode(p) for p in submodules], [decode(p) for p in files]
@@ -0,0 +1,191 @@
+# navdex_history.py
+"""Learning index entries from shell history.
+
+`to --learn-history [file]` reads a bash history file for the dirs which
+were cd'd to (cd, pushd, and `to` given a path), counts them, and merges the
+ones which still exist into the index with a priority which grows with the
+count (learnedPriority()).
+
+History has no record of the cwd, so HistoryParser follows it instead: an
+absolute target (like the `cd /path # cdmark` lines written by cdmark) sets
+it, and relative targets are resolved against it.  Until the cwd is known,
+and after a cd to something which can't be resolved ($VARS, a `to` search),
+relative targets are skipped.
+
+Runs are incremental: the state file (~/.navdex-history-state) holds, per
+history file, the byte offset reached, the cwd there, the counts so far, and
+the bytes just before the offset.  If those bytes have changed (bash
+truncated or rewrote the file) the file is read again from the start.  Only
+dirs which existed when they were read are counted on from run to run.
+"""
+import json
+import logging
+import math
+import os
+import re
+import shlex
+from typing import Dict, Iterator, List
+
+historyStateBase: str = ".navdex-history-state"
+maxLearnedPriority: int = 3
+tailBytes: int = 64  # Bytes before the offset kept to detect a rewritten file
+
+cdCommands = ("cd", "pushd", "cdx")
+separators = {"&&", "||", ";", "|", "&", "(", ")", ";;"}
+_timestamp = re.compile(r"^#\d+$")
+
+
+def learnedPriority(count: int) -> int:
+    """ 1 for a dir visited once, one more for each doubling of that """
+    return min(maxLearnedPriority, 1 + int(math.log2(max(count, 1))))
+
+
+class HistoryParser(object):
+    """ Follows the cwd through history lines, collecting cd targets """
+
+    def __init__(self, home: str, cwd: str = None):
+        self.home = home
+        self.cwd = cwd  # None while unknown
+        self.prev = None  # For 'cd -'
+
+    def resolve(self, target: str) -> str:
+        """ Absolute, normalized target, or None if it can't be known here """
+        if not target or "$" in target or "`" in target:
+            return None
+        if target == "-":
+            return self.prev
+        if target == "~" or target.startswith("~/"):
+            target = self.home + target[1:]
+        elif target.startswith("~"):
+            target = os.path.expanduser(target)
+            if target.startswith("~"):
+                return None
+        if not target.startswith("/"):
+            if self.cwd is None:
+                return None
+            target = "/".join([self.cwd, target])
+        return os.path.normpath(target).replace("//", "/")
+
+    def commands(self, line: str) -> Iterator[List[str]]:
+        lexer = shlex.shlex(line, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        words = []
+        for token in lexer:
+            if token in separators:
+                if words:
+                    yield words
+                words = []
+            else:
+                words.append(token)
+        if words:
+            yield words
+
+    def chdir(self, target: str) -> None:
+        self.prev, self.cwd = self.cwd, target
+
+    def targets(self, line: str) -> Iterator[str]:
+        """ The dirs changed to by the commands of one history line """
+        line = line.strip()
+        if not line or _timestamp.match(line):
+            return
+        try:
+            commands = list(self.commands(line))
+        except ValueError:
+            return  # Unbalanced quotes: a multi-line command
+        for words in commands:
+            if words[0] in ("builtin", "command") and len(words) > 1:
+                words = words[1:]
+            name, args = words[0], [w for w in words[1:] if w == "-" or not w.startswith(("-", "+"))]
+            if name in cdCommands:
+                if not args and name == "pushd":
+                    self.chdir(None)  # A swap or rotation of the dir stack
+                    continue
+                target = self.resolve(args[0] if args else "~")
+            elif name == "to":
+                if len(args) != len(words) - 1:
+                    continue  # Options: index maintenance, not a dir change
+                # Arguments to `to` are search patterns, unless they look like paths
+                if len(args) != 1 or not args[0].startswith(("/", "~", "./", "../")):
+                    self.chdir(None)
+                    continue
+                target = self.resolve(args[0])
+            else:
+                continue
+            self.chdir(target)
+            if target is not None:
+                yield target
+
+
+class HistoryLearner(object):
+    """ Reads the part of a history file added since the last run """
+
+    def __init__(self, histfile: str, home: str, statePath: str = None):
+        self.histfile = os.path.abspath(histfile)
+        self.statePath = statePath or os.path.join(home, historyStateBase)
+        self.state = self.loadState()
+        entry = self.state.get(self.histfile) or {}
+        self.offset = entry.get("offset", 0)
+        self.counts: Dict[str, int] = entry.get("counts", {})
+        self.parser = HistoryParser(home, entry.get("cwd"))
+        self.lines = 0
+        if self.offset and not self.sameTail(entry.get("tail", "")):
+            logging.info(f"{self.histfile} was rewritten, learning it from the start")
+            self.offset = 0
+            self.counts = {}  # Entries learned already keep their priorities
+            self.parser = HistoryParser(home)
+
+    def loadState(self) -> dict:
+        try:
+            with open(self.statePath, "r") as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def sameTail(self, tail: str) -> bool:
+        try:
+            with open(self.histfile, "rb") as f:
+                start = max(0, self.offset - tailBytes)
+                f.seek(start)
+                return f.read(self.offset - start).hex() == tail
+        except OSError:
+            return False
+
+    def read(self) -> Dict[str, int]:
+        """ Count the cd targets of the complete lines after the offset.
+        Returns the total counts (this run's and earlier ones) of the dirs seen
+        in this run. """
+        seen = {}
+        with open(self.histfile, "rb") as f:
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Partly written: take it next time
+                self.offset += len(raw)
+                self.lines += 1
+                for target in self.parser.targets(raw.decode("utf-8", "surrogateescape")):
+                    seen[target] = self.counts[target] = self.counts.get(target, 0) + 1
+            start = max(0, self.offset - tailBytes)
+            f.seek(start)
+            self.tail = f.read(self.offset - start).hex()
+        return seen
+
+    def forget(self, dirs: List[str]) -> None:
+        """ Drop the counts of dirs, e.g. those which don't exist, so the
+        state file only holds dirs which were worth learning """
+        for dir in dirs:
+            self.counts.pop(dir, None)
+
+    def save(self) -> None:
+        """ Write the state back.  Failure to (e.g. an unwritable HOME) is
+        only logged: the index has been updated already, and the next run
+        reads from the last offset saved. """
+        self.state[self.histfile] = {"offset": self.offset, "tail": self.tail, "cwd": self.parser.cwd,
+                                     "counts": self.counts}
+        tmp = self.statePath + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp, self.statePath)
+        except OSError as e:
+            logging.warning(f"Unable to write {self.statePath}: {e}")
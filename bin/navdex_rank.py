@@ -0,0 +1,128 @@
+# navdex_rank.py
+"""Precomputed ranking order of an index's entries.
+
+Matches are ranked by rankKey(): len(path)/priority, lowest first, with ties
+kept in index (path) order.  An index is stored sorted by path, so ranking
+its matches takes a sort per search.  The .navdex-rank sidecar holds that
+order, worked out once per change of the index, for both ways matchPaths()
+renders entries:
+
+- local: the path as held in the index (an index's own entries)
+- full: the absolute path (the outer indices of a chain, and entries which
+  aren't dirs relative to the cwd)
+
+For each it holds the permutation of the entries into rank order, and each
+entry's position in it (the rank column).  The sidecar is stamped like the
+.navdex-summary, with the index file's mtime and size, plus the entry count
+and the length of the index root, which the full keys depend on.  A stale
+sidecar is ignored and rewritten.  Small indices, below rankMinEntries, don't
+get one: sorting their matches costs nothing to speak of.
+
+Searches stop early on the premise that rendering an entry can only raise
+its key.  That holds for positive priorities only, so the sidecar also
+records whether every priority is positive (RankOrder.monotone).
+
+File layout: a header (magic, version, flags, mtime_ns, size, root length,
+count), then four arrays of count uint32s: local order, local positions, full
+order, full positions.  A reader reads in only the two it needs.
+"""
+import logging
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, List, Tuple
+
+from navdex_shard import indexStamp
+
+rankFileBase: str = ".navdex-rank"
+rankMinEntries: int = 256
+_header = struct.Struct("<4sHHqqII")  # magic, version, flags, mtime_ns, size, root length, count
+_magic = b"NXRK"
+_version = 2
+_monotone = 1  # Flag: every priority is positive
+
+
+def rankKeys(entries: Iterable[Tuple[str, int]], rootLen: int, full: bool) -> List[float]:
+    """ rankKey() of each entry, as rendered locally or in full """
+    extra = rootLen + 1 if full else 0
+    return [(len(path) + (0 if path[0] == "/" else extra)) / pri if pri else float("inf")
+            for path, pri in entries]
+
+
+def rankOrder(keys: List[float]) -> Tuple[array, array]:
+    """ (order, positions): the entry indices sorted by key, ties in index
+    order, and each entry's index in that order """
+    order = array("I", sorted(range(len(keys)), key=keys.__getitem__))
+    positions = array("I", bytes(4 * len(keys)))
+    for pos, i in enumerate(order):
+        positions[i] = pos
+    return order, positions
+
+
+def _uint32s(data: bytes) -> array:
+    a = array("I")
+    a.frombytes(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+class RankOrder(object):
+    """ order and positions of an index's entries for one rendering, and
+    whether rendering can only raise their keys """
+
+    def __init__(self, order: array, positions: array, monotone: bool = True):
+        self.order = order
+        self.positions = positions
+        self.monotone = monotone
+
+
+def rankPath(indexPath: str) -> str:
+    return os.path.join(os.path.dirname(indexPath), rankFileBase)
+
+
+def readRank(indexPath: str, rootLen: int, count: int, full: bool) -> RankOrder:
+    """ The rank order for indexPath from its sidecar, or None if there's
+    none or it's stale """
+    try:
+        with open(rankPath(indexPath), "rb") as f:
+            header = f.read(_header.size)
+            magic, version, flags, mtime, size, rlen, n = _header.unpack(header)
+            if (magic != _magic or version != _version or [mtime, size] != indexStamp(indexPath)
+                    or rlen != rootLen or n != count):
+                return None
+            f.seek(_header.size + (8 * count if full else 0))
+            data = f.read(8 * count)
+        if len(data) != 8 * count:
+            return None
+        return RankOrder(_uint32s(data[:4 * count]), _uint32s(data[4 * count:]), bool(flags & _monotone))
+    except (OSError, struct.error) as e:
+        logging.info(f"No usable rank order for {indexPath}: {e}")
+        return None
+
+
+def writeRank(indexPath: str, rootLen: int, entries: List[Tuple[str, int]]) -> Tuple[RankOrder, RankOrder]:
+    """ Work out the (local, full) rank orders of entries, the entries of
+    indexPath as written, and save them beside it.  Failure to write (e.g. a
+    read-only dir) is only logged. """
+    monotone = all(pri > 0 for _, pri in entries)
+    ranks = []
+    for full in (False, True):
+        ranks.append(RankOrder(*rankOrder(rankKeys(entries, rootLen, full)), monotone))
+    path = rankPath(indexPath)
+    tmp = path + ".tmp"
+    try:
+        mtime, size = indexStamp(indexPath)
+        with open(tmp, "wb") as f:
+            f.write(_header.pack(_magic, _version, _monotone if monotone else 0, mtime, size, rootLen, len(entries)))
+            for rank in ranks:
+                for a in (rank.order, rank.positions):
+                    if sys.byteorder == "big":
+                        a = array("I", a)
+                        a.byteswap()
+                    a.tofile(f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.info(f"Can't write rank order {path}: {e}")
+    return ranks[0], ranks[1]
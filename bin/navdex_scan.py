@@ -0,0 +1,268 @@
+# navdex_scan.py
+"""Parallel crawler for building an index over a tree (`to --scan`).
+
+TreeScanner walks a tree with os.scandir on a thread pool.  Each task scans a
+batch of dirs depth-first, up to taskBudget of them, and hands what's left of
+its frontier back to the pool.  This keeps per-task overhead low while idle
+workers still find work.  DirEntry.is_dir(follow_symlinks=False) comes from the
+dirent type, so there's no stat per entry, and symlinked dirs aren't followed.
+
+Excluded:
+
+- hidden dirs (unless includeHidden)
+- dirs matched by the rules of .gitignore and .navdexignore files, which apply
+  to the dir holding them and everything below (see IgnoreRules)
+- mount points of other filesystems, found in /proc/self/mounts where there's
+  one, and otherwise by comparing st_dev
+
+maxDepth limits how far below the root dirs are collected (1 = its children),
+and maxEntries how many.  When capped, which dirs are kept depends on the
+order of the scan.
+
+With gitIndex, git checkouts aren't walked: their dirs come from one read of
+their .git/index (see navdex_gitindex), filtered by the same exclusions, and
+checked out submodules are scanned the same way.  The ignore files within a
+checkout are found among its tracked files, so an untracked one is only seen
+at the checkout's root.  A checkout without a readable index is walked as
+usual.
+"""
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Set, Tuple
+
+from navdex_gitindex import trackedDirs
+
+ignoreFileNames = (".gitignore", ".navdexignore")
+scanWorkers: int = 8
+taskBudget: int = 256  # Dirs scanned by one task before it returns its frontier
+
+
+def globToRegex(pattern: str) -> str:
+    """ Regex source for a gitignore glob: '*' and '?' don't match '/', '**'
+    matches across dirs """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[]", i) else i + 1)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = j
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def compileIgnoreLine(line: str) -> Tuple["re.Pattern", bool]:
+    """ (regex, negate) for one line of an ignore file, or None for blanks and
+    comments.  The regex matches paths relative to the file's dir. """
+    line = line.rstrip("\r\n")
+    if not line.strip() or line.startswith("#"):
+        return None
+    if not line.endswith("\\ "):
+        line = line.rstrip()
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]  # \# and \! stand for themselves
+    line = line.rstrip("/")  # Dir-only: everything we match is a dir
+    if not line:
+        return None
+    anchored = "/" in line  # A slash (other than at the end) anchors to the file's dir
+    rx = globToRegex(line.lstrip("/"))
+    if not anchored:
+        rx = "(?:.*/)?" + rx
+    return re.compile(rx + "$"), negate
+
+
+class IgnoreRules(object):
+    """ The exclude rules in effect for a dir: those of the ignore files in
+    it and in the dirs above it (up to the scan root), in order, so that later
+    and deeper rules win, as with git """
+
+    def __init__(self, rules: Tuple[Tuple[int, "re.Pattern", bool], ...] = ()):
+        self.rules = rules  # (length of the base dir's path with its '/', regex, negate)
+
+    def extended(self, base: str, files: List[str]) -> "IgnoreRules":
+        added = []
+        skip = len(base.rstrip("/")) + 1
+        for fname in files:
+            try:
+                with open(fname, "r", errors="surrogateescape") as f:
+                    for line in f:
+                        rule = compileIgnoreLine(line)
+                        if rule is not None:
+                            added.append((skip, rule[0], rule[1]))
+            except OSError:
+                continue
+        return IgnoreRules(self.rules + tuple(added)) if added else self
+
+    def ignored(self, path: str) -> bool:
+        result = False
+        for skip, rx, negate in self.rules:
+            if result == negate and rx.match(path[skip:]):
+                result = not negate
+        return result
+
+
+def mountPoints() -> Set[str]:
+    """ Mount points from /proc/self/mounts, or None where there's no such file """
+    try:
+        with open("/proc/self/mounts", "r") as f:
+            # Spaces etc. in mount points are escaped as octal, e.g. '\040':
+            return {re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), line.split()[1])
+                    for line in f if len(line.split()) > 1}
+    except OSError:
+        return None
+
+
+class TreeScanner(object):
+    """ Collects the dirs below root (see the module doc) """
+
+    def __init__(self, root: str, maxDepth: int = None, maxEntries: int = None,
+                 includeHidden: bool = False, workers: int = scanWorkers, gitIndex: bool = False):
+        self.root = os.path.abspath(root)
+        self.maxDepth = maxDepth
+        self.maxEntries = maxEntries
+        self.includeHidden = includeHidden
+        self.workers = workers
+        self.gitIndex = gitIndex
+        self.mounts = mountPoints()
+        self.device = os.stat(self.root).st_dev
+        self.found: List[str] = []
+        self.truncated = False
+        self.repos: List[str] = []  # Checkouts read from their index
+
+    def otherFilesystem(self, entry: os.DirEntry) -> bool:
+        if self.mounts is not None:
+            return entry.path in self.mounts
+        try:
+            return entry.stat(follow_symlinks=False).st_dev != self.device
+        except OSError:
+            return True
+
+    def trackedBelow(self, repo: str, depth: int, rules: IgnoreRules) -> Tuple[List[str], list]:
+        """ The dirs of the checkout at repo (at depth) from its index, and
+        its submodules to scan; None if it has no readable index """
+        tracked = trackedDirs(repo, ignoreFileNames)
+        if tracked is None:
+            return None
+        self.repos.append(repo)
+        dirs, submodules, files = tracked
+        ignoreFiles = {}  # dir -> its ignore files; the root's are already in rules
+        for rel in files:
+            parent = rel.rpartition("/")[0]
+            if parent:
+                ignoreFiles.setdefault(parent, []).append(os.path.join(repo, rel))
+        found, dirRules = [], {"": rules}  # dirRules: the rules for the children of each dir kept
+        for rel in dirs:
+            parent, _, name = rel.rpartition("/")
+            path = os.path.join(repo, rel)
+            # Parents sort before their children, so an excluded one has no rules:
+            parentRules = dirRules.get(parent)
+            if (parentRules is None or (name[0] == "." and not self.includeHidden)
+                    or (self.maxDepth is not None and depth + rel.count("/") + 1 > self.maxDepth)
+                    or (parentRules.rules and parentRules.ignored(path))):
+                continue
+            found.append(path)
+            dirRules[rel] = parentRules.extended(path, ignoreFiles[rel]) if rel in ignoreFiles else parentRules
+        frontier = [(os.path.join(repo, rel), depth + rel.count("/") + 1, dirRules[rel]) for rel in submodules
+                    if rel in dirRules and (self.maxDepth is None or depth + rel.count("/") + 1 < self.maxDepth)]
+        return found, frontier
+
+    def scanBatch(self, batch: List[Tuple[str, int, IgnoreRules]]) -> Tuple[List[str], list]:
+        """ Scan up to taskBudget dirs, depth-first from batch.  Returns the
+        dirs found and the frontier still to be scanned. """
+        found = []
+        stack = list(batch)
+        scanned = 0
+        includeHidden, maxDepth = self.includeHidden, self.maxDepth
+        while stack and scanned < taskBudget:
+            path, depth, rules = stack.pop()
+            scanned += 1
+            subdirs, ignoreFiles = [], []
+            isRepo = False
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        name = entry.name
+                        if name == ".git":
+                            isRepo = True
+                        if name in ignoreFileNames:
+                            ignoreFiles.append(entry.path)
+                            continue
+                        if name[0] == "." and not includeHidden:
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            if ignoreFiles:
+                rules = rules.extended(path, ignoreFiles)
+            if isRepo and self.gitIndex:
+                tracked = self.trackedBelow(path, depth, rules)
+                if tracked is not None:
+                    found.extend(tracked[0])
+                    stack.extend(tracked[1])
+                    continue
+            descend = maxDepth is None or depth + 1 < maxDepth
+            for entry in subdirs:
+                if rules.rules and rules.ignored(entry.path):
+                    continue
+                if self.otherFilesystem(entry):
+                    continue
+                found.append(entry.path)
+                if descend:
+                    stack.append((entry.path, depth + 1, rules))
+        return found, stack
+
+    def scan(self) -> List[str]:
+        """ The dirs below root, sorted """
+        if self.maxDepth is not None and self.maxDepth < 1:
+            return []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {pool.submit(self.scanBatch, [(self.root, 0, IgnoreRules())])}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, frontier = future.result()
+                    self.found.extend(found)
+                    # Share the frontier out among the workers:
+                    chunk = max(1, len(frontier) // self.workers + 1)
+                    for i in range(0, len(frontier), chunk):
+                        pending.add(pool.submit(self.scanBatch, frontier[i:i + chunk]))
+                if self.maxEntries is not None and len(self.found) >= self.maxEntries:
+                    self.truncated = len(self.found) > self.maxEntries or bool(pending)
+                    del self.found[self.maxEntries:]
+                    for future in pending:
+                        future.cancel()
+                    break
+        self.found.sort()
+        return self.found
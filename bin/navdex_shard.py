@@ -0,0 +1,196 @@
+# navdex_shard.py
+"""Shard summaries for large indices.
+
+A sharded index keeps its entries in several files under .navdex-shards/ next
+to the .navdex-index, split by the top-level component of each path.  The
+manifest there holds a Bloom filter per shard, built from the 1-, 2- and
+3-grams of every path segment in it.  A glob pattern can only match an entry
+if each of its literal runs occurs within one segment, so a shard whose filter
+is missing any gram of a literal can be skipped without being read.
+
+The filters give false positives but never false negatives: a skipped shard
+never held a match.
+
+Unsharded indices get the same kind of filter in a .navdex-summary sidecar,
+written along with the index and stamped with the index file's mtime and
+size.  When searching up a chain of indices, an outer index whose summary
+rules out the patterns isn't parsed.  Searches never write a summary: one
+which is missing or stale (the index was changed by other means) just means
+the index is parsed.
+"""
+import base64
+import fnmatch
+import hashlib
+import json
+import logging
+import math
+import os
+import zlib
+from typing import Dict, Iterable, List, Set
+
+from navdex_store import globLiterals
+
+shardDirBase: str = ".navdex-shards"
+manifestBase: str = "manifest.json"
+summaryFileBase: str = ".navdex-summary"
+defaultShardCount: int = 16
+gramLength: int = 3  # Longest n-gram kept in the filters
+bloomBitsPerKey: float = 9.6  # ~1% false positives with 7 hashes
+bloomHashes: int = 7
+
+
+class BloomFilter(object):
+    """ A fixed-size Bloom filter of strs, using double hashing over one
+    blake2b digest per key """
+
+    def __init__(self, nbits: int, hashes: int = bloomHashes, bits: bytearray = None):
+        self.nbits = max(8, nbits)
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((self.nbits + 7) // 8)
+
+    @classmethod
+    def sized(cls, nkeys: int) -> "BloomFilter":
+        return cls(int(math.ceil(max(nkeys, 1) * bloomBitsPerKey)))
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], "little")
+        h2 = int.from_bytes(digest[4:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.nbits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        for pos in self._positions(key):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def toJson(self) -> dict:
+        return {"bits": self.nbits, "hashes": self.hashes,
+                "data": base64.b64encode(bytes(self.bits)).decode("ascii")}
+
+    @classmethod
+    def fromJson(cls, d: dict) -> "BloomFilter":
+        return cls(d["bits"], d["hashes"], bytearray(base64.b64decode(d["data"])))
+
+
+def segmentGrams(path: str) -> Set[str]:
+    """ All 1..gramLength-grams of each '/'-separated segment of path """
+    grams = set()
+    for seg in path.split("/"):
+        n = len(seg)
+        for size in range(1, gramLength + 1):
+            for i in range(n - size + 1):
+                grams.add(seg[i:i + size])
+    return grams
+
+
+def literalGrams(lit: str) -> List[str]:
+    """ The grams which must all be in a shard's filter if lit occurs in it """
+    if len(lit) <= gramLength:
+        return [lit]
+    return [lit[i:i + gramLength] for i in range(len(lit) - gramLength + 1)]
+
+
+def buildBloom(paths: Iterable[str]) -> BloomFilter:
+    # Many paths share segments ('src', 'build', ...), so collect those first
+    segments = set()
+    for path in paths:
+        segments.update(path.split("/"))
+    grams = segmentGrams("/".join(segments))
+    bloom = BloomFilter.sized(len(grams))
+    for gram in grams:
+        bloom.add(gram)
+    return bloom
+
+
+def patternMayMatch(bloom: BloomFilter, pattern: str) -> bool:
+    """ False if no segment summarized by bloom can fnmatch pattern """
+    for lit in globLiterals(pattern):
+        for gram in literalGrams(lit):
+            if gram not in bloom:
+                return False
+    return True
+
+
+def shardMayMatch(bloom: BloomFilter, patterns: List[str], rootSegments: List[str]) -> bool:
+    """ False if no entry of the shard can match every pattern.  Patterns after
+    the first may also be tested against the absolute path of an entry, so
+    those pass if they match a segment of the index root. """
+    if patterns and not patternMayMatch(bloom, patterns[0]):
+        return False
+    for pattern in patterns[1:]:
+        if patternMayMatch(bloom, pattern):
+            continue
+        if not any(fnmatch.fnmatch(seg, pattern) for seg in rootSegments):
+            return False
+    return True
+
+
+def shardId(path: str, count: int) -> str:
+    """ The shard holding path, chosen by its top-level component """
+    top = path.split("/", 1)[0]
+    return "%02x" % (zlib.crc32(top.encode("utf-8", "surrogateescape")) % count)
+
+
+def shardPath(shardDir: str, sid: str) -> str:
+    return os.path.join(shardDir, sid + ".idx")
+
+
+def readManifest(shardDir: str) -> dict:
+    """ Return the manifest of shardDir, or None if it's missing or unreadable """
+    try:
+        with open(os.path.join(shardDir, manifestBase), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != 1:
+            return None
+        return manifest
+    except (OSError, ValueError, AttributeError) as e:
+        logging.info(f"No shard manifest in {shardDir}: {e}")
+        return None
+
+
+def writeManifest(shardDir: str, count: int, shards: Dict[str, dict]) -> None:
+    path = os.path.join(shardDir, manifestBase)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": 1, "count": count, "shards": shards}, f)
+    os.replace(tmp, path)
+
+
+def indexStamp(indexPath: str) -> List[int]:
+    st = os.stat(indexPath)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def readSummary(indexPath: str) -> BloomFilter:
+    """ The filter from the summary beside indexPath, or None if there's none
+    or the index has changed since it was written """
+    try:
+        with open(os.path.join(os.path.dirname(indexPath), summaryFileBase), "r") as f:
+            summary = json.load(f)
+        if summary.get("version") != 1 or summary.get("stamp") != indexStamp(indexPath):
+            return None
+        return BloomFilter.fromJson(summary["bloom"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.info(f"No usable summary for {indexPath}: {e}")
+        return None
+
+
+def writeSummary(indexPath: str, paths: Iterable[str]) -> None:
+    """ Write the summary for indexPath.  Failure (e.g. a read-only dir) is
+    logged, and the index is then always parsed. """
+    path = os.path.join(os.path.dirname(indexPath), summaryFileBase)
+    tmp = path + ".tmp"
+    try:
+        stamp = indexStamp(indexPath)
+        bloom = buildBloom(paths)
+        with open(tmp, "w") as f:
+            json.dump({"version": 1, "stamp": stamp, "bloom": bloom.toJson()}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.info(f"Can't write summary {path}: {e}")
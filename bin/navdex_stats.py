@@ -0,0 +1,232 @@
+# navdex_stats.py
+"""Latency telemetry for navdex searches.
+
+Each search (`to <patterns>`) appends one fixed-size binary record to a
+per-user ring buffer, ~/.navdex-stats by default ($NavdexStatsFile overrides
+it; set it empty to turn recording off).  The file is a header followed by
+ringCapacity record slots; the header counts the records ever written, so
+the next slot is count % ringCapacity and the oldest records are overwritten
+once it's full.
+
+A record holds the time, the resolve mode, the pattern count, the size of
+the index chain, the match count, how the search ended (outcomeNames), the
+innermost index path and the duration of each phase (phaseNames) in
+microseconds.  A duration of 0 means the phase didn't run (e.g. no menu).
+
+Writing one costs an open, a lock, a header read and two small writes: tens
+of microseconds.  `to --stats` summarizes the file with statsReport().
+"""
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+statsFileKey: str = "NavdexStatsFile"
+statsFileBase: str = ".navdex-stats"
+ringCapacity: int = 4096  # ~470KB of records: a few weeks of heavy use
+
+phaseNames = ("load", "match", "menu", "total")
+outcomeNames = ("other", "unique", "menu", "nomatch", "offset", "print")
+
+_magic = b"NDXS"
+_header = struct.Struct("<4sHHII")  # magic, version, record size, capacity, count
+_record = struct.Struct("<dBBHII80s%dI" % len(phaseNames))
+_pathBytes = 80
+_maxMicros = (1 << 32) - 1
+
+
+class StatsRecord(NamedTuple):
+    time: float
+    mode: int
+    outcome: str
+    patterns: int
+    chainSize: int
+    matches: int
+    index: str
+    phases: Dict[str, int]  # phase name -> microseconds
+
+
+def statsPath() -> str:
+    """ The ring buffer file, or "" if recording is turned off """
+    path = os.environ.get(statsFileKey)
+    if path is None:
+        path = os.path.join(os.environ.get("HOME", "/tmp"), statsFileBase)
+    return path
+
+
+class Invocation(object):
+    """ Times the phases of one search, and collects what goes in its record """
+
+    def __init__(self, mode: int, patterns: int):
+        self.start = time.perf_counter_ns()
+        self.time = time.time()
+        self.mode = mode
+        self.patterns = patterns
+        self.outcome = "other"
+        self.chainSize = 0
+        self.matches = 0
+        self.index = ""
+        self.phases = [0] * len(phaseNames)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.phases[phaseNames.index(name)] += time.perf_counter_ns() - t0
+
+    def note(self, outcome: str = None, matches: int = None, index: str = None, chainSize: int = None) -> None:
+        # A multi-pattern search resolves several levels: the first index and
+        # the last outcome are the ones recorded
+        if outcome is not None:
+            self.outcome = outcome
+        if matches is not None:
+            self.matches = matches
+        if index is not None and not self.index:
+            self.index = index
+            self.chainSize = chainSize or 0
+
+    def pack(self) -> bytes:
+        self.phases[phaseNames.index("total")] = time.perf_counter_ns() - self.start
+        micros = [min(_maxMicros, (ns + 999) // 1000) for ns in self.phases]
+        index = self.index.encode("utf-8", "surrogateescape")[-_pathBytes:]
+        return _record.pack(self.time, self.mode, outcomeNames.index(self.outcome),
+                            min(self.patterns, 0xffff), min(self.chainSize, _maxMicros),
+                            min(self.matches, _maxMicros), index, *micros)
+
+    def write(self, path: str) -> None:
+        appendRecord(path, self.pack())
+
+
+def appendRecord(path: str, record: bytes) -> None:
+    """ Write record to the next slot of the ring buffer at path """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        head = os.read(fd, _header.size)
+        count = 0
+        if len(head) == _header.size:
+            magic, version, size, capacity, count = _header.unpack(head)
+            if (magic, version, size, capacity) != (_magic, 1, _record.size, ringCapacity):
+                count = 0  # Another format: start over
+        os.lseek(fd, _header.size + (count % ringCapacity) * _record.size, os.SEEK_SET)
+        os.write(fd, record)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, _header.pack(_magic, 1, _record.size, ringCapacity, (count + 1) & 0xffffffff))
+    finally:
+        os.close(fd)
+
+
+def readRecords(path: str) -> List[StatsRecord]:
+    """ The records in the ring buffer at path, oldest first """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if len(data) < _header.size:
+        return []
+    magic, version, size, capacity, count = _header.unpack_from(data)
+    if (magic, version, size) != (_magic, 1, _record.size):
+        return []
+    n = min(count, capacity)
+    first = count % capacity if count > capacity else 0
+    records = []
+    for k in range(n):
+        offset = _header.size + ((first + k) % capacity) * size
+        if offset + size > len(data):
+            break
+        t, mode, outcome, patterns, chainSize, matches, index, *micros = _record.unpack_from(data, offset)
+        records.append(StatsRecord(t, mode, outcomeNames[outcome] if outcome < len(outcomeNames) else "other",
+                                   patterns, chainSize, matches,
+                                   index.rstrip(b"\0").decode("utf-8", "replace"),
+                                   dict(zip(phaseNames, micros))))
+    return records
+
+
+def percentile(values: List[int], p: float) -> int:
+    """ Nearest-rank percentile of sorted values """
+    if not values:
+        return 0
+    k = max(0, min(len(values) - 1, int(-(-p * len(values) // 100)) - 1))
+    return values[k]
+
+
+def phaseTable(records: List[StatsRecord], indent: str = "") -> List[str]:
+    lines = []
+    for name in phaseNames:
+        values = sorted(r.phases[name] for r in records if r.phases[name])
+        if not values:
+            continue
+        lines.append("%s%-8s %7d %9.2f %9.2f %9.2f" % (
+            indent, name, len(values), percentile(values, 50) / 1000,
+            percentile(values, 95) / 1000, percentile(values, 99) / 1000))
+    return lines
+
+
+def statsReport(records: List[StatsRecord], home: str = None) -> List[str]:
+    """ Lines summarizing records: p50/p95/p99 of each phase, overall and
+    per index, with the outcome counts """
+    if not records:
+        return ["No navdex stats recorded yet"]
+    since = time.strftime("%Y-%m-%d %H:%M", time.localtime(records[0].time))
+    lines = ["%d searches since %s" % (len(records), since)]
+    outcomes = {}
+    for r in records:
+        outcomes[r.outcome] = outcomes.get(r.outcome, 0) + 1
+    lines.append("Outcomes: " + ", ".join("%s %d" % (name, outcomes[name]) for name in outcomeNames if name in outcomes))
+    lines.append("%-8s %7s %9s %9s %9s  (ms)" % ("phase", "calls", "p50", "p95", "p99"))
+    lines.extend(phaseTable(records))
+    byIndex = {}
+    for r in records:
+        byIndex.setdefault(r.index, []).append(r)
+    for index in sorted(byIndex, key=lambda ix: -len(byIndex[ix])):
+        rs = byIndex[index]
+        if home and index.startswith(home + "/"):
+            index = "~" + index[len(home):]
+        lines.append("%s  (%d searches, %d dirs in chain)" % (index or "(no index)", len(rs), rs[-1].chainSize))
+        lines.extend(phaseTable(rs, "  "))
+    return lines
+
+
+current: Invocation = None  # The search being timed, if any
+
+
+def begin(mode: int, patterns: int) -> None:
+    global current
+    current = Invocation(mode, patterns) if statsPath() else None
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    if current is None:
+        yield
+    else:
+        with current.phase(name):
+            yield
+
+
+def note(**kwargs) -> None:
+    if current is not None:
+        current.note(**kwargs)
+
+
+def end() -> None:
+    """ Record the current search.  Failure (e.g. a read-only HOME) is
+    ignored: telemetry mustn't break a cd. """
+    global current
+    invocation, current = current, None
+    if invocation is None:
+        return
+    try:
+        invocation.write(statsPath())
+    except OSError:
+        ...
@@ -0,0 +1,392 @@
+# navdex_store.py
+"""Entry stores for IndexContent.
+
+An index is a sequence of (path, priority) tuples.  The plain list store keeps
+each entry as an independent tuple+string, which is simple but expensive for
+very large indices held by long-lived processes.  The alternative stores here
+implement the same MutableSequence protocol over more compact representations,
+materialising (path, priority) tuples only when an entry is accessed.
+
+Every store also provides candidates(pattern), which yields the positions of
+entries that may match a glob pattern.  It's a cheap literal-substring
+prefilter: callers still apply the real fnmatch test to what it yields.
+
+Select a store with openStore(kind), or set $NavdexStore for the whole process.
+"""
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from collections.abc import MutableSequence
+from typing import Iterator, List, Tuple
+
+navdexStoreKey: str = "NavdexStore"
+
+Entry = Tuple[str, int]
+
+
+def globLiterals(pattern: str) -> List[str]:
+    """ Return the literal runs of a glob pattern, e.g. '*foo*b?r' gives
+    ['foo', 'b', 'r'].  Any path that fnmatches the pattern contains all of
+    them.  Returns [] where the platform folds case in fnmatch, since a
+    case-sensitive substring test could then reject a real match. """
+    if os.path.normcase("A") != "A":
+        return []
+    lits = []
+    run = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c in "*?":
+            lits.append("".join(run))
+            run = []
+        elif c == "[":
+            # Same bracket rules as fnmatch.translate(): an unclosed '[' is literal
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j < 0:
+                run.append(c)
+            else:
+                lits.append("".join(run))
+                run = []
+                i = j + 1
+        else:
+            run.append(c)
+    lits.append("".join(run))
+    return [lit for lit in lits if lit]
+
+
+def scanCandidates(entries, pattern: str) -> Iterator[int]:
+    """ Generic candidates() for stores that hold str paths """
+    lits = globLiterals(pattern)
+    if not lits:
+        yield from range(len(entries))
+        return
+    for i, entry in enumerate(entries):
+        path = entry[0]
+        for lit in lits:
+            if lit not in path:
+                break
+        else:
+            yield i
+
+
+class ListPathStore(list):
+    """ The default store: a plain list of (path, priority) tuples """
+
+    def candidates(self, pattern: str) -> Iterator[int]:
+        return scanCandidates(self, pattern)
+
+
+class _RadixNode(object):
+    """ One '/'-separated path segment.  A path is the chain of labels from
+    a node up to (but excluding) the root. """
+    __slots__ = ("parent", "label", "children", "refs")
+
+    def __init__(self, parent, label: str):
+        self.parent = parent
+        self.label = label
+        self.children = None  # dict label->node, allocated on first child
+        self.refs = 0  # number of entries referencing this node as a leaf
+
+    def path(self) -> str:
+        labels = []
+        node = self
+        while node.parent is not None:
+            labels.append(node.label)
+            node = node.parent
+        labels.reverse()
+        return "/".join(labels)
+
+
+class RadixPathStore(MutableSequence):
+    """Store entries as leaf references into a radix tree of path segments.
+
+    Paths which share a prefix (e.g. projects/fishhead/common/...) share the
+    prefix nodes, and segment labels are interned so that common names like
+    'src' or 'build' exist once.  Entry order is kept in a list of leaf nodes
+    alongside an array of priorities, so iteration order is unchanged from the
+    list store.
+    """
+
+    def __init__(self, entries=None):
+        self.root = _RadixNode(None, "")
+        self.leaves: List[_RadixNode] = []
+        self.priorities = array("i")
+        if entries:
+            self.extend(entries)
+
+    def _intern(self, path: str) -> _RadixNode:
+        node = self.root
+        for label in path.split("/"):
+            children = node.children
+            if children is None:
+                children = node.children = {}
+            child = children.get(label)
+            if child is None:
+                label = sys.intern(label)
+                child = children[label] = _RadixNode(node, label)
+            node = child
+        node.refs += 1
+        return node
+
+    def _lookup(self, path: str):
+        node = self.root
+        for label in path.split("/"):
+            if node.children is None:
+                return None
+            node = node.children.get(label)
+            if node is None:
+                return None
+        return node
+
+    def _release(self, node: _RadixNode) -> None:
+        # Prune nodes which are no longer referenced by any entry:
+        node.refs -= 1
+        while node.parent is not None and node.refs == 0 and not node.children:
+            parent = node.parent
+            del parent.children[node.label]
+            if not parent.children:
+                parent.children = None
+            node = parent
+
+    def _entry(self, i: int) -> Entry:
+        return (self.leaves[i].path(), self.priorities[i])
+
+    def __len__(self) -> int:
+        return len(self.leaves)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RadixPathStore index out of range")
+        return self._entry(index)
+
+    def __setitem__(self, index, entry: Entry) -> None:
+        if isinstance(index, slice):
+            entries = list(entry)
+            del self[index]
+            start = index.indices(len(self))[0]
+            for i, e in enumerate(entries):
+                self.insert(start + i, e)
+            return
+        node = self._intern(entry[0])
+        self._release(self.leaves[index])
+        self.leaves[index] = node
+        self.priorities[index] = entry[1]
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            for node in self.leaves[index]:
+                self._release(node)
+            del self.leaves[index]
+            del self.priorities[index]
+            return
+        self._release(self.leaves[index])
+        del self.leaves[index]
+        del self.priorities[index]
+
+    def insert(self, index: int, entry: Entry) -> None:
+        self.leaves.insert(index, self._intern(entry[0]))
+        self.priorities.insert(index, entry[1])
+
+    def append(self, entry: Entry) -> None:
+        self.leaves.append(self._intern(entry[0]))
+        self.priorities.append(entry[1])
+
+    def __iter__(self) -> Iterator[Entry]:
+        for node, pri in zip(self.leaves, self.priorities):
+            yield (node.path(), pri)
+
+    def __contains__(self, entry) -> bool:
+        if not isinstance(entry, tuple) or len(entry) != 2:
+            return False
+        path, pri = entry
+        node = self._lookup(path)
+        if node is None or not node.refs:
+            return False
+        return any(n is node and p == pri for n, p in zip(self.leaves, self.priorities))
+
+    def candidates(self, pattern: str) -> Iterator[int]:
+        return scanCandidates(self, pattern)
+
+    def __repr__(self) -> str:
+        return "%s(%r)" % (self.__class__.__name__, list(self))
+
+
+class ColumnarPathStore(MutableSequence):
+    """Store entries column-wise in flat buffers instead of per-entry objects.
+
+    - blob: every path UTF-8 encoded and '\n'-terminated, back to back
+    - offsets: array('I') of n+1 start offsets into blob (offsets[n] == len(blob))
+    - priorities: array('i')
+    - lengths: array('I') of path lengths in characters
+    - scores: array('d') of the ranking score len(path)/priority
+
+    A str is only decoded when an entry is accessed, and candidates() runs its
+    literal prefilter with bytes.find() over the blob, so entries which can't
+    match are never decoded.  Inserting or deleting anywhere but the end is
+    O(n), like list.insert().
+    """
+
+    def __init__(self, entries=None):
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+        self.priorities = array("i")
+        self.lengths = array("I")
+        self.scores = array("d")
+        if entries:
+            self.extend(entries)
+
+    @staticmethod
+    def _encode(path: str) -> bytes:
+        return path.encode("utf-8", "surrogateescape") + b"\n"
+
+    def _path(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1] - 1].decode("utf-8", "surrogateescape")
+
+    def _shift(self, start: int, delta: int) -> None:
+        # Adjust offsets[start:] by delta after bytes were inserted or removed
+        offsets = self.offsets
+        offsets[start:] = array("I", [o + delta for o in offsets[start:]])
+
+    def _checkIndex(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ColumnarPathStore index out of range")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.priorities)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [(self._path(i), self.priorities[i]) for i in range(*index.indices(len(self)))]
+        index = self._checkIndex(index)
+        return (self._path(index), self.priorities[index])
+
+    def __setitem__(self, index, entry: Entry) -> None:
+        if isinstance(index, slice):
+            entries = list(entry)
+            del self[index]
+            start = index.indices(len(self))[0]
+            for i, e in enumerate(entries):
+                self.insert(start + i, e)
+            return
+        index = self._checkIndex(index)
+        del self[index]
+        self.insert(index, entry)
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            if len(indices) == len(self):
+                self.clear()
+                return
+            for i in sorted(indices, reverse=True):
+                del self[i]
+            return
+        index = self._checkIndex(index)
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        del self.blob[start:stop]
+        del self.offsets[index + 1]
+        self._shift(index + 1, start - stop)
+        del self.priorities[index]
+        del self.lengths[index]
+        del self.scores[index]
+
+    def clear(self) -> None:
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+        for col in (self.priorities, self.lengths, self.scores):
+            del col[:]
+
+    def insert(self, index: int, entry: Entry) -> None:
+        n = len(self)
+        if index < 0:
+            index = max(0, index + n)
+        index = min(index, n)
+        path, pri = entry
+        raw = self._encode(path)
+        pos = self.offsets[index]
+        self.blob[pos:pos] = raw
+        self.offsets.insert(index + 1, pos)
+        self._shift(index + 1, len(raw))
+        self.priorities.insert(index, pri)
+        self.lengths.insert(index, len(path))
+        self.scores.insert(index, len(path) / pri if pri else float("inf"))
+
+    def append(self, entry: Entry) -> None:
+        path, pri = entry
+        self.blob += self._encode(path)
+        self.offsets.append(len(self.blob))
+        self.priorities.append(pri)
+        self.lengths.append(len(path))
+        self.scores.append(len(path) / pri if pri else float("inf"))
+
+    def __iter__(self) -> Iterator[Entry]:
+        # Decode the whole blob once rather than slicing per entry:
+        paths = self.blob.decode("utf-8", "surrogateescape").split("\n")
+        return zip(paths, self.priorities)
+
+    def __contains__(self, entry) -> bool:
+        if not isinstance(entry, tuple) or len(entry) != 2:
+            return False
+        path, pri = entry
+        raw = self._encode(path)
+        blob, offsets = self.blob, self.offsets
+        pos = blob.find(raw)
+        while pos >= 0:
+            i = bisect_right(offsets, pos) - 1
+            if offsets[i] == pos and self.priorities[i] == pri:
+                return True
+            pos = blob.find(raw, pos + 1)
+        return False
+
+    def candidates(self, pattern: str) -> Iterator[int]:
+        lits = [lit.encode("utf-8", "surrogateescape") for lit in globLiterals(pattern)]
+        if not lits:
+            yield from range(len(self))
+            return
+        # Hunt for the longest literal through the whole blob, then check the
+        # remaining literals only within the entry that contains the hit.
+        lits.sort(key=len, reverse=True)
+        first, rest = lits[0], lits[1:]
+        blob, offsets = self.blob, self.offsets
+        pos = blob.find(first)
+        while pos >= 0:
+            i = bisect_right(offsets, pos) - 1
+            start, stop = offsets[i], offsets[i + 1]
+            for lit in rest:
+                if blob.find(lit, start, stop) < 0:
+                    break
+            else:
+                yield i
+            pos = blob.find(first, stop)
+
+    def __repr__(self) -> str:
+        return "%s(%r)" % (self.__class__.__name__, list(self))
+
+
+storeKinds = {
+    "list": ListPathStore,
+    "radix": RadixPathStore,
+    "columnar": ColumnarPathStore,
+}
+
+
+def openStore(kind: str = None):
+    """ Create an empty entry store of the given kind, or of the kind named by
+    $NavdexStore.  Unknown kinds fall back to the list store. """
+    if kind is None:
+        kind = os.environ.get(navdexStoreKey, "list")
+    return storeKinds.get(kind, ListPathStore)()
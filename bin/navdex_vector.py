@@ -0,0 +1,129 @@
+# navdex_vector.py
+"""Optional NumPy backend for matching very large indices.
+
+matchPaths() tests each candidate entry with fnmatch in a Python loop, then
+ranks the matches with sorted().  Once an index holds a million or so entries,
+a broad pattern makes that loop the bulk of the search.  When NumPy is
+importable and the index uses the columnar store, VectorPaths views the
+store's buffers as arrays (without copying them) and evaluates the simple
+pattern forms ('*lit*', 'lit*', '*lit' and 'lit', with no other glob
+characters) as array operations.  The result is a boolean mask over the
+entries, whose hits are returned in index order.  They're left to the caller
+to rank, as it does the pure-Python matches: ranking goes by the rendered
+path, which can order ties differently than the stored one.
+
+Anything else (no NumPy, another store, a small index, a pattern with '?' or
+'[...]', a platform where fnmatch folds case) returns None, and the caller
+uses the pure-Python path.
+"""
+import os
+from typing import List, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from navdex_store import ColumnarPathStore
+
+vectorMinEntries: int = 20000  # Smaller indices are as quick in pure Python
+sampleBytes: int = 1 << 16  # Prefix of the blob used to estimate byte frequencies
+
+Entry = Tuple[str, int]
+
+_slash = ord("/")
+_newline = ord("\n")
+
+
+def simplePattern(pattern: str) -> Tuple[str, bool, bool]:
+    """ Split a pattern of the form [*]lit[*] into (lit, anchoredStart,
+    anchoredEnd), or return None if it has any other glob syntax. """
+    if os.path.normcase("A") != "A":
+        return None  # fnmatch folds case here, byte compares don't
+    start = not pattern.startswith("*")
+    end = not pattern.endswith("*")
+    lit = pattern[0 if start else 1:len(pattern) if end else -1]
+    if not lit and (start or end):
+        return None
+    if any(c in lit for c in "*?[/\n"):
+        return None
+    return lit, start, end
+
+
+class VectorPaths(object):
+    """ Array views of a ColumnarPathStore's columns:
+
+    - buf: uint8, every path UTF-8 encoded and '\\n'-terminated
+    - offsets: n+1 start offsets into buf
+    - scores: float64, len(path)/priority, as rankKey()
+
+    The views pin the store's buffers (they can't be resized while a view
+    exists), so use one for a single search and then release() it. """
+
+    def __init__(self, entries: ColumnarPathStore):
+        self.entries = entries
+        self.buf = numpy.frombuffer(entries.blob, dtype=numpy.uint8)
+        self.offsets = numpy.frombuffer(entries.offsets, dtype=numpy.dtype(entries.offsets.typecode))
+        self.scores = numpy.frombuffer(entries.scores, dtype=numpy.float64)
+
+    def release(self) -> None:
+        self.buf = self.offsets = self.scores = None
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def mask(self, pattern: str):
+        """ Boolean array: which entries have a segment matching pattern, or
+        None if pattern isn't one of the simple forms """
+        np = numpy
+        simple = simplePattern(pattern)
+        if simple is None:
+            return None
+        lit, start, end = simple
+        if not lit:
+            return np.ones(len(self), dtype=bool)
+        key = np.frombuffer(lit.encode("utf-8", "surrogateescape"), dtype=np.uint8)
+        buf = self.buf
+        m = len(key)
+        if len(buf) < m:
+            return np.zeros(len(self), dtype=bool)
+        # Scan the whole buffer for the literal's rarest byte only, then check
+        # the rest of the literal at those positions:
+        counts = np.bincount(buf[:sampleBytes], minlength=256)
+        j = int(np.argmin(counts[key]))
+        hits = np.flatnonzero(buf[j:len(buf) - m + 1 + j] == key[j])
+        for k in range(m):
+            if k != j:
+                hits = hits[buf[hits + k] == key[k]]
+        # A literal has no '/' or '\n', so a hit lies within one segment; the
+        # anchors check that it starts or ends that segment:
+        if start:
+            before = buf[hits - 1]  # buf[-1] is '\n', so hits at 0 pass
+            hits = hits[(before == _slash) | (before == _newline)]
+        if end:
+            after = buf[hits + m]
+            hits = hits[(after == _slash) | (after == _newline)]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[np.searchsorted(self.offsets, hits, side="right") - 1] = True
+        return mask
+
+    def matches(self, pattern: str) -> List[Entry]:
+        """ Entries matching pattern, in index order, or None if pattern
+        isn't one of the simple forms """
+        mask = self.mask(pattern)
+        if mask is None:
+            return None
+        entries = self.entries
+        return [entries[i] for i in numpy.flatnonzero(mask).tolist()]
+
+
+def vectorMatches(entries, pattern: str) -> List[Entry]:
+    """ Entries of the store matching pattern, in index order, or None if the
+    NumPy backend doesn't apply and the pure-Python path should be used """
+    if numpy is None or not isinstance(entries, ColumnarPathStore) or len(entries) < vectorMinEntries:
+        return None
+    view = VectorPaths(entries)
+    try:
+        return view.matches(pattern)
+    finally:
+        view.release()
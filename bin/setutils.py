@@ -12,7 +12,6 @@ characteristics of Python's built-in set implementation.
 
 from __future__ import print_function
 
-from bisect import bisect_left
 from itertools import chain, islice
 from collections.abc import MutableSet
 import operator
@@ -79,12 +78,18 @@ class IndexedSet(MutableSet):
 
     Otherwise, the API strives to be as complete a union of the
     :class:`list` and :class:`set` APIs as possible.
+
+    Removed items leave a gap in the underlying list until the next
+    compaction.  Once there are gaps, positions are mapped to list
+    indices with a Fenwick tree counting the live items, so indexing,
+    ``pop(i)``, ``index()`` and finding where a slice starts are
+    O(log n) however many items were removed.
     """
 
     def __init__(self, other=None):
         self.item_index_map = dict()
         self.item_list = []
-        self.dead_indices = []
+        self._live_tree = None  # Fenwick tree of live counts, built once needed
         self._compactions = 0
         self._c_max_size = 0
         if other:
@@ -96,7 +101,7 @@ class IndexedSet(MutableSet):
         return len(self.item_list) - len(self.item_index_map)
 
     def _compact(self):
-        if not self.dead_indices:
+        if not self._dead_index_count:
             return
         self._compactions += 1
         dead_index_count = self._dead_index_count
@@ -106,61 +111,85 @@ class IndexedSet(MutableSet):
             items[i] = item
             index_map[item] = i
         del items[-dead_index_count:]
-        del self.dead_indices[:]
+        self._live_tree = None
 
     def _cull(self):
-        ded = self.dead_indices
-        if not ded:
-            return
         items, ii_map = self.item_list, self.item_index_map
+        if len(items) == len(ii_map):
+            return
         if not ii_map:
             del items[:]
-            del ded[:]
-        elif len(ded) > 384:
-            self._compact()
+            self._live_tree = None
         elif self._dead_index_count > (len(items) / _COMPACTION_FACTOR):
             self._compact()
         elif items[-1] is _MISSING:  # get rid of dead right hand side
             num_dead = 1
             while items[-(num_dead + 1)] is _MISSING:
                 num_dead += 1
-            if ded and ded[-1][1] == len(items):
-                del ded[-1]
             del items[-num_dead:]
+            if self._live_tree is not None:
+                # A Fenwick tree's prefix holds the counts of the list's prefix
+                del self._live_tree[len(items) + 1:]
+
+    def _get_tree(self):
+        # tree[i] counts the live items in item_list[i - (i & -i):i]
+        tree = self._live_tree
+        if tree is None:
+            items = self.item_list
+            size = len(items)
+            tree = [0] * (size + 1)
+            for i in range(1, size + 1):
+                if items[i - 1] is not _MISSING:
+                    tree[i] += 1
+                parent = i + (i & -i)
+                if parent <= size:
+                    tree[parent] += tree[i]
+            self._live_tree = tree
+        return tree
+
+    def _live_before(self, real_index):
+        "number of live items in item_list[:real_index]"
+        tree, count = self._get_tree(), 0
+        while real_index:
+            count += tree[real_index]
+            real_index &= real_index - 1
+        return count
+
+    def _tree_append(self):
+        # Called after appending a live item to item_list
+        tree = self._live_tree
+        i = len(tree)
+        tree.append(1 + self._live_before(i - 1) - self._live_before(i - (i & -i)))
+
+    def _tree_kill(self, real_index):
+        tree = self._live_tree
+        if tree is None:
+            return
+        i = real_index + 1
+        while i < len(tree):
+            tree[i] -= 1
+            i += i & -i
 
     def _get_real_index(self, index):
+        len_self = len(self)
         if index < 0:
-            index += len(self)
-        if not self.dead_indices:
+            index += len_self
+        if not 0 <= index < len_self:
+            raise IndexError('IndexedSet index out of range')
+        if len(self.item_list) == len_self:
             return index
-        real_index = index
-        for d_start, d_stop in self.dead_indices:
-            if real_index < d_start:
-                break
-            real_index += d_stop - d_start
+        # Descend the tree to the longest prefix holding 'index' live items; ours is next
+        tree, size = self._get_tree(), len(self.item_list)
+        real_index, remaining = 0, index + 1
+        bit = 1 << size.bit_length()
+        while bit:
+            nxt = real_index + bit
+            if nxt <= size and tree[nxt] < remaining:
+                real_index = nxt
+                remaining -= tree[nxt]
+            bit >>= 1
         return real_index
 
-    def _add_dead(self, start, stop=None):
-        # TODO: does not handle when the new interval subsumes
-        # multiple existing intervals
-        dints = self.dead_indices
-        if stop is None:
-            stop = start + 1
-        cand_int = [start, stop]
-        if not dints:
-            dints.append(cand_int)
-            return
-        int_idx = bisect_left(dints, cand_int)
-        dint = dints[int_idx - 1]
-        d_start, d_stop = dint
-        if start <= d_start <= stop:
-            dint[0] = start
-        elif start <= d_stop <= stop:
-            dint[1] = stop
-        else:
-            dints.insert(int_idx, cand_int)
-        return
-
     # common operations (shared by set and list)
     def __len__(self):
         return len(self.item_index_map)
@@ -194,6 +223,8 @@ class IndexedSet(MutableSet):
         if item not in self.item_index_map:
             self.item_index_map[item] = len(self.item_list)
             self.item_list.append(item)
+            if self._live_tree is not None:
+                self._tree_append()
 
     def remove(self, item):
         "remove(item) -> remove item from the set, raises if not present"
@@ -202,7 +233,7 @@ class IndexedSet(MutableSet):
         except KeyError:
             raise KeyError(item)
         self.item_list[didx] = _MISSING
-        self._add_dead(didx)
+        self._tree_kill(didx)
         self._cull()
 
     def discard(self, item):
@@ -215,7 +246,7 @@ class IndexedSet(MutableSet):
     def clear(self):
         "clear() -> empty the set"
         del self.item_list[:]
-        del self.dead_indices[:]
+        self._live_tree = None
         self.item_index_map.clear()
 
     def isdisjoint(self, other):
@@ -345,15 +376,16 @@ class IndexedSet(MutableSet):
 
     def iter_slice(self, start, stop, step=None):
         "iterate over a slice of the set"
-        iterable = self
-        if start is not None:
-            start = self._get_real_index(start)
-        if stop is not None:
-            stop = self._get_real_index(stop)
-        if step is not None and step < 0:
-            step = -step
-            iterable = reversed(self)
-        return islice(iterable, start, stop, step)
+        start, stop, step = slice(start, stop, step).indices(len(self))
+        count = len(range(start, stop, step))
+        if not count:
+            return iter(())
+        # Walk the list from the first item of the slice, not from the start
+        real_start = self._get_real_index(start)
+        item_list = self.item_list
+        reals = range(real_start, len(item_list)) if step > 0 else range(real_start, -1, -1)
+        live = (item_list[i] for i in reals if item_list[i] is not _MISSING)
+        return islice(live, 0, (count - 1) * abs(step) + 1, abs(step))
 
     # list operations
     def __getitem__(self, index):
@@ -364,14 +396,7 @@ class IndexedSet(MutableSet):
         else:
             iter_slice = self.iter_slice(start, stop, step)
             return self.from_iterable(iter_slice)
-        if index < 0:
-            index += len(self)
-        real_index = self._get_real_index(index)
-        try:
-            ret = self.item_list[real_index]
-        except IndexError:
-            raise IndexError('IndexedSet index out of range')
-        return ret
+        return self.item_list[self._get_real_index(index)]
 
     def pop(self, index=None):
         "pop(index) -> remove the item at a given index (-1 by default)"
@@ -380,12 +405,14 @@ class IndexedSet(MutableSet):
         if index is None or index == -1 or index == len_self - 1:
             ret = self.item_list.pop()
             del item_index_map[ret]
+            if self._live_tree is not None:
+                self._live_tree.pop()
         else:
             real_index = self._get_real_index(index)
             ret = self.item_list[real_index]
             self.item_list[real_index] = _MISSING
             del item_index_map[ret]
-            self._add_dead(real_index)
+            self._tree_kill(real_index)
         self._cull()
         return ret
 
@@ -401,7 +428,7 @@ class IndexedSet(MutableSet):
         self.item_list[:] = reversed_list
         for i, item in enumerate(self.item_list):
             self.item_index_map[item] = i
-        del self.dead_indices[:]
+        self._live_tree = None
 
     def sort(self):
         "sort() -> sort the contents of the set in-place"
@@ -411,12 +438,15 @@ class IndexedSet(MutableSet):
         self.item_list[:] = sorted_list
         for i, item in enumerate(self.item_list):
             self.item_index_map[item] = i
-        del self.dead_indices[:]
+        self._live_tree = None
 
     def index(self, val):
         "index(val) -> get the index of a value, raises if not present"
         try:
-            return self.item_index_map[val]
+            real_index = self.item_index_map[val]
         except KeyError:
             cn = self.__class__.__name__
             raise ValueError('%r is not in %s' % (val, cn))
+        if len(self.item_list) == len(self.item_index_map):
+            return real_index
+        return self._live_before(real_index)
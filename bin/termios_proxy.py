@@ -1,5 +1,8 @@
 # termios_proxy.py
+import os
 import sys
+import select
+from contextlib import contextmanager
 use_termios=True
 use_ansiterm=True
 
@@ -40,3 +43,135 @@ def getraw_kbd() -> str:
     if use_termios:
         return getraw_kbd_nix()
     return getraw_kbd_windows()
+
+
+def raw_mode(mode:list) -> list:
+    # Like tty.setraw(), but leaves output processing (OPOST) alone so that
+    # '\n' still returns the carriage while a menu is drawn in raw mode.
+    mode = list(mode)
+    mode[tty.IFLAG] &= ~(termios.BRKINT | termios.ICRNL | termios.INPCK | termios.ISTRIP | termios.IXON)
+    mode[tty.CFLAG] &= ~(termios.CSIZE | termios.PARENB)
+    mode[tty.CFLAG] |= termios.CS8
+    mode[tty.LFLAG] &= ~(termios.ECHO | termios.ICANON | termios.IEXTEN | termios.ISIG)
+    mode[tty.CC] = list(mode[tty.CC])
+    mode[tty.CC][termios.VMIN] = 1
+    mode[tty.CC][termios.VTIME] = 0
+    return mode
+
+class SpecialKey(str):
+    ''' A decoded multi-byte key such as an arrow.  It's a str holding the
+    escape sequence as received, with a .name like 'up' or 'pgdn'. '''
+    def __new__(cls, seq:str, name:str):
+        key = str.__new__(cls, seq)
+        key.name = name
+        return key
+
+    def __repr__(self) -> str:
+        return f"SpecialKey({self.name})"
+
+# CSI/SS3 final byte -> key name, for sequences like ESC [ A or ESC O A:
+csi_final_keys = {'A': 'up', 'B': 'down', 'C': 'right', 'D': 'left', 'H': 'home', 'F': 'end'}
+# ESC [ <n> ~ sequences:
+csi_tilde_keys = {'1': 'home', '2': 'insert', '3': 'delete', '4': 'end', '5': 'pgup', '6': 'pgdn', '7': 'home', '8': 'end'}
+# Windows getwch() returns '\x00' or '\xe0' followed by one of these:
+windows_scan_keys = {'H': 'up', 'P': 'down', 'K': 'left', 'M': 'right', 'G': 'home', 'O': 'end', 'I': 'pgup', 'Q': 'pgdn', 'R': 'insert', 'S': 'delete'}
+
+esc_timeout = 0.05  # Seconds to wait after ESC for the rest of a sequence
+
+
+class KeyDecoder(object):
+    ''' Iterate keys from a raw-mode fd.  Bytes are read with os.read() in
+    blocks, not one at a time through the text layer, and decoded as UTF-8.
+    After an ESC, select() waits briefly for more bytes: if none arrive it was
+    a bare Esc, otherwise a CSI/SS3 sequence is parsed into a SpecialKey. '''
+    def __init__(self, fd:int, timeout:float=None):
+        self.fd = fd
+        self.timeout = esc_timeout if timeout is None else timeout
+        self.buf = bytearray()
+
+    def fill(self, wait:bool=True) -> bool:
+        # Read whatever is available into buf.  If not 'wait', give up after
+        # self.timeout.  Returns False if nothing was read.
+        if not wait and not select.select([self.fd], [], [], self.timeout)[0]:
+            return False
+        data = os.read(self.fd, 64)
+        if not data:
+            raise EOFError
+        self.buf += data
+        return True
+
+    def take(self, n:int) -> str:
+        raw = bytes(self.buf[:n])
+        del self.buf[:n]
+        return raw.decode('utf-8', 'replace')
+
+    def escape(self) -> str:
+        # buf[0] is ESC.  Returns a SpecialKey or a bare '\x1b'
+        if len(self.buf) < 2 and not self.fill(wait=False):
+            return self.take(1)
+        if self.buf[1] not in b'[O':
+            return self.take(1)  # Alt+key or Esc typed before another key
+        n = 2
+        while True:
+            while n < len(self.buf):
+                b = self.buf[n]
+                if 0x40 <= b <= 0x7e:  # CSI final byte
+                    return self.special(self.take(n + 1))
+                if not 0x20 <= b <= 0x3f:  # Not a parameter/intermediate: junk
+                    return self.take(1)
+                n += 1
+            if not self.fill(wait=False):
+                return self.take(1)  # Incomplete: deliver what we have as keys
+
+    def special(self, seq:str) -> SpecialKey:
+        final = seq[-1]
+        if final == '~':
+            name = csi_tilde_keys.get(seq[2:-1].partition(';')[0])
+        else:
+            name = csi_final_keys.get(final)
+        return SpecialKey(seq, name or 'unknown')
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.buf:
+            self.fill()
+        if self.buf[0] == 0x1b:
+            return self.escape()
+        # Whole UTF-8 character: the lead byte tells us how long it is
+        lead = self.buf[0]
+        n = 1 if lead < 0xc0 else 2 if lead < 0xe0 else 3 if lead < 0xf0 else 4
+        while len(self.buf) < n:
+            self.fill()
+        return self.take(n)
+
+
+def decode_kbd_windows():
+    while True:
+        ch = msvcrt.getwch()
+        if ch in ('\x00', '\xe0'):
+            code = msvcrt.getwch()
+            yield SpecialKey(ch + code, windows_scan_keys.get(code, 'unknown'))
+        else:
+            yield ch
+
+@contextmanager
+def raw_kbd_session():
+    ''' Enter raw keyboard mode once for a whole interaction (e.g. a menu) and
+    yield an iterator of keys read in that mode.  The terminal settings are
+    restored on exit, including on Ctrl+C or any other exception.
+
+    Unlike next(getraw_kbd()) per key, this costs one tcgetattr/tcsetattr pair
+    per session instead of per keystroke, and doesn't flush typed-ahead keys.
+    Keys are single-char strs, or SpecialKey for arrows, paging keys etc. '''
+    if not use_termios:
+        yield decode_kbd_windows()
+        return
+    fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(fd)
+    try:
+        termios.tcsetattr(fd, termios.TCSANOW, raw_mode(old_settings))
+        yield KeyDecoder(fd)
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
@@ -20,6 +20,14 @@ kit_depends := \
 	bin/setutils.py \
 	bin/termios_proxy.py \
 	bin/navdex_core.py \
+	bin/navdex_store.py \
+	bin/navdex_shard.py \
+	bin/navdex_vector.py \
+	bin/navdex_stats.py \
+	bin/navdex_history.py \
+	bin/navdex_scan.py \
+	bin/navdex_gitindex.py \
+	bin/navdex_rank.py \
 	bin/navdex-completion.bash \
 
 
@@ -1,4 +1,5 @@
 """Tests for AutoContent class in navdex_core."""
+import threading
 import pytest
 
 import navdex_core
@@ -171,3 +172,211 @@ class TestAutoContent:
         
         # Should only parse first .DESC line (with leading space preserved)
         assert desc == " First description"
+
+
+class TestReadAutoMeta:
+    """Tests for readAutoMeta, the streaming .navdex-auto reader."""
+
+    @pytest.mark.parametrize("content", [
+        "# .TAGS: python testing\n# .DESC: Test project\n",
+        "# .DESC: First\n# .TAGS: a b\n# .TAGS: c\n# .DESC: Second\n",
+        "# Just a comment\n",
+        "",
+    ])
+    def test_agrees_with_auto_content(self, temp_dir, content):
+        """Test readAutoMeta gives the same tags/desc as AutoContent."""
+        auto_file = temp_dir / ".navdex-auto"
+        auto_file.write_text(content)
+
+        ac = navdex_core.AutoContent(str(auto_file))
+        assert navdex_core.readAutoMeta(str(temp_dir)) == (ac.tags(), ac.desc())
+
+    def test_missing_file(self, temp_dir):
+        """Test that a dir without .navdex-auto gives None."""
+        assert navdex_core.readAutoMeta(str(temp_dir)) is None
+
+
+class TestMetaCache:
+    """Tests for the .navdex-meta sidecar cache."""
+
+    def _make(self, temp_dir, n=3):
+        dirs = []
+        for i in range(n):
+            d = temp_dir / f"d{i}"
+            d.mkdir()
+            (d / ".navdex-auto").write_text(f"# .TAGS: t{i} common\n# .DESC: dir {i}\n")
+            dirs.append(str(d))
+        (temp_dir / ".navdex-index").write_text("".join(f"d{i} 1\n" for i in range(n)))
+        return navdex_core.IndexContent(str(temp_dir / ".navdex-index")), dirs
+
+    def test_refresh_and_persist(self, temp_dir):
+        """Test that metadata is cached in the sidecar file."""
+        ix, dirs = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        result = list(cache.refresh(dirs))
+        assert result[1] == (dirs[1], (["t1", "common"], " dir 1"))
+        cache.save()
+        assert (temp_dir / navdex_core.metaFileBase).exists()
+
+        cache2 = navdex_core.MetaCache(ix)
+        assert set(cache2) == set(dirs)
+
+    def test_cache_hit_skips_open(self, temp_dir, monkeypatch):
+        """Test that unchanged .navdex-auto files aren't re-read."""
+        ix, dirs = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        list(cache.refresh(dirs))
+        cache.save()
+
+        reads = []
+        real = navdex_core.readAutoMeta
+        monkeypatch.setattr(navdex_core, "readAutoMeta", lambda d: reads.append(d) or real(d))
+        cache = navdex_core.MetaCache(ix)
+        assert [m for _, m in cache.refresh(dirs)][2] == (["t2", "common"], " dir 2")
+        assert reads == []
+        assert cache.dirty is False
+
+    def test_changed_file_is_reread(self, temp_dir):
+        """Test that a size/mtime change invalidates the cached entry."""
+        ix, dirs = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        list(cache.refresh(dirs))
+        (temp_dir / "d0" / ".navdex-auto").write_text("# .TAGS: renamed tags here\n")
+        assert cache.lookup(dirs[0]) == (["renamed", "tags", "here"], "")
+
+    def test_removed_entries_dropped(self, temp_dir):
+        """Test that deleted .navdex-auto files and unindexed dirs are dropped."""
+        ix, dirs = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        list(cache.refresh(dirs))
+        (temp_dir / "d0" / ".navdex-auto").unlink()
+        assert dict(cache.refresh(dirs[:2])) == {dirs[0]: None, dirs[1]: (["t1", "common"], " dir 1")}
+        assert set(cache) == {dirs[1]}
+
+    def test_corrupt_sidecar_ignored(self, temp_dir):
+        """Test that an unreadable sidecar is treated as empty."""
+        ix, dirs = self._make(temp_dir)
+        (temp_dir / navdex_core.metaFileBase).write_text("{not json")
+        cache = navdex_core.MetaCache(ix)
+        assert len(cache) == 0
+        assert cache.lookup(dirs[0]) == (["t0", "common"], " dir 0")
+
+
+class TestTagIndex:
+    """Tests for the MetaCache inverted tag index and 'to -g tag:' queries."""
+
+    def _make(self, temp_dir):
+        layout = {"web": ("frontend api", 1), "svc": ("backend api", 1),
+                  "web/app": ("frontend api", 3), "docs": ("frontend", 1)}
+        for name, (tags, _) in layout.items():
+            d = temp_dir / name
+            d.mkdir(parents=True, exist_ok=True)
+            (d / ".navdex-auto").write_text(f"# .TAGS: {tags}\n")
+        (temp_dir / ".navdex-index").write_text(
+            "".join(f"{name} {pri}\n" for name, (_, pri) in layout.items()))
+        return navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+
+    def test_intersection(self, temp_dir):
+        """Test posting-list intersection across tags."""
+        ix = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        list(cache.refresh(ix.absPath(e[0]) for e in ix))
+        root = str(temp_dir)
+        assert cache.dirsWithTags(["frontend", "api"]) == {f"{root}/web", f"{root}/web/app"}
+        assert cache.dirsWithTags(["backend"]) == {f"{root}/svc"}
+        assert cache.dirsWithTags(["frontend", "nosuch"]) == set()
+        assert cache.dirsWithTags([]) == set()
+
+    def test_postings_follow_changes(self, temp_dir):
+        """Test that re-reading or dropping a dir updates the tag index."""
+        ix = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        list(cache.refresh(ix.absPath(e[0]) for e in ix))
+        svc = str(temp_dir / "svc")
+        (temp_dir / "svc" / ".navdex-auto").write_text("# .TAGS: frontend\n")
+        cache.lookup(svc)
+        assert svc in cache.dirsWithTags(["frontend"])
+        assert "backend" not in cache.tagIndex
+        del cache[svc]
+        assert svc not in cache.dirsWithTags(["frontend"])
+
+    def test_tag_query_ranked_without_filesystem(self, temp_dir, monkeypatch, capsys):
+        """Test 'to -g tag:...' ordering and that it doesn't re-read metadata."""
+        ix = self._make(temp_dir)
+        monkeypatch.chdir(temp_dir)
+        monkeypatch.setenv('PWD', str(temp_dir))
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+
+        # First query builds the sidecar:
+        assert navdex_core.printGrep("tag:frontend,api") is True
+        capsys.readouterr()
+
+        def no_fs(*args, **kwargs):
+            raise AssertionError("tag query touched the filesystem")
+        monkeypatch.setattr(navdex_core.MetaCache, "lookup", no_fs)
+        monkeypatch.setattr(navdex_core, "readAutoMeta", no_fs)
+        assert navdex_core.printGrep("tag:frontend,api") is True
+        lines = capsys.readouterr().out.lstrip("!").splitlines()
+        # web/app has priority 3 so it outranks the shorter web:
+        assert [line.split()[0] for line in lines] == [f"{temp_dir}/web/app", f"{temp_dir}/web"]
+        assert navdex_core.printGrep("tag:nosuch") is False
+
+    def _query(self, temp_dir, monkeypatch, capsys, pattern):
+        monkeypatch.chdir(temp_dir)
+        monkeypatch.setenv('PWD', str(temp_dir))
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+        navdex_core.printGrep(pattern)
+        return [line.split()[0] for line in capsys.readouterr().out.lstrip("!").splitlines()]
+
+    def test_tag_query_follows_index(self, temp_dir, monkeypatch, capsys):
+        """Test dirs added to the index after the sidecar was built are found."""
+        self._make(temp_dir)
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:backend") == [f"{temp_dir}/svc"]
+        (temp_dir / "db").mkdir()
+        (temp_dir / "db" / ".navdex-auto").write_text("# .TAGS: backend\n")
+        ix = navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+        ix.addDir("db", 1)
+        ix.write()
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:backend") == [f"{temp_dir}/db", f"{temp_dir}/svc"]
+
+    def test_tag_query_rechecks_hits(self, temp_dir, monkeypatch, capsys):
+        """Test edited or deleted .navdex-auto files don't answer with stale tags."""
+        self._make(temp_dir)
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:api") == [
+            f"{temp_dir}/web/app", f"{temp_dir}/web", f"{temp_dir}/svc"]
+        (temp_dir / "svc" / ".navdex-auto").write_text("# .TAGS: backend only\n")
+        (temp_dir / "web" / ".navdex-auto").unlink()
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:api") == [f"{temp_dir}/web/app"]
+        assert navdex_core.MetaCache(navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+                                     ).dirsWithTags(["api"]) == {f"{temp_dir}/web/app"}
+
+    def test_tag_query_finds_new_tags(self, temp_dir, monkeypatch, capsys):
+        """Test tags added to a dir which wasn't a hit, or to a new .navdex-auto, are found."""
+        self._make(temp_dir)
+        (temp_dir / "plain").mkdir()
+        with open(temp_dir / ".navdex-index", "a") as f:
+            f.write("plain 1\n")
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:api") == [
+            f"{temp_dir}/web/app", f"{temp_dir}/web", f"{temp_dir}/svc"]
+        (temp_dir / "docs" / ".navdex-auto").write_text("# .TAGS: frontend api\n")
+        (temp_dir / "plain" / ".navdex-auto").write_text("# .TAGS: api\n")
+        assert self._query(temp_dir, monkeypatch, capsys, "tag:api") == [
+            f"{temp_dir}/web/app", f"{temp_dir}/web", f"{temp_dir}/svc", f"{temp_dir}/docs", f"{temp_dir}/plain"]
+
+    def test_cache_changed_on_owner_thread(self, temp_dir, monkeypatch):
+        """Test pool threads only probe, and the cache is changed by the caller."""
+        ix = self._make(temp_dir)
+        cache = navdex_core.MetaCache(ix)
+        threads = set()
+        setitem = navdex_core.MetaCache.__setitem__
+
+        def recording(self, dir, cached):
+            threads.add(threading.current_thread())
+            setitem(self, dir, cached)
+        monkeypatch.setattr(navdex_core.MetaCache, "__setitem__", recording)
+        monkeypatch.setattr(navdex_core, "metaBatch", 1)
+        list(cache.refresh(ix.absPath(e[0]) for e in ix))
+        assert threads == {threading.current_thread()}
+        assert len(cache.dirsWithTags(["frontend"])) == 3
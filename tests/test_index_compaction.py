@@ -0,0 +1,88 @@
+"""Tests for canonicalizing and deduplicating the index chain (`to --compact`)."""
+import pytest
+
+import navdex_core
+from navdex_core import canonicalDir, compactEntries
+
+
+@pytest.fixture
+def chain(temp_dir, monkeypatch):
+    """ An outer index at HOME and an inner one in proj, with duplicates """
+    (temp_dir / "proj" / "src").mkdir(parents=True)
+    (temp_dir / ".navdex-index").write_text(
+        "# outer\nproj 2\nproj/src 3\n./docs 1\ndocs/ 2\n/abs/x 1\nproj/lib/ 1\n")
+    (temp_dir / "proj" / ".navdex-index").write_text(
+        f"# inner\nsrc 1\nlib 1\n{temp_dir}/proj/lib 2\n{temp_dir}/docs 1\n")
+    monkeypatch.setenv("HOME", str(temp_dir))
+    monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+    return temp_dir
+
+
+def _entries(path):
+    return list(navdex_core.IndexContent(str(path)))
+
+
+class TestCanonicalForm:
+    """Tests for canonical entry forms."""
+
+    @pytest.mark.parametrize("dir,canonical", [
+        ("src", "src"),
+        ("./src/", "src"),
+        ("a//b/../c", "a/c"),
+        ("/r/x/y", "x/y"),
+        ("//r/x", "x"),
+        ("/r", "/r"),
+        ("/rx/y", "/rx/y"),
+        ("../other", "/other"),
+        ("~/notes", "~/notes"),
+    ])
+    def test_canonical_dir(self, dir, canonical):
+        """Test normalizing, and relative below the root, absolute elsewhere."""
+        assert canonicalDir(dir, "/r") == canonical
+
+    def test_compact_entries(self):
+        """Test one entry per dir at its highest priority, less the shadowed."""
+        entries = [("b", 1), ("./b", 3), ("/r/b/", 2), ("a", 1), ("/r/c", 1)]
+        assert compactEntries(entries, "/r") == [("a", 1), ("b", 3), ("c", 1)]
+        assert compactEntries(entries, "/r", {"b"}) == [("a", 1), ("c", 1)]
+
+
+class TestCompactChain:
+    """Tests for compacting the indices from a dir up."""
+
+    def test_precedence(self, chain, capsys):
+        """Test in-index duplicates merge, and inner indices shadow outer entries below their root."""
+        navdex_core.compactChain(str(chain / "proj"))
+        assert _entries(chain / "proj" / ".navdex-index") == [
+            (str(chain / "docs"), 1), ("lib", 2), ("src", 3)]
+        # proj itself stays, as the way in to the inner index; docs isn't below proj
+        assert _entries(chain / ".navdex-index") == [("/abs/x", 1), ("docs", 2), ("proj", 2)]
+        err = capsys.readouterr().err
+        assert "Chain of 2 indices: 10 -> 6 dirs" in err
+
+    def test_idempotent(self, chain):
+        """Test a compacted chain isn't rewritten."""
+        navdex_core.compactChain(str(chain / "proj"))
+        mtimes = [(p / ".navdex-index").stat().st_mtime_ns for p in (chain, chain / "proj")]
+        navdex_core.compactChain(str(chain / "proj"))
+        assert mtimes == [(p / ".navdex-index").stat().st_mtime_ns for p in (chain, chain / "proj")]
+
+    def test_replayed_on_conflict(self, chain):
+        """Test compaction is replayed onto entries another writer added meanwhile."""
+        ix = navdex_core.IndexContent(str(chain / ".navdex-index"))
+        other = navdex_core.IndexContent(str(chain / ".navdex-index"))
+        assert ix.compact({"proj/src"})
+        other.addDir("./new/", 1)
+        other.write()
+        ix.write()
+        assert _entries(chain / ".navdex-index") == [
+            ("/abs/x", 1), ("docs", 2), ("new", 1), ("proj", 2), ("proj/lib", 1)]
+
+    def test_sharded(self, chain):
+        """Test compaction of a sharded index, where entries change shards."""
+        outer = navdex_core.IndexContent(str(chain / ".navdex-index"))
+        navdex_core.ShardedIndexContent.create(str(chain / ".navdex-index"), list(outer), 4)
+        navdex_core.compactChain(str(chain / "proj"))
+        ix = navdex_core.openIndex(str(chain / ".navdex-index"))
+        assert isinstance(ix, navdex_core.ShardedIndexContent)
+        assert sorted(ix) == [("/abs/x", 1), ("docs", 2), ("proj", 2)]
@@ -0,0 +1,158 @@
+"""Tests for concurrent writes to an index (locking and merging in navdex_core)."""
+import multiprocessing
+import os
+import pytest
+
+import navdex_core
+
+
+needs_flock = pytest.mark.skipif(not navdex_core.use_flock, reason="No fcntl.flock on this platform")
+
+
+def _add_many(index_path, worker, count):
+    # Each add is a separate read-modify-write, as with repeated `to -a`
+    for i in range(count):
+        ix = navdex_core.openIndex(index_path)
+        ix.addDir(f"w{worker}/d{i}", 1 + i % 3)
+        ix.write()
+
+
+def _read_many(index_path, count, queue):
+    torn = 0
+    for _ in range(count):
+        text = navdex_core.readIndexText(index_path)
+        if text and not text.endswith("\n"):
+            torn += 1
+        torn += sum(1 for line in text.splitlines() if not line.startswith("#") and len(line.split(" ")) != 2)
+    queue.put(torn)
+
+
+def _run(target, *args):
+    proc = multiprocessing.get_context("fork").Process(target=target, args=args)
+    proc.start()
+    return proc
+
+
+class TestMergeOnWrite:
+    """Tests for replaying changes onto an index written meanwhile."""
+
+    def test_both_adds_kept(self, test_index_file):
+        """Test two holders of the index each keep their add."""
+        a = navdex_core.IndexContent(str(test_index_file))
+        b = navdex_core.IndexContent(str(test_index_file))
+        a.addDir("new/a", 1)
+        b.addDir("new/b", 2)
+        a.write()
+        b.write()
+        ix = navdex_core.IndexContent(str(test_index_file))
+        assert ("new/a", 1) in ix and ("new/b", 2) in ix
+        assert len(ix) == 6
+
+    def test_del_and_add_kept(self, test_index_file):
+        """Test a delete and an unrelated add both survive."""
+        a = navdex_core.IndexContent(str(test_index_file))
+        b = navdex_core.IndexContent(str(test_index_file))
+        assert a.delDir("dir1")
+        b.addDir("new/b", 1)
+        a.write()
+        b.write()
+        ix = navdex_core.IndexContent(str(test_index_file))
+        assert ("dir1", 1) not in ix
+        assert ("new/b", 1) in ix
+
+    def test_same_add_twice(self, test_index_file):
+        """Test a replayed add which the other writer already made."""
+        a = navdex_core.IndexContent(str(test_index_file))
+        b = navdex_core.IndexContent(str(test_index_file))
+        a.addDir("new/a", 1)
+        b.addDir("new/a", 1)
+        a.write()
+        b.write()
+        assert len(navdex_core.IndexContent(str(test_index_file))) == 5
+
+    def test_unlogged_change_overwrites(self, test_index_file):
+        """Test changes made through the list interface still write as before."""
+        a = navdex_core.IndexContent(str(test_index_file))
+        b = navdex_core.IndexContent(str(test_index_file))
+        a.addDir("new/a", 1)
+        a.write()
+        del b[0]
+        assert b.journal is None
+        b.write()
+        assert ("new/a", 1) not in navdex_core.IndexContent(str(test_index_file))
+
+    def test_symlink_and_inode_kept(self, test_index_file, temp_dir):
+        """Test a merged write goes through a symlink into the same inode."""
+        link = temp_dir / "link-index"
+        link.symlink_to(test_index_file)
+        inode = os.stat(test_index_file).st_ino
+        a = navdex_core.IndexContent(str(link))
+        b = navdex_core.IndexContent(str(test_index_file))
+        b.addDir("new/b", 1)
+        b.write()
+        a.addDir("new/a", 1)
+        a.write()
+        assert link.is_symlink()
+        assert os.stat(test_index_file).st_ino == inode
+        ix = navdex_core.IndexContent(str(test_index_file))
+        assert ("new/a", 1) in ix and ("new/b", 1) in ix
+
+    def test_sharded_both_adds_kept(self, index_with_dirs):
+        """Test concurrent adds to the same shard and to other shards."""
+        test_dir, index_path = index_with_dirs
+        plain = navdex_core.IndexContent(str(index_path))
+        navdex_core.ShardedIndexContent.create(str(index_path), list(plain), 4)
+        a = navdex_core.openIndex(str(index_path))
+        b = navdex_core.openIndex(str(index_path))
+        a.addDir("work/client3", 1)
+        b.addDir("work/client4", 1)
+        b.addDir("other/place", 2)
+        a.write()
+        b.write()
+        ix = navdex_core.openIndex(str(index_path))
+        assert len(ix) == 10
+        assert {("work/client3", 1), ("work/client4", 1), ("other/place", 2)} <= set(ix)
+        assert ix.matchPaths(["*place*"]) and ix.matchPaths(["*client3*"])
+
+
+@needs_flock
+class TestConcurrentProcesses:
+    """Stress tests with several processes writing one index."""
+
+    WORKERS = 6
+    ADDS = 40
+
+    def test_no_lost_updates(self, test_index_file):
+        """Test every add of every process is in the index afterwards."""
+        procs = [_run(_add_many, str(test_index_file), w, self.ADDS) for w in range(self.WORKERS)]
+        for proc in procs:
+            proc.join(60)
+            assert proc.exitcode == 0
+        ix = navdex_core.IndexContent(str(test_index_file))
+        assert len(ix) == 4 + self.WORKERS * self.ADDS
+        for w in range(self.WORKERS):
+            for i in range(self.ADDS):
+                assert (f"w{w}/d{i}", 1 + i % 3) in ix
+
+    def test_no_lost_updates_sharded(self, index_with_dirs):
+        """Test the same for a sharded index."""
+        test_dir, index_path = index_with_dirs
+        plain = navdex_core.IndexContent(str(index_path))
+        navdex_core.ShardedIndexContent.create(str(index_path), list(plain), 4)
+        procs = [_run(_add_many, str(index_path), w, self.ADDS) for w in range(self.WORKERS)]
+        for proc in procs:
+            proc.join(60)
+            assert proc.exitcode == 0
+        ix = navdex_core.openIndex(str(index_path))
+        assert len(ix) == 7 + self.WORKERS * self.ADDS
+        assert len(set(ix)) == len(ix)
+
+    def test_readers_never_torn(self, test_index_file):
+        """Test readers only see whole indices while writers rewrite it."""
+        queue = multiprocessing.get_context("fork").Queue()
+        writers = [_run(_add_many, str(test_index_file), w, self.ADDS) for w in range(2)]
+        readers = [_run(_read_many, str(test_index_file), 200, queue) for _ in range(2)]
+        for proc in writers + readers:
+            proc.join(60)
+            assert proc.exitcode == 0
+        assert [queue.get(timeout=5) for _ in readers] == [0, 0]
@@ -0,0 +1,183 @@
+"""Tests for reading dirs from .git/index (navdex_gitindex) and `to --scan --git`."""
+import os
+import struct
+import pytest
+
+import navdex_core
+import navdex_gitindex
+from navdex_gitindex import parseIndex, trackedDirs
+from navdex_scan import TreeScanner
+
+FILE, GITLINK = 0o100644, 0o160000
+SKIP_WORKTREE = 0x4000
+
+
+def _varint(n):
+    out = [n & 0x7f]
+    n >>= 7
+    while n:
+        n -= 1
+        out.insert(0, 0x80 | (n & 0x7f))
+        n >>= 7
+    return bytes(out)
+
+
+def _index(entries, version=2, hashBytes=20, trailer=b""):
+    """ Bytes of an index file holding entries: paths, or (path, mode, extended flags) """
+    out = [struct.pack(">4sII", b"DIRC", version, len(entries))]
+    prev = b""
+    for entry in entries:
+        path, mode, extended = (entry, FILE, 0) if isinstance(entry, str) else entry
+        path = path.encode()
+        flags = min(len(path), 0xfff) | (0x4000 if extended else 0)
+        body = struct.pack(">10I", 0, 0, 0, 0, 0, 0, mode, 0, 0, 0) + b"\1" * hashBytes
+        body += struct.pack(">H", flags) + (struct.pack(">H", extended) if extended else b"")
+        if version == 4:
+            common = len(os.path.commonprefix([prev, path]))
+            body += _varint(len(prev) - common) + path[common:] + b"\0"
+        else:
+            body += path
+            body += b"\0" * (8 - len(body) % 8)
+        out.append(body)
+        prev = path
+    return b"".join(out) + trailer
+
+
+def _repo(root, entries, **kw):
+    (root / ".git").mkdir(parents=True)
+    (root / ".git" / "index").write_bytes(_index(entries, **kw))
+    return root
+
+
+PATHS = ["README", "docs/api/index.md", "docs/guide.md", "src/app/main.py",
+         "src/app/models/user.py", "src/lib/util.py", "src/lib/util_test.py"]
+DIRS = ["docs", "docs/api", "src", "src/app", "src/app/models", "src/lib"]
+
+
+class TestParseIndex:
+    """Tests for parsing index files."""
+
+    @pytest.mark.parametrize("version", [2, 3, 4])
+    def test_versions(self, version):
+        """Test paths and modes come back in order from each index version."""
+        entries = parseIndex(_index(PATHS, version=version))
+        assert [path.decode() for path, _, _ in entries] == PATHS
+        assert {mode for _, mode, _ in entries} == {FILE}
+
+    def test_extended_flags_and_long_paths(self):
+        """Test v3 extended flags, and paths too long for the 12-bit length."""
+        long = "/".join(["d" * 200] * 25) + "/f"
+        entries = [("a/x", FILE, 0x2000), long, ("z/y", FILE, SKIP_WORKTREE)]
+        for version in (3, 4):
+            assert parseIndex(_index(entries, version=version)) == [
+                (b"a/x", FILE, 0x2000), (long.encode(), FILE, 0), (b"z/y", FILE, SKIP_WORKTREE)]
+
+    def test_sha256(self, temp_dir):
+        """Test 32-byte hashes are used when the repo config says so."""
+        repo = _repo(temp_dir, PATHS, hashBytes=32)
+        (repo / ".git" / "config").write_text("[extensions]\n\tobjectFormat = sha256\n")
+        assert trackedDirs(str(repo)) == (DIRS, [], [])
+
+    @pytest.mark.parametrize("data", [
+        b"", b"DIRC\0\0\0\5\0\0\0\0", b"NOPE\0\0\0\2\0\0\0\0",
+        _index(PATHS)[:100], _index(PATHS, trailer=b"link" + b"\0" * 28),
+    ])
+    def test_unreadable(self, data):
+        """Test truncated, unknown and split indexes are rejected."""
+        with pytest.raises(ValueError):
+            parseIndex(data)
+
+
+class TestTrackedDirs:
+    """Tests for deriving dirs from index entries."""
+
+    def test_dirs(self, temp_dir):
+        """Test every dir holding a tracked path is listed once, sorted."""
+        assert trackedDirs(str(_repo(temp_dir, PATHS, version=4))) == (DIRS, [], [])
+
+    def test_submodules_and_sparse(self, temp_dir):
+        """Test submodules are dirs, and skip-worktree entries are left out."""
+        repo = _repo(temp_dir, ["a/f", ("lib/sub", GITLINK, 0), ("out/f", FILE, SKIP_WORKTREE),
+                                ("sparse/", 0o040000, SKIP_WORKTREE)], version=3)
+        assert trackedDirs(str(repo)) == (["a", "lib", "lib/sub"], ["lib/sub"], [])
+
+    def test_gitdir_file(self, temp_dir):
+        """Test a .git file (worktrees, submodules) is followed to the index."""
+        _repo(temp_dir / "store", PATHS)
+        (temp_dir / "wt").mkdir()
+        (temp_dir / "wt" / ".git").write_text("gitdir: ../store/.git\n")
+        assert trackedDirs(str(temp_dir / "wt")) == (DIRS, [], [])
+
+    def test_no_index(self, temp_dir):
+        """Test None without a checkout or a readable index."""
+        assert trackedDirs(str(temp_dir)) is None
+        (temp_dir / ".git").mkdir()
+        assert trackedDirs(str(temp_dir)) is None
+        assert navdex_gitindex.gitDir(str(temp_dir / "nowhere")) is None
+
+
+class TestScanGit:
+    """Tests for scanning with checkouts read from their index."""
+
+    @pytest.fixture
+    def tree(self, temp_dir):
+        # Tracked dirs needn't exist: finding them shows the checkout wasn't walked
+        _repo(temp_dir / "work" / "proj", PATHS + [".github/ci.yml", ("vendor/dep", GITLINK, 0)])
+        _repo(temp_dir / "work" / "proj" / "vendor" / "dep", ["pkg/mod.go"])
+        (temp_dir / "work" / "proj" / "untracked" / "x").mkdir(parents=True)
+        (temp_dir / "notes" / "2024").mkdir(parents=True)
+        return temp_dir
+
+    def _scan(self, root, **kw):
+        scanner = TreeScanner(str(root), gitIndex=True, **kw)
+        return sorted(os.path.relpath(p, root) for p in scanner.scan()), scanner
+
+    def test_checkouts_from_index(self, tree):
+        """Test checkouts and submodules come from their indexes, and the rest is walked."""
+        found, scanner = self._scan(tree)
+        assert found == ["notes", "notes/2024", "work", "work/proj"] + [
+            "work/proj/" + d for d in DIRS + ["vendor", "vendor/dep", "vendor/dep/pkg"]]
+        assert len(scanner.repos) == 2
+
+    def test_exclusions_apply(self, tree):
+        """Test depth, hidden dirs and ignore rules filter dirs from the index."""
+        (tree / "work" / "proj" / ".navdexignore").write_text("docs\n")
+        found, _ = self._scan(tree / "work", maxDepth=3, includeHidden=False)
+        assert found == ["proj", "proj/src", "proj/src/app", "proj/src/lib", "proj/vendor",
+                         "proj/vendor/dep"]
+
+    def test_nested_ignore_files(self, temp_dir):
+        """Test ignore files tracked within a checkout apply below their dirs, as in a walk."""
+        files = {".navdexignore": "build\n", "sub/.navdexignore": "skipme\n", "sub/skipme/f": "",
+                 "sub/keep/skipme/f": "", "sub/keep/f": "", "lib/.gitignore": "!build\n",
+                 "lib/build/f": "", "build/f": "", "other/skipme/f": ""}
+        repo = temp_dir / "repo"
+        for rel, text in files.items():
+            (repo / rel).parent.mkdir(parents=True, exist_ok=True)
+            (repo / rel).write_text(text)
+        _repo(repo, sorted(files))
+        assert trackedDirs(str(repo), (".gitignore", ".navdexignore"))[2] == [
+            ".navdexignore", "lib/.gitignore", "sub/.navdexignore"]
+        found, scanner = self._scan(temp_dir)
+        assert scanner.repos == [str(repo)]
+        walked = sorted(os.path.relpath(p, temp_dir) for p in TreeScanner(str(temp_dir)).scan())
+        assert found == walked == ["repo", "repo/lib", "repo/lib/build", "repo/other",
+                                   "repo/other/skipme", "repo/sub", "repo/sub/keep"]
+
+    def test_fallback_walk(self, tree):
+        """Test a checkout without a readable index is walked."""
+        (tree / "work" / "proj" / ".git" / "index").write_bytes(b"junk")
+        found, scanner = self._scan(tree / "work")
+        assert found == ["proj", "proj/untracked", "proj/untracked/x", "proj/vendor", "proj/vendor/dep",
+                         "proj/vendor/dep/pkg"]
+        assert scanner.repos == [str(tree / "work" / "proj" / "vendor" / "dep")]
+
+    def test_scan_into_index(self, tree, monkeypatch):
+        """Test `--scan --git` merges the index dirs relative to the index root."""
+        (tree / ".navdex-index").write_text("# index\n")
+        monkeypatch.chdir(tree)
+        monkeypatch.setenv("PWD", str(tree))
+        navdex_core.scanIntoIndex(str(tree / "work"), maxDepth=2, gitIndex=True)
+        ix = navdex_core.IndexContent(str(tree / ".navdex-index"))
+        assert sorted(ix) == [("work", 1), ("work/proj", 1), ("work/proj/docs", 1),
+                              ("work/proj/src", 1), ("work/proj/vendor", 1)]
@@ -0,0 +1,156 @@
+"""Tests for learning index entries from shell history (navdex_history)."""
+import json
+import pytest
+
+import navdex_core
+from navdex_history import HistoryParser, HistoryLearner, learnedPriority
+
+
+def _targets(lines, home="/home/u", cwd=None):
+    parser = HistoryParser(home, cwd)
+    return [t for line in lines for t in parser.targets(line)]
+
+
+class TestHistoryParser:
+    """Tests for extracting cd targets and following the cwd."""
+
+    def test_absolute_and_cdmark(self):
+        """Test absolute targets, including cdmark lines, are taken as they are."""
+        assert _targets(["cd /srv/www", "cd /opt/tools/bin # cdmark", "pushd /tmp/x/"]) == [
+            "/srv/www", "/opt/tools/bin", "/tmp/x"]
+
+    def test_relative_follow_cwd(self):
+        """Test relative targets resolve against the cwd followed so far."""
+        lines = ["cd src", "cd /work/proj", "cd src", "cd ../docs", "cd -", "cd"]
+        assert _targets(lines) == ["/work/proj", "/work/proj/src", "/work/proj/docs",
+                                   "/work/proj/src", "/home/u"]
+
+    def test_tilde_and_options(self):
+        """Test ~ expansion, and options before the target."""
+        assert _targets(["cd ~/notes", "builtin cd -P ~", "cd -- ~/a"]) == [
+            "/home/u/notes", "/home/u", "/home/u/a"]
+
+    def test_compound_commands(self):
+        """Test each command of a compound line is considered."""
+        assert _targets(["cd /a && make; cd b || cd /c", "ls | cd /d"]) == [
+            "/a", "/a/b", "/c", "/d"]
+
+    def test_unknown_cwd(self):
+        """Test relative targets are skipped until an absolute one is seen."""
+        assert _targets(["cd foo", "cd $PROJ", "cd bar", "pushd", "cd baz"], cwd="/x") == ["/x/foo"]
+
+    def test_to_commands(self):
+        """Test `to` patterns make the cwd unknown, and `to <path>` is a target."""
+        assert _targets(["cd /w", "to site", "cd rel", "to ~/proj", "to -a 2 .", "cd sub"]) == [
+            "/w", "/home/u/proj", "/home/u/proj/sub"]
+
+    def test_skips_noise(self):
+        """Test timestamps, other commands and broken quoting are skipped."""
+        assert _targets(["#1697000000", "ls -la", "echo 'unterminated", "", "vim cd"]) == []
+
+    def test_learned_priority(self):
+        """Test priorities grow with each doubling of the count."""
+        assert [learnedPriority(n) for n in (1, 2, 3, 4, 8, 100)] == [1, 2, 2, 3, 3, 3]
+
+
+class TestHistoryLearner:
+    """Tests for incremental reading of a history file."""
+
+    def test_incremental(self, temp_dir):
+        """Test a second run reads only the lines added since the first."""
+        hist = temp_dir / "hist"
+        hist.write_text("cd /a\ncd b\n")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "state"))
+        assert learner.read() == {"/a": 1, "/a/b": 1}
+        learner.save()
+
+        with open(hist, "a") as f:
+            f.write("cd c\ncd /a\ncd /partial")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "state"))
+        assert learner.read() == {"/a/b/c": 1, "/a": 2}
+        assert learner.lines == 2
+        learner.save()
+
+        with open(hist, "a") as f:
+            f.write("\n")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "state"))
+        assert learner.read() == {"/partial": 1}
+
+    def test_rewritten_file(self, temp_dir):
+        """Test a truncated or rewritten history is read from the start."""
+        hist = temp_dir / "hist"
+        hist.write_text("cd /a\ncd /b\ncd /c\n")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "state"))
+        learner.read()
+        learner.save()
+        hist.write_text("cd /c\ncd /d\n")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "state"))
+        assert learner.read() == {"/c": 1, "/d": 1}
+
+    def test_unwritable_state(self, temp_dir, caplog):
+        """Test failing to save the state is logged, not raised."""
+        hist = temp_dir / "hist"
+        hist.write_text("cd /a\n")
+        learner = HistoryLearner(str(hist), "/home/u", str(temp_dir / "missing" / "state"))
+        learner.read()
+        learner.save()
+        assert "Unable to write" in caplog.text
+
+
+class TestLearnHistory:
+    """Tests for merging learned dirs into the index."""
+
+    def test_merge_into_index(self, index_with_dirs, monkeypatch):
+        """Test existing dirs are merged by frequency, and missing ones are dropped."""
+        test_dir, index_path = index_with_dirs
+        (test_dir / "new" / "one").mkdir(parents=True)
+        hist = test_dir / "hist"
+        hist.write_text("\n".join([
+            f"cd {test_dir}/new/one", "cd ..", "cd one", "cd /nonexistent/dir",
+            f"cd {test_dir}/work/client2", "cd .", "cd .", "cd .", f"cd {test_dir}", ""]))
+        monkeypatch.setattr(navdex_core, "home_path", str(test_dir))
+        monkeypatch.chdir(test_dir)
+        monkeypatch.setenv("PWD", str(test_dir))
+        navdex_core.learnHistory(str(hist))
+
+        ix = navdex_core.IndexContent(str(index_path))
+        assert ("new/one", 2) in ix
+        assert ("new", 1) in ix
+        assert ("work/client2", 3) in ix  # Raised from 1 by 4 visits
+        assert ("projects/myproject", 3) in ix
+        assert not any(entry[0] in ("", "/nonexistent/dir") for entry in ix)
+        assert len(ix) == 9
+        # Only dirs which existed are counted on:
+        with open(test_dir / ".navdex-history-state") as f:
+            counts = json.load(f)[str(hist)]["counts"]
+        assert "/nonexistent/dir" not in counts and counts[f"{test_dir}/work/client2"] == 4
+
+        # Nothing new to learn: the index isn't rewritten
+        mtime = index_path.stat().st_mtime_ns
+        navdex_core.learnHistory(str(hist))
+        assert index_path.stat().st_mtime_ns == mtime
+
+    def test_merge_dirs_keeps_higher_priority(self, index_with_dirs):
+        """Test mergeDirs never lowers a priority, and is replayed on write."""
+        test_dir, index_path = index_with_dirs
+        ix = navdex_core.IndexContent(str(index_path))
+        other = navdex_core.IndexContent(str(index_path))
+        assert ix.mergeDirs([(str(test_dir / "projects/myproject"), 1), ("extra/dir", 2)]) == 1
+        other.addDir("other/dir", 1)
+        other.write()
+        ix.write()
+        ix = navdex_core.IndexContent(str(index_path))
+        assert ("projects/myproject", 3) in ix and ("extra/dir", 2) in ix and ("other/dir", 1) in ix
+        assert list(ix) == sorted(ix)
+
+    def test_merge_dirs_sharded(self, index_with_dirs):
+        """Test mergeDirs on a sharded index."""
+        test_dir, index_path = index_with_dirs
+        plain = navdex_core.IndexContent(str(index_path))
+        navdex_core.ShardedIndexContent.create(str(index_path), list(plain), 4)
+        ix = navdex_core.openIndex(str(index_path))
+        assert ix.mergeDirs([("work/client2", 2), ("work/client9", 1), ("zz/top", 1)]) == 3
+        ix.write()
+        ix = navdex_core.openIndex(str(index_path))
+        assert {("work/client2", 2), ("work/client9", 1), ("zz/top", 1)} <= set(ix)
+        assert len(ix) == 9
@@ -0,0 +1,195 @@
+"""Tests for the precomputed ranking order of index entries (navdex_rank)."""
+import os
+import random
+import pytest
+
+import navdex_core
+import navdex_rank
+from navdex_rank import rankKeys, rankOrder, readRank, writeRank
+
+
+def _write_index(path, count, seed=5):
+    rng = random.Random(seed)
+    words = ["src", "lib", "app", "docs", "test", "build", "core", "util", "web", "api"]
+    lines = set()
+    while len(lines) < count:
+        parts = [rng.choice(words) + str(rng.randrange(30)) for _ in range(rng.randint(1, 4))]
+        lines.add("%s %d" % ("/".join(parts), rng.randint(1, 3)))
+    lines.add("/opt/abs/src1 2")
+    path.write_text("# ranked\n" + "\n".join(sorted(lines)) + "\n")
+    return path
+
+
+@pytest.fixture
+def big_index(temp_dir):
+    return _write_index(temp_dir / ".navdex-index", 600)
+
+
+def _unranked(monkeypatch, path, patterns, **kw):
+    with monkeypatch.context() as m:
+        m.setattr(navdex_core, "rankMinEntries", 1 << 30)
+        return navdex_core.IndexContent(str(path)).matchPaths(patterns, **kw)
+
+
+class TestRankOrder:
+    """Tests for working out and persisting the order."""
+
+    def test_order_and_positions(self):
+        """Test keys sort with ties in index order, and positions invert the order."""
+        entries = [("bb", 1), ("a", 1), ("/r/c", 2), ("dd", 2), ("e", 0)]
+        keys = rankKeys(entries, 2, False)
+        order, positions = rankOrder(keys)
+        assert list(order) == [1, 3, 0, 2, 4]  # Keys 2, 1, 2, 1, inf
+        assert [positions[i] for i in order] == list(range(5))
+        assert rankKeys(entries, 2, True)[:3] == [5.0, 4.0, 2.0]
+
+    def test_sidecar_round_trip(self, big_index):
+        """Test the sidecar is read back, and ignored once the index changes."""
+        entries = list(navdex_core.IndexContent(str(big_index)))
+        local, full = writeRank(str(big_index), 10, entries)
+        assert (big_index.parent / navdex_rank.rankFileBase).exists()
+        read = readRank(str(big_index), 10, len(entries), True)
+        assert read.order == full.order and read.positions == full.positions
+        assert readRank(str(big_index), 10, len(entries), False).order == local.order
+        assert readRank(str(big_index), 11, len(entries), True) is None
+        with open(big_index, "a") as f:
+            f.write("new/dir 1\n")
+        assert readRank(str(big_index), 10, len(entries), True) is None
+
+
+class TestRankedMatches:
+    """Tests that ranked matching gives exactly the sorted results."""
+
+    @pytest.mark.parametrize("patterns", [["*src*"], ["*1*"], ["*a*"], ["*src*", "*1*"], ["nomatch"]])
+    @pytest.mark.parametrize("full", [False, True])
+    def test_same_as_sorted(self, big_index, monkeypatch, patterns, full):
+        """Test matches and their order are those of the sort-based path."""
+        ix = navdex_core.IndexContent(str(big_index))
+        assert ix.rankFor(full) is not None
+        assert ix.matchPaths(patterns, full) == _unranked(monkeypatch, big_index, patterns, fullDirname=full)
+
+    @pytest.mark.parametrize("limit", [1, 2, 5, 40])
+    def test_limit(self, big_index, monkeypatch, limit):
+        """Test a limit gives the top of the full ranking."""
+        expected = _unranked(monkeypatch, big_index, ["*a*"])
+        assert navdex_core.IndexContent(str(big_index)).matchPaths(["*a*"], limit=limit) == expected[:limit]
+
+    def test_mixed_rendering(self, big_index, monkeypatch):
+        """Test entries rendered absolute (not dirs from the cwd) still rank exactly."""
+        ix = navdex_core.IndexContent(str(big_index))
+        some = [path for path, _ in ix if path[0] != "/"][::7]
+        for path in some:
+            (big_index.parent / path).mkdir(parents=True, exist_ok=True)
+        monkeypatch.chdir(big_index.parent)
+        expected = _unranked(monkeypatch, big_index, ["*"])
+        assert any(p[0] == "/" for p, _ in expected) and any(p[0] != "/" for p, _ in expected)
+        assert ix.matchPaths(["*"]) == expected
+        for limit in (1, 3, 50):
+            assert navdex_core.IndexContent(str(big_index)).matchPaths(["*"], limit=limit) == expected[:limit]
+
+    def test_duplicate_renderings_tie_in_index_order(self, big_index, monkeypatch):
+        """Test a match rendered from two entries takes the lower one's place among ties."""
+        root = str(big_index.parent)
+        lines = big_index.read_text().splitlines()[1:] + [f"{root}/q 7", f"{root}/w 7", "q 7"]
+        big_index.write_text("# ranked\n" + "\n".join(sorted(lines)) + "\n")
+        expected = _unranked(monkeypatch, big_index, ["*"])
+        assert expected.index((f"{root}/q", 7)) + 1 == expected.index((f"{root}/w", 7))
+        for full in (False, True):
+            assert navdex_core.IndexContent(str(big_index)).matchPaths(["*"], full) == _unranked(
+                monkeypatch, big_index, ["*"], fullDirname=full)
+        for limit in (1, 10, len(expected)):
+            assert navdex_core.IndexContent(str(big_index)).matchPaths(["*"], limit=limit) == expected[:limit]
+
+    def test_non_positive_priorities(self, big_index, monkeypatch):
+        """Test limits are exact when priorities of 0 or below defeat the early stop."""
+        lines = big_index.read_text().splitlines()[1:]
+        lines = [line.rpartition(" ")[0] + (" -1" if i % 5 == 0 else " 0" if i % 7 == 0 else " " + line.rpartition(" ")[2])
+                 for i, line in enumerate(lines)]
+        big_index.write_text("# ranked\n" + "\n".join(sorted(lines)) + "\n")
+        ix = navdex_core.IndexContent(str(big_index))
+        assert ix.rankFor(True).monotone is False
+        for full in (False, True):
+            expected = _unranked(monkeypatch, big_index, ["*a*"], fullDirname=full)
+            for limit in (1, 5, 40, None):
+                assert navdex_core.IndexContent(str(big_index)).matchPaths(["*a*"], full, limit) == expected[:limit]
+        (big_index.parent / "sub").mkdir()
+        positive = navdex_core.IndexContent(str(_write_index(big_index.parent / "sub" / ".navdex-index", 300)))
+        assert positive.rankFor(False).monotone is True
+
+    def test_changed_index_unranked(self, big_index):
+        """Test an index changed in memory isn't matched by a stale order."""
+        ix = navdex_core.IndexContent(str(big_index))
+        ix.addDir("zzz/src99", 3)
+        assert ix.rankFor(False) is None
+        assert ix.matchPaths(["*src99*"]) == [(str(big_index.parent / "zzz/src99"), 3)]
+        ix.write()
+        assert ix.rankFor(False) is None
+        assert navdex_core.IndexContent(str(big_index)).rankFor(False) is not None
+
+    def test_small_index_unranked(self, test_index_file):
+        """Test small indices get no sidecar."""
+        ix = navdex_core.IndexContent(str(test_index_file))
+        assert ix.rankFor(False) is None
+        assert not os.path.exists(test_index_file.parent / navdex_rank.rankFileBase)
+
+
+@pytest.fixture
+def chain_of_three(temp_dir, monkeypatch):
+    """ Indices at temp_dir, temp_dir/a and temp_dir/a/b, sharing some dirs """
+    inner_dir = temp_dir / "a" / "b"
+    inner_dir.mkdir(parents=True)
+    _write_index(temp_dir / ".navdex-index", 600, seed=1)
+    _write_index(temp_dir / "a" / ".navdex-index", 300, seed=2)
+    _write_index(inner_dir / ".navdex-index", 700, seed=3)
+    with open(temp_dir / ".navdex-index", "a") as f:
+        f.write(f"{temp_dir}/a/b/src1 2\nsrc1 3\n")  # Matched again further out
+    monkeypatch.setenv("HOME", str(temp_dir))
+    monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+    return inner_dir
+
+
+def _union_sorted(xdir, patterns, fullDirname=False):
+    """ The chain's matches as the union of each index's, sorted """
+    ix = navdex_core.loadIndex(str(xdir), True)
+    ranked = list(ix.iterMatches(patterns, fullDirname))
+    outer = ix.outer
+    while outer is not None:
+        ranked.extend(outer.iterMatches(patterns, True))
+        outer = outer.outer
+    return sorted(navdex_core.IndexedSet(ranked), key=navdex_core.rankKey)
+
+
+class TestChainMerge:
+    """Tests for merging the matches of each index in a chain."""
+
+    @pytest.mark.parametrize("patterns", [["*src*"], ["*1*"], ["*src1"], ["*a*", "*2*"], ["nomatch"]])
+    def test_same_as_union(self, chain_of_three, patterns):
+        """Test the merge gives the sorted union, one of each match."""
+        ix = navdex_core.loadIndex(str(chain_of_three), True)
+        assert ix.outer is not None and ix.outer.outer is not None
+        merged = ix.matchPaths(patterns)
+        assert merged == _union_sorted(chain_of_three, patterns)
+        assert len(set(merged)) == len(merged)
+
+    @pytest.mark.parametrize("limit", [0, 1, 3, 25])
+    def test_limit(self, chain_of_three, limit):
+        """Test a limit gives the top of the merged ranking."""
+        ix = navdex_core.loadIndex(str(chain_of_three), True)
+        assert ix.matchPaths(["*a*"], limit=limit) == _union_sorted(chain_of_three, ["*a*"])[:limit]
+
+    def test_stops_early(self, chain_of_three, monkeypatch):
+        """Test the outer indices' streams are only read as far as needed."""
+        taken = []
+
+        def counting(stream):
+            for entry in stream:
+                taken.append(entry)
+                yield entry
+        iterMatches = navdex_core.IndexContent.iterMatches
+        monkeypatch.setattr(navdex_core.IndexContent, "iterMatches",
+                            lambda self, *a: counting(iterMatches(self, *a)))
+        ix = navdex_core.loadIndex(str(chain_of_three), True)
+        assert len(ix.matchPaths(["*"], limit=2)) == 2
+        # The two, the next of each stream, and /opt/abs/src1, in each index
+        assert len(taken) <= 2 + 3 + 3
+        assert len(ix.matchPaths(["*"])) > 1000
@@ -0,0 +1,124 @@
+"""Tests for the parallel tree crawler (navdex_scan) and `to --scan`."""
+import os
+import pytest
+
+import navdex_core
+import navdex_scan
+from navdex_scan import TreeScanner, compileIgnoreLine
+
+
+def _tree(root, dirs):
+    for d in dirs:
+        (root / d).mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _rel(root, found):
+    return sorted(os.path.relpath(p, root) for p in found)
+
+
+@pytest.fixture
+def tree(temp_dir):
+    return _tree(temp_dir / "repo", [
+        "src/app/models", "src/app/views", "src/lib",
+        "build/out", "node_modules/pkg/dist",
+        "docs/api", ".git/objects", ".cache/x",
+    ])
+
+
+class TestIgnoreLines:
+    """Tests for .gitignore pattern compilation."""
+
+    @pytest.mark.parametrize("line,path,matched", [
+        ("build", "build", True),
+        ("build", "src/build", True),
+        ("build/", "src/build", True),
+        ("/build", "src/build", False),
+        ("/build", "build", True),
+        ("src/*/views", "src/app/views", True),
+        ("src/*/views", "src/a/b/views", False),
+        ("**/dist", "node_modules/pkg/dist", True),
+        ("docs/**", "docs/api", True),
+        ("*.egg-info", "pkg.egg-info", True),
+        ("te?t", "test", True),
+        ("[bc]uild", "build", True),
+        ("[!b]uild", "build", False),
+    ])
+    def test_match(self, line, path, matched):
+        """Test gitignore-style matching of dir paths."""
+        rx, negate = compileIgnoreLine(line)
+        assert bool(rx.match(path)) == matched
+        assert not negate
+
+    def test_blank_comment_negate(self):
+        """Test blanks and comments are skipped, and '!' negates."""
+        assert compileIgnoreLine("\n") is None
+        assert compileIgnoreLine("# build\n") is None
+        assert compileIgnoreLine("!keep\n")[1] is True
+        assert compileIgnoreLine("\\#file\n")[0].match("#file")
+
+
+class TestTreeScanner:
+    """Tests for crawling a tree."""
+
+    def test_all_dirs(self, tree):
+        """Test every non-hidden dir is found, as os.walk would."""
+        expected = []
+        for r, dirs, _ in os.walk(tree):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            expected.extend(os.path.join(r, d) for d in dirs)
+        assert TreeScanner(str(tree)).scan() == sorted(expected)
+
+    def test_ignore_files(self, tree):
+        """Test .gitignore and .navdexignore rules, nested and negated."""
+        (tree / ".gitignore").write_text("build/\nnode_modules\n# comment\n")
+        (tree / "src" / ".navdexignore").write_text("app/*\n!app/views\n")
+        found = _rel(tree, TreeScanner(str(tree)).scan())
+        assert found == ["docs", "docs/api", "src", "src/app", "src/app/views", "src/lib"]
+
+    def test_depth_cap(self, tree):
+        """Test maxDepth limits how far below the root dirs are collected."""
+        assert _rel(tree, TreeScanner(str(tree), maxDepth=1).scan()) == [
+            "build", "docs", "node_modules", "src"]
+        assert len(TreeScanner(str(tree), maxDepth=2).scan()) == 9
+
+    def test_entry_cap(self, tree):
+        """Test maxEntries limits how many dirs are collected."""
+        scanner = TreeScanner(str(tree), maxEntries=3)
+        assert len(scanner.scan()) == 3
+        assert scanner.truncated
+
+    def test_hidden_and_symlinks(self, tree):
+        """Test hidden dirs are optional, and symlinked dirs aren't followed."""
+        os.symlink(tree / "src", tree / "docs" / "srclink")
+        found = _rel(tree, TreeScanner(str(tree), includeHidden=True).scan())
+        assert ".git/objects" in found and ".cache/x" in found
+        assert not any(p.startswith("docs/srclink") for p in found)
+
+    def test_mount_points_skipped(self, tree, monkeypatch):
+        """Test mount points of other filesystems are left out."""
+        monkeypatch.setattr(navdex_scan, "mountPoints", lambda: {str(tree / "build")})
+        found = _rel(tree, TreeScanner(str(tree)).scan())
+        assert "build" not in found and "build/out" not in found
+
+    def test_small_batches(self, tree, monkeypatch):
+        """Test the frontier handoff between tasks loses nothing."""
+        expected = TreeScanner(str(tree)).scan()
+        monkeypatch.setattr(navdex_scan, "taskBudget", 1)
+        assert TreeScanner(str(tree), workers=3).scan() == expected
+
+
+class TestScanIntoIndex:
+    """Tests for merging a scan into the index."""
+
+    def test_scan_into_index(self, tree, monkeypatch):
+        """Test the scan lands in the active index, relative to its root."""
+        (tree / ".navdex-index").write_text("# index\nsrc 3\n")
+        (tree / ".gitignore").write_text("node_modules\n")
+        monkeypatch.chdir(tree)
+        monkeypatch.setenv("PWD", str(tree))
+        navdex_core.scanIntoIndex(str(tree / "src"))
+        navdex_core.scanIntoIndex(str(tree), maxDepth=1)
+        ix = navdex_core.IndexContent(str(tree / ".navdex-index"))
+        assert sorted(ix) == [("build", 1), ("docs", 1), ("src", 3), ("src/app", 1),
+                              ("src/app/models", 1), ("src/app/views", 1), ("src/lib", 1)]
@@ -0,0 +1,217 @@
+"""Tests for sharded indices (navdex_shard and ShardedIndexContent)."""
+import os
+import pytest
+
+import navdex_core
+from navdex_shard import (BloomFilter, buildBloom, patternMayMatch, shardMayMatch,
+                          segmentGrams, shardId, readManifest, shardDirBase,
+                          readSummary, summaryFileBase)
+
+
+class TestBloomFilter:
+    """Tests for the Bloom filter and gram summaries."""
+
+    def test_no_false_negatives(self):
+        """Test every added key is reported present."""
+        bloom = BloomFilter.sized(500)
+        keys = [f"key{i}" for i in range(500)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        absent = sum(f"other{i}" in bloom for i in range(1000))
+        assert absent < 50
+
+    def test_json_roundtrip(self):
+        """Test a filter survives the manifest encoding."""
+        bloom = buildBloom(["projects/fishhead", "work/client1"])
+        again = BloomFilter.fromJson(bloom.toJson())
+        assert again.bits == bloom.bits
+        assert "fis" in again
+
+    def test_segment_grams(self):
+        """Test grams don't span segment boundaries."""
+        grams = segmentGrams("ab/cd")
+        assert {"a", "ab", "c", "cd"} <= grams
+        assert "b/c" not in grams and "bc" not in grams
+
+    def test_pattern_may_match(self):
+        """Test literal runs must be present for a pattern to pass."""
+        bloom = buildBloom(["projects/fishhead/common/jsvsa"])
+        assert patternMayMatch(bloom, "*jsvsa*")
+        assert patternMayMatch(bloom, "*fish*head*")
+        assert patternMayMatch(bloom, "*")
+        assert not patternMayMatch(bloom, "*client*")
+
+    def test_later_patterns_match_root(self):
+        """Test later patterns may be satisfied by the index root."""
+        bloom = buildBloom(["work/client1"])
+        root = "/home/tjoe/tree".split("/")
+        assert shardMayMatch(bloom, ["*client*", "*tree*"], root)
+        assert not shardMayMatch(bloom, ["*tree*"], root)
+        assert not shardMayMatch(bloom, ["*client*", "*nomatch*"], root)
+
+
+class TestShardedIndexContent:
+    """Tests for splitting an index into shards."""
+
+    def _shard(self, index_path, count=4):
+        plain = navdex_core.IndexContent(str(index_path))
+        navdex_core.ShardedIndexContent.create(str(index_path), list(plain), count)
+        return plain, navdex_core.openIndex(str(index_path))
+
+    def test_create_and_open(self, index_with_dirs):
+        """Test sharding keeps every entry, and the index file keeps its comments."""
+        test_dir, index_path = index_with_dirs
+        plain, ix = self._shard(index_path)
+        assert isinstance(ix, navdex_core.ShardedIndexContent)
+        assert len(ix) == len(plain)
+        assert ix.shards == {}  # len() came from the manifest
+        assert sorted(ix) == sorted(plain)
+        text = index_path.read_text()
+        assert text.startswith("# Test index with real dirs")
+        assert "projects/myproject" not in text
+
+    def test_same_top_level_same_shard(self, index_with_dirs):
+        """Test entries are split by their top-level component."""
+        test_dir, index_path = index_with_dirs
+        _, ix = self._shard(index_path, 16)
+        for entry in ix:
+            top = entry[0].split("/")[0]
+            assert ix.shardFor(entry[0]) == shardId(top, 16)
+
+    def test_match_reads_only_candidate_shards(self, index_with_dirs):
+        """Test matchPaths agrees with the plain index and skips ruled-out shards."""
+        test_dir, index_path = index_with_dirs
+        plain, ix = self._shard(index_path, 16)
+        for patterns in (["*client*"], ["*site*"], ["*o*"], ["*work*", "*site1*"]):
+            ix = navdex_core.openIndex(str(index_path))
+            assert sorted(ix.matchPaths(patterns)) == sorted(plain.matchPaths(patterns))
+        ix = navdex_core.openIndex(str(index_path))
+        ix.matchPaths(["*myproject*"])
+        assert set(ix.shards) == {ix.shardFor("projects")}
+
+    def test_same_order_as_plain(self, temp_dir):
+        """Test ties in rank come out in the same order sharded as unsharded."""
+        index_path = temp_dir / ".navdex-index"
+        tops = ["%s%d" % (c, n) for c in "kbxfa" for n in range(4)]
+        index_path.write_text("# ties\n" + "".join(
+            "%s/%s %d\n" % (top, leaf, pri) for top in sorted(tops) for leaf, pri in (("ab", 1), ("cd", 2))))
+        plain, ix = self._shard(index_path, 8)
+        assert list(ix) == list(plain)
+        for patterns in (["*"], ["*b*"], ["ab"], ["*1", "*"]):
+            for full in (False, True):
+                ix = navdex_core.openIndex(str(index_path))
+                assert ix.matchPaths(patterns, full) == plain.matchPaths(patterns, full)
+                assert ix.matchPaths(patterns, full, 3) == plain.matchPaths(patterns, full, 3)
+
+    def test_add_del_touch_one_shard(self, index_with_dirs):
+        """Test addDir/delDir read and rewrite only the shard concerned."""
+        test_dir, index_path = index_with_dirs
+        _, ix = self._shard(index_path, 16)
+        shard_dir = test_dir / shardDirBase
+        before = {p.name: p.stat().st_mtime_ns for p in shard_dir.glob("*.idx")}
+
+        assert ix.addDir(str(test_dir / "work/client3"), 2)
+        assert ix.delDir(str(test_dir / "work/client2"))
+        assert set(ix.shards) == {ix.shardFor("work")}
+        ix.write()
+
+        after = {p.name: p.stat().st_mtime_ns for p in shard_dir.glob("*.idx")}
+        changed = {name for name in after if after[name] != before.get(name)}
+        assert changed == {ix.shardFor("work") + ".idx"}
+
+        ix2 = navdex_core.openIndex(str(index_path))
+        assert ("work/client3", 2) in ix2
+        assert ("work/client2", 1) not in ix2
+        assert ix2.matchPaths(["*client3*"], True) == [(str(test_dir / "work/client3"), 2)]
+        assert readManifest(str(shard_dir))["shards"][ix.shardFor("work")]["entries"] == 3
+
+    def test_clean(self, index_with_dirs):
+        """Test clean() drops stale dirs across shards."""
+        test_dir, index_path = index_with_dirs
+        _, ix = self._shard(index_path)
+        ix.addDir("gone/away", 1)
+        ix.write()
+        ix = navdex_core.openIndex(str(index_path))
+        ix.clean()
+        ix = navdex_core.openIndex(str(index_path))
+        assert len(ix) == 7
+        assert ("gone/away", 1) not in ix
+
+    def test_unshard(self, index_with_dirs):
+        """Test merging shards back into a plain index."""
+        test_dir, index_path = index_with_dirs
+        plain, ix = self._shard(index_path)
+        back = ix.unshard()
+        assert not os.path.exists(test_dir / shardDirBase)
+        assert type(navdex_core.openIndex(str(index_path))) is navdex_core.IndexContent
+        assert sorted(back) == sorted(plain)
+        assert index_path.read_text().startswith("# Test index with real dirs")
+
+
+class TestIndexSummary:
+    """Tests for the .navdex-summary sidecar and chain skipping."""
+
+    def test_summary_stamp(self, index_with_dirs):
+        """Test a summary is only used while the index is unchanged."""
+        test_dir, index_path = index_with_dirs
+        assert readSummary(str(index_path)) is None
+        navdex_core.IndexContent(str(index_path)).updateSummary()
+        bloom = readSummary(str(index_path))
+        assert bloom is not None and "cli" in bloom
+        assert not navdex_core.indexMayMatch(str(index_path), ["*nomatch*"])
+        assert navdex_core.indexMayMatch(str(index_path), ["*site*"])
+
+        with open(index_path, "a") as f:
+            f.write("nomatch 1\n")
+        assert readSummary(str(index_path)) is None
+        assert navdex_core.indexMayMatch(str(index_path), ["*nomatch*"])
+
+    def test_sharded_index_uses_manifest(self, index_with_dirs):
+        """Test a sharded index is judged by its shard filters."""
+        test_dir, index_path = index_with_dirs
+        plain = navdex_core.IndexContent(str(index_path))
+        navdex_core.ShardedIndexContent.create(str(index_path), list(plain), 4)
+        assert navdex_core.indexMayMatch(str(index_path), ["*photos*"])
+        assert not navdex_core.indexMayMatch(str(index_path), ["*nomatch*"])
+
+    def test_chain_skips_outer(self, temp_dir, monkeypatch):
+        """Test loadIndex leaves out outer indices which can't match."""
+        (temp_dir / ".navdex-index").write_text("outer1 1\n")
+        inner_dir = temp_dir / "inner"
+        inner_dir.mkdir()
+        (inner_dir / ".navdex-index").write_text("inner1 1\n")
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+
+        # No summary yet: the outer index is parsed, and searching doesn't write one
+        ic = navdex_core.loadIndex(str(inner_dir), deep=True, patterns=["*zzz*"])
+        assert ic.outer is not None
+        assert not (temp_dir / summaryFileBase).exists()
+
+        # Writing the index does:
+        outer = navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+        outer.addDir("outer2", 1)
+        outer.write()
+        assert readSummary(str(temp_dir / ".navdex-index")) is not None
+        ic = navdex_core.loadIndex(str(inner_dir), deep=True, patterns=["*zzz*"])
+        assert ic.outer is None
+        ic = navdex_core.loadIndex(str(inner_dir), deep=True, patterns=["*outer*"])
+        assert ic.outer is not None and len(ic.outer) == 2
+
+    def test_read_only_dir_not_written(self, temp_dir, monkeypatch):
+        """Test a search leaves a stale summary alone, treating the index as a may-match."""
+        (temp_dir / ".navdex-index").write_text("outer1 1\n")
+        navdex_core.IndexContent(str(temp_dir / ".navdex-index")).updateSummary()
+        with open(temp_dir / ".navdex-index", "a") as f:
+            f.write("zzz 1\n")
+        inner_dir = temp_dir / "inner"
+        inner_dir.mkdir()
+        (inner_dir / ".navdex-index").write_text("inner1 1\n")
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+        writes = []
+        monkeypatch.setattr(navdex_core, "writeSummary", lambda *a: writes.append(a))
+        ic = navdex_core.loadIndex(str(inner_dir), deep=True, patterns=["*zzz*"])
+        assert ic.outer is not None and ic.matchPaths(["*zzz*"])
+        assert writes == []
@@ -0,0 +1,132 @@
+"""Tests for search latency telemetry (navdex_stats)."""
+import os
+import pytest
+
+import navdex_core
+import navdex_stats
+from navdex_stats import Invocation, appendRecord, readRecords, percentile, statsReport
+
+
+@pytest.fixture
+def stats_file(temp_dir, monkeypatch):
+    path = temp_dir / "stats"
+    monkeypatch.setenv(navdex_stats.statsFileKey, str(path))
+    return str(path)
+
+
+def _record(index="/home/u/.navdex-index", outcome="unique", load_us=100):
+    inv = Invocation(1, 1)
+    inv.note(index=index, chainSize=42)
+    inv.note(outcome=outcome, matches=3)
+    inv.phases[navdex_stats.phaseNames.index("load")] = load_us * 1000
+    return inv.pack()
+
+
+class TestRingBuffer:
+    """Tests for the record file."""
+
+    def test_roundtrip(self, stats_file):
+        """Test a record reads back as written."""
+        appendRecord(stats_file, _record(load_us=250))
+        [r] = readRecords(stats_file)
+        assert (r.mode, r.outcome, r.patterns, r.chainSize, r.matches) == (1, "unique", 1, 42, 3)
+        assert r.index == "/home/u/.navdex-index"
+        assert r.phases["load"] == 250
+        assert r.phases["menu"] == 0
+        assert r.phases["total"] > 0
+
+    def test_wraps_at_capacity(self, stats_file, monkeypatch):
+        """Test the oldest records are overwritten, and the file stays fixed-size."""
+        monkeypatch.setattr(navdex_stats, "ringCapacity", 8)
+        for i in range(20):
+            appendRecord(stats_file, _record(load_us=i + 1))
+        size = os.path.getsize(stats_file)
+        records = readRecords(stats_file)
+        assert [r.phases["load"] for r in records] == list(range(13, 21))
+        appendRecord(stats_file, _record(load_us=21))
+        assert os.path.getsize(stats_file) == size
+
+    def test_long_index_path_keeps_tail(self, stats_file):
+        """Test long index paths are cut from the front."""
+        long = "/x" * 100 + "/proj/.navdex-index"
+        appendRecord(stats_file, _record(index=long))
+        assert readRecords(stats_file)[0].index.endswith("/proj/.navdex-index")
+
+    def test_missing_or_foreign_file(self, temp_dir):
+        """Test unreadable files give no records."""
+        assert readRecords(str(temp_dir / "none")) == []
+        (temp_dir / "junk").write_bytes(b"not a stats file at all")
+        assert readRecords(str(temp_dir / "junk")) == []
+
+    def test_disabled(self, monkeypatch):
+        """Test an empty $NavdexStatsFile turns recording off."""
+        monkeypatch.setenv(navdex_stats.statsFileKey, "")
+        navdex_stats.begin(1, 1)
+        assert navdex_stats.current is None
+        with navdex_stats.phase("load"):
+            navdex_stats.note(outcome="menu")
+        navdex_stats.end()
+
+
+class TestReport:
+    """Tests for the `to --stats` summary."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile([7], 99) == 7
+        assert percentile([], 50) == 0
+
+    def test_report_per_phase_and_index(self, stats_file):
+        """Test the report has a phase table overall and for each index."""
+        for i in range(10):
+            appendRecord(stats_file, _record(index="/home/u/.navdex-index", load_us=1000 * (i + 1)))
+        appendRecord(stats_file, _record(index="/srv/w/.navdex-index", outcome="nomatch"))
+        lines = statsReport(readRecords(stats_file), "/home/u")
+        assert lines[0].startswith("11 searches since")
+        assert lines[1] == "Outcomes: unique 10, nomatch 1"
+        assert "~/.navdex-index  (10 searches, 42 dirs in chain)" in lines
+        assert "/srv/w/.navdex-index  (1 searches, 42 dirs in chain)" in lines
+        load = [line for line in lines if line.startswith("load")][0].split()
+        assert load[1:] == ["11", "5.00", "10.00", "10.00"]
+        assert not any(line.strip().startswith("menu") for line in lines)
+
+    def test_empty_report(self):
+        """Test the report with nothing recorded."""
+        assert statsReport([]) == ["No navdex stats recorded yet"]
+
+
+class TestResolveRecording:
+    """Tests for recording a search through resolvePatternToDir."""
+
+    def test_search_recorded(self, stats_file, index_with_dirs, monkeypatch):
+        """Test a unique match is recorded with its phases."""
+        test_dir, index_path = index_with_dirs
+        monkeypatch.chdir(test_dir)
+        monkeypatch.setenv("PWD", str(test_dir))
+        monkeypatch.setenv("HOME", str(test_dir))
+        navdex_stats.begin(navdex_core.ResolveMode.userio, 1)
+        res = navdex_core.resolvePatternToDir(["otherproj"])
+        navdex_stats.end()
+        assert res[1] == str(test_dir / "projects/otherproject")
+        [r] = readRecords(stats_file)
+        assert r.outcome == "unique"
+        assert r.matches == 1
+        assert r.index == str(index_path)
+        assert r.chainSize >= 7
+        assert r.phases["load"] > 0 and r.phases["match"] > 0 and r.phases["menu"] == 0
+        assert r.phases["total"] >= r.phases["load"] + r.phases["match"] - 2
+
+    def test_no_match_recorded(self, stats_file, index_with_dirs, monkeypatch):
+        """Test a search without matches is recorded as such."""
+        test_dir, index_path = index_with_dirs
+        monkeypatch.chdir(test_dir)
+        monkeypatch.setenv("PWD", str(test_dir))
+        monkeypatch.setenv("HOME", str(test_dir))
+        navdex_stats.begin(navdex_core.ResolveMode.userio, 1)
+        navdex_core.resolvePatternToDir(["zzznothing"])
+        navdex_stats.end()
+        assert readRecords(stats_file)[0].outcome == "nomatch"
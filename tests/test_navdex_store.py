@@ -0,0 +1,209 @@
+"""Tests for the IndexContent entry stores in navdex_store."""
+import fnmatch
+import pytest
+
+import navdex_core
+import navdex_store
+from navdex_store import (RadixPathStore, ListPathStore, ColumnarPathStore,
+                          openStore, globLiterals)
+
+
+SAMPLE = [
+    ("projects/fishhead/common/jsvsa/build/etc", 1),
+    ("projects/fishhead/common/jsvsa/src", 2),
+    ("projects/fishhead", 1),
+    ("/abs/path/dir", 3),
+    ("dir1/", 1),
+]
+
+
+class TestRadixPathStore:
+    """Tests for RadixPathStore."""
+
+    def test_roundtrip_order(self):
+        """Test that entries come back unchanged and in insertion order."""
+        s = RadixPathStore(SAMPLE)
+        assert len(s) == len(SAMPLE)
+        assert list(s) == SAMPLE
+        assert s[:] == SAMPLE
+        assert s[-1] == SAMPLE[-1]
+
+    def test_shared_prefix_nodes(self):
+        """Test that paths with a common prefix share tree nodes."""
+        s = RadixPathStore(SAMPLE[:3])
+        etc, src, fishhead = s.leaves
+        assert etc.parent.parent is src.parent
+        assert fishhead is src.parent.parent.parent
+
+    def test_insert_and_setitem(self):
+        """Test insert and replacing an entry."""
+        s = RadixPathStore(SAMPLE)
+        s.insert(1, ("a/b", 4))
+        assert s[1] == ("a/b", 4)
+        s[1] = ("a/c", 5)
+        assert s[1] == ("a/c", 5)
+        assert len(s) == len(SAMPLE) + 1
+
+    def test_delete_prunes_nodes(self):
+        """Test that deleting the last reference prunes unused nodes."""
+        s = RadixPathStore([("a/b/c", 1), ("x", 1)])
+        del s[0]
+        assert list(s) == [("x", 1)]
+        assert "a" not in s.root.children
+
+    def test_delete_slice(self):
+        """Test slice deletion as used by IndexContent.clean()."""
+        s = RadixPathStore(SAMPLE)
+        del s[:]
+        assert len(s) == 0
+        assert s.root.children is None
+
+    def test_contains(self):
+        """Test membership of (path, priority) tuples."""
+        s = RadixPathStore(SAMPLE)
+        assert ("projects/fishhead", 1) in s
+        assert ("projects/fishhead", 2) not in s
+        assert ("projects/fish", 1) not in s
+        assert "projects/fishhead" not in s
+
+    def test_index_error(self):
+        """Test out of range access."""
+        s = RadixPathStore(SAMPLE)
+        with pytest.raises(IndexError):
+            s[len(SAMPLE)]
+
+
+class TestColumnarPathStore:
+    """Tests for ColumnarPathStore."""
+
+    def test_roundtrip_order(self):
+        """Test that entries come back unchanged and in insertion order."""
+        s = ColumnarPathStore(SAMPLE)
+        assert len(s) == len(SAMPLE)
+        assert list(s) == SAMPLE
+        assert s[:] == SAMPLE
+        assert s[-1] == SAMPLE[-1]
+        assert s.offsets[-1] == len(s.blob)
+
+    def test_columns(self):
+        """Test the precomputed length and score columns."""
+        s = ColumnarPathStore([("abcd", 2), ("ab", 1)])
+        assert list(s.lengths) == [4, 2]
+        assert list(s.scores) == [2.0, 2.0]
+
+    def test_insert_delete_middle(self):
+        """Test that offsets stay consistent across middle inserts/deletes."""
+        s = ColumnarPathStore(SAMPLE)
+        ref = list(SAMPLE)
+        s.insert(2, ("caf\u00e9/x", 7))
+        ref.insert(2, ("caf\u00e9/x", 7))
+        del s[0]
+        del ref[0]
+        s[1] = ("y", 2)
+        ref[1] = ("y", 2)
+        assert list(s) == ref
+        assert [s[i] for i in range(len(s))] == ref
+        del s[:]
+        assert len(s) == 0 and s.blob == bytearray()
+
+    def test_contains(self):
+        """Test that membership needs a whole-entry match."""
+        s = ColumnarPathStore(SAMPLE)
+        assert ("projects/fishhead", 1) in s
+        assert ("fishhead", 1) not in s
+        assert ("common/jsvsa/src", 2) not in s
+        assert ("projects/fishhead/common/jsvsa/src", 2) in s
+
+    def test_candidates(self):
+        """Test the prefilter yields exactly the entries holding the literals."""
+        s = ColumnarPathStore(SAMPLE)
+        assert list(s.candidates("*jsvsa*")) == [0, 1]
+        assert list(s.candidates("*src*")) == [1]
+        assert list(s.candidates("*abs*dir*")) == [3]
+        assert list(s.candidates("*nomatch*")) == []
+        assert list(s.candidates("*")) == list(range(len(SAMPLE)))
+
+
+class TestGlobLiterals:
+    """Tests for the glob literal prefilter."""
+
+    @pytest.mark.parametrize("pattern,lits", [
+        ("*foo*", ["foo"]),
+        ("*foo*b?r", ["foo", "b", "r"]),
+        ("a[bc]d", ["a", "d"]),
+        ("a[!b]", ["a"]),
+        ("a[]]b", ["a", "b"]),
+        ("a[b", ["a[b"]),
+        ("*", []),
+    ])
+    def test_literals(self, pattern, lits):
+        """Test literal extraction."""
+        assert globLiterals(pattern) == lits
+
+    @pytest.mark.parametrize("kind", ["list", "radix", "columnar"])
+    def test_prefilter_never_drops_matches(self, kind):
+        """Test that every real fnmatch match is a candidate."""
+        s = openStore(kind)
+        s.extend(SAMPLE)
+        for pattern in ["*jsvsa*", "*j?vsa*", "*[se]tc*", "fish*", "*", "*a[b*"]:
+            cands = set(s.candidates(pattern))
+            for i, (path, _) in enumerate(SAMPLE):
+                if any(fnmatch.fnmatch(frag, pattern) for frag in path.split("/")):
+                    assert i in cands, (pattern, path)
+
+
+class TestOpenStore:
+    """Tests for store selection."""
+
+    def test_default_is_list(self, monkeypatch):
+        """Test default store kind."""
+        monkeypatch.delenv(navdex_store.navdexStoreKey, raising=False)
+        assert isinstance(openStore(), ListPathStore)
+
+    def test_env_selects_radix(self, monkeypatch):
+        """Test $NavdexStore selects the radix store."""
+        monkeypatch.setenv(navdex_store.navdexStoreKey, "radix")
+        assert isinstance(openStore(), RadixPathStore)
+
+    def test_unknown_kind(self):
+        """Test unknown kinds fall back to the list store."""
+        assert isinstance(openStore("bogus"), ListPathStore)
+
+
+class TestIndexContentStores:
+    """Tests for IndexContent behaviour over each store kind."""
+
+    @pytest.mark.parametrize("kind", ["list", "radix", "columnar"])
+    def test_index_content_over_store(self, index_with_dirs, kind):
+        """Test that parsing, paths and matching agree for every store."""
+        test_dir, index_path = index_with_dirs
+        ic = navdex_core.IndexContent(str(index_path), store=kind)
+        ref = navdex_core.IndexContent(str(index_path), store="list")
+
+        assert list(ic) == list(ref)
+        assert ic.absPath(ic[0][0]) == ref.absPath(ref[0][0])
+        assert ic.relativePath(str(test_dir / "work")) == "work"
+        assert ic.matchPaths(["*client*"]) == ref.matchPaths(["*client*"])
+
+    @pytest.mark.parametrize("kind", ["list", "radix", "columnar"])
+    def test_add_del_write(self, index_with_dirs, kind):
+        """Test addDir/delDir/write for every store."""
+        test_dir, index_path = index_with_dirs
+        ic = navdex_core.IndexContent(str(index_path), store=kind)
+        assert ic.addDir(str(test_dir / "personal/new"), 2)
+        assert ic.delDir("work/client2")
+        ic.write()
+
+        ic2 = navdex_core.IndexContent(str(index_path), store=kind)
+        assert ("personal/new", 2) in ic2
+        assert ("work/client2", 1) not in ic2
+
+    @pytest.mark.parametrize("kind", ["list", "radix", "columnar"])
+    def test_clean(self, index_with_dirs, kind):
+        """Test clean() through the list-like adapter for every store."""
+        test_dir, index_path = index_with_dirs
+        ic = navdex_core.IndexContent(str(index_path), store=kind)
+        ic.append(("nonexistent/dir", 1))
+        ic.clean()
+        assert ("nonexistent/dir", 1) not in ic
+        assert len(ic) == 7
@@ -0,0 +1,126 @@
+"""Tests for the optional NumPy matching backend (navdex_vector)."""
+import pytest
+
+import navdex_core
+import navdex_vector
+from navdex_vector import simplePattern
+
+
+PATHS = [
+    "projects/fishhead/common/jsvsa/build/etc",
+    "projects/fishhead/common/jsvsa/src",
+    "projects/fishhead",
+    "/abs/path/dir",
+    "café/crème",
+    "work/client1/site1",
+    "work/client1/site2",
+    "work/client2",
+    "src",
+    "a/src/b",
+]
+
+
+def _write_index(temp_dir, paths=PATHS):
+    index_path = temp_dir / ".navdex-index"
+    index_path.write_text("".join(f"{p} {1 + i % 3}\n" for i, p in enumerate(paths)), encoding="utf-8")
+    return str(index_path)
+
+
+class TestSimplePattern:
+    """Tests for recognising the patterns the backend evaluates."""
+
+    @pytest.mark.parametrize("pattern,expected", [
+        ("*foo*", ("foo", False, False)),
+        ("foo*", ("foo", True, False)),
+        ("*foo", ("foo", False, True)),
+        ("foo", ("foo", True, True)),
+        ("*", ("", False, False)),
+        ("*f?o*", None),
+        ("*f[ab]o*", None),
+        ("*a*b*", None),
+        ("", None),
+    ])
+    def test_forms(self, pattern, expected):
+        """Test which patterns are simple, and their anchors."""
+        assert simplePattern(pattern) == expected
+
+
+@pytest.mark.skipif(navdex_vector.numpy is None, reason="NumPy is not installed")
+class TestVectorPaths:
+    """Tests for vectorised matching against the fnmatch loop."""
+
+    @pytest.fixture(autouse=True)
+    def always_vector(self, monkeypatch):
+        monkeypatch.setattr(navdex_vector, "vectorMinEntries", 0)
+
+    @pytest.mark.parametrize("pattern", ["*jsvsa*", "src", "src*", "*rc", "*site*", "*\u00e8m*",
+                                         "cr\u00e8me", "*", "fish*", "*nomatch*", "*ab*", "*o*",
+                                         "*etc", "*projects/fish*"])
+    def test_same_matches_as_loop(self, temp_dir, monkeypatch, pattern):
+        """Test vector results equal the pure-Python results, in the same order."""
+        path = _write_index(temp_dir)
+        ix = navdex_core.IndexContent(path, store="columnar")
+        vec = ix.matchPaths([pattern], True)
+        monkeypatch.setattr(navdex_vector, "numpy", None)
+        ref = ix.matchPaths([pattern], True)
+        assert vec == ref
+
+    @pytest.mark.parametrize("patterns", [["*ab*"], ["ab"], ["*ab"], ["ab*"], ["*ab*", "*"]])
+    @pytest.mark.parametrize("full", [False, True])
+    def test_ties_in_index_order(self, temp_dir, monkeypatch, patterns, full):
+        """Test absolute and relative entries tied once rendered rank as in the loop."""
+        extra = len(str(temp_dir)) + 1
+        paths = []
+        for n in range(1, 6):
+            paths += ["ab" + "c" * n, "/" + "y" * (extra + n) + "/ab", "/" + "z" * (extra + n + 1) + "ab",
+                      "q" * n + "/ab"]
+        index_path = temp_dir / ".navdex-index"
+        index_path.write_text("".join(f"{p} 2\n" for p in sorted(paths)))
+        ix = navdex_core.IndexContent(str(index_path), store="columnar")
+        vec = ix.matchPaths(patterns, full)
+        monkeypatch.setattr(navdex_vector, "numpy", None)
+        assert vec == ix.matchPaths(patterns, full)
+
+    def test_used_for_columnar_only(self, temp_dir):
+        """Test other stores are left to the pure-Python path."""
+        path = _write_index(temp_dir)
+        assert navdex_core.IndexContent(path, store="columnar").vectorMatches("*src*") is not None
+        assert navdex_core.IndexContent(path, store="list").vectorMatches("*src*") is None
+
+    def test_views_released(self, temp_dir):
+        """Test the store can still grow after a search."""
+        ix = navdex_core.IndexContent(_write_index(temp_dir), store="columnar")
+        assert len(ix.vectorMatches("*src*")) == 3
+        ix.addDir(str(temp_dir / "newdir"), 1)
+        assert ix.matchPaths(["*newdir*"], True) == [(str(temp_dir / "newdir"), 1)]
+
+    def test_later_patterns_still_apply(self, temp_dir):
+        """Test patterns after the first go through the fnmatch loop."""
+        ix = navdex_core.IndexContent(_write_index(temp_dir), store="columnar")
+        assert ix.matchPaths(["*client*", "site?"], True) == [
+            (str(temp_dir / "work/client1/site1"), 3),
+            (str(temp_dir / "work/client1/site2"), 1),
+        ]
+
+    def test_complex_pattern_falls_back(self, temp_dir):
+        """Test non-simple patterns are left to the pure-Python path."""
+        ix = navdex_core.IndexContent(_write_index(temp_dir), store="columnar")
+        assert ix.vectorMatches("*s?te*") is None
+        assert len(ix.matchPaths(["*s?te*"])) == 2
+
+
+class TestFallback:
+    """Tests for running without NumPy."""
+
+    def test_without_numpy(self, temp_dir, monkeypatch):
+        """Test matching works, through the pure-Python path, without NumPy."""
+        monkeypatch.setattr(navdex_vector, "numpy", None)
+        monkeypatch.setattr(navdex_vector, "vectorMinEntries", 0)
+        ix = navdex_core.IndexContent(_write_index(temp_dir), store="columnar")
+        assert ix.vectorMatches("*src*") is None
+        assert len(ix.matchPaths(["*src*"])) == 3
+
+    def test_small_index_skips_backend(self, temp_dir):
+        """Test small indices don't use the backend."""
+        ix = navdex_core.IndexContent(_write_index(temp_dir), store="columnar")
+        assert ix.vectorMatches("*src*") is None
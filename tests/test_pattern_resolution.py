@@ -355,3 +355,229 @@ class TestPrintGrep:
             assert "Test directory" in captured.out
         finally:
             navdex_core.file_sys_root = orig_root
+
+    def test_print_grep_matches_tags(self, temp_dir, monkeypatch, capsys):
+        """Test that the pattern is matched against .navdex-auto tags too."""
+        for name, tags in (("alpha", "frontend"), ("beta", "backend"), ("gamma", None)):
+            (temp_dir / name).mkdir()
+            if tags:
+                (temp_dir / name / ".navdex-auto").write_text(f"# .TAGS: {tags}\n")
+        (temp_dir / ".navdex-index").write_text("alpha 1\nbeta 1\ngamma 1\n")
+
+        monkeypatch.chdir(temp_dir)
+        monkeypatch.setenv('PWD', str(temp_dir))
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+
+        assert navdex_core.printGrep("front") is True
+        out = capsys.readouterr().out
+        assert out.startswith("!")
+        assert "alpha [.TAGS: frontend]" in out
+        assert "beta" not in out and "gamma" not in out
+
+    def test_print_grep_bad_regex(self, index_with_dirs, monkeypatch, capsys):
+        """Test that an invalid regex is reported once rather than per line."""
+        test_dir, index_path = index_with_dirs
+        monkeypatch.chdir(test_dir)
+        monkeypatch.setenv('PWD', str(test_dir))
+        monkeypatch.setenv('HOME', str(test_dir))
+        monkeypatch.setattr(navdex_core, "file_sys_root", "/")
+
+        assert navdex_core.printGrep("proj[") is False
+        captured = capsys.readouterr()
+        assert "Bad regular expression" in captured.err
+        assert captured.out == ""
+
+
+class TestOrderedParallelMap:
+    """Tests for orderedParallelMap."""
+
+    def test_order_preserved(self):
+        """Test results come back in input order despite uneven work."""
+        import time
+
+        def slow(i):
+            time.sleep(0.001 * (i % 3))
+            return i * i
+
+        result = list(navdex_core.orderedParallelMap(slow, range(50), workers=4, window=8))
+        assert result == [i * i for i in range(50)]
+
+    def test_lazy_input(self):
+        """Test that input is consumed lazily, at most a window ahead."""
+        consumed = []
+
+        def items():
+            for i in range(1000):
+                consumed.append(i)
+                yield i
+
+        it = navdex_core.orderedParallelMap(lambda i: i, items(), workers=2, window=4)
+        assert next(it) == 0
+        assert len(consumed) <= 5
+        it.close()
+
+
+class TestPromptMenu:
+    """Tests for the interactive menu, driven by a scripted key session."""
+
+    @pytest.fixture
+    def scripted_keys(self, monkeypatch):
+        """Replace the raw terminal session with a scripted key sequence."""
+        from contextlib import contextmanager
+        sessions = []
+
+        def script(keys):
+            @contextmanager
+            def session():
+                sessions.append(keys)
+                yield iter(keys)
+            monkeypatch.setattr(navdex_core, "raw_kbd_session", session)
+            return sessions
+        return script
+
+    def _index(self, temp_dir, n):
+        names = [f"proj{i:02d}" for i in range(n)]
+        for name in names:
+            (temp_dir / name).mkdir()
+        (temp_dir / ".navdex-index").write_text("".join(f"{name} 1\n" for name in names))
+        ix = navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+        return ix, ix.matchPaths(["*proj*"], True)
+
+    def test_single_session_for_menu(self, temp_dir, scripted_keys):
+        """Test the menu reads every key from one raw session."""
+        ix, mx = self._index(temp_dir, 12)
+        sessions = scripted_keys(["x", "\x1b", "1", "1"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj11")
+        assert len(sessions) == 1
+
+    def test_ctrl_c(self, temp_dir, scripted_keys):
+        """Test Ctrl+C in the menu cancels."""
+        ix, mx = self._index(temp_dir, 3)
+        scripted_keys(["\x03"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice == "!echo Ctrl+C"
+
+    def test_arrow_navigation(self, temp_dir, scripted_keys):
+        """Test arrow/paging keys move the selection and Enter picks it."""
+        from termios_proxy import SpecialKey
+        down, up = SpecialKey("\x1b[B", "down"), SpecialKey("\x1b[A", "up")
+        pgdn, end = SpecialKey("\x1b[6~", "pgdn"), SpecialKey("\x1b[F", "end")
+        ix, mx = self._index(temp_dir, 12)
+
+        scripted_keys([down, down, down, up, "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj02")
+
+        scripted_keys([pgdn, pgdn, "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj11")
+
+        scripted_keys([end, up, "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj10")
+
+    def _named_index(self, temp_dir, names):
+        for name in names:
+            (temp_dir / name).mkdir()
+        (temp_dir / ".navdex-index").write_text("".join(f"{name} 1\n" for name in names))
+        ix = navdex_core.IndexContent(str(temp_dir / ".navdex-index"))
+        return ix, ix.matchPaths(["*"], True)
+
+    def test_type_to_filter_unique(self, temp_dir, scripted_keys):
+        """Test letters narrow the candidates and a unique match is selected."""
+        ix, mx = self._named_index(temp_dir, ["alpha", "alpine", "beta", "gamma"])
+        scripted_keys(["a", "l", "p", "h"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("alpha")
+
+    def test_type_to_filter_renumbers(self, temp_dir, scripted_keys):
+        """Test numbers select from the narrowed set, not the original one."""
+        ix, mx = self._named_index(temp_dir, ["alpha", "alpine", "beta", "gamma"])
+        scripted_keys(["p", "1", "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("alpine")
+
+    def test_type_to_filter_backspace(self, temp_dir, scripted_keys):
+        """Test Backspace widens the filter again, and dead-end letters are ignored."""
+        ix, mx = self._named_index(temp_dir, ["alpha", "alpine", "beta", "gamma"])
+        scripted_keys(["p", "z", "\x7f", "\x7f", "2", "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("gamma")
+
+    def test_type_to_filter_keeps_commands(self, temp_dir, scripted_keys):
+        """Test 'q' still quits while a filter is active."""
+        ix, mx = self._named_index(temp_dir, ["alpha", "alpine", "beta"])
+        scripted_keys(["a", "q"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice == "!echo Ctrl+C"
+
+    def test_viewport_page(self, temp_dir, scripted_keys, monkeypatch, capsys):
+        """Test only one page is drawn, and PgDn moves a whole page."""
+        from termios_proxy import SpecialKey
+        monkeypatch.setenv("LINES", "8")
+        monkeypatch.setenv("COLUMNS", "80")
+        ix, mx = self._index(temp_dir, 40)
+        scripted_keys([SpecialKey("\x1b[6~", "pgdn"), "\r"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj05")
+        err = capsys.readouterr().err
+        assert "proj04" in err and "proj39" not in err
+        assert "[1-5 of 40" in err
+
+    def test_view_draw_is_page_sized(self, monkeypatch, capsys):
+        """Test drawing a huge menu formats a page, not every entry."""
+        monkeypatch.setenv("LINES", "13")
+        dx = navdex_core.menu_dict([(f"dir{i}", 1, f"/x/dir{i}") for i in range(100000)])
+        view = navdex_core.MenuView()
+        view.draw(dx)
+        assert len(view.rows) == 10
+        view.follow("99999")
+        view.draw(dx)
+        assert view.top == 99990
+        assert "dir99999" in view.rows[-1]
+        assert navdex_core.entry_count(dx) == 100000
+
+    def test_hint_labels_select(self, temp_dir, scripted_keys, monkeypatch):
+        """Test $NavdexHintKeys labels select entries, and digits still work."""
+        monkeypatch.setenv(navdex_core.navdexHintKeysKey, "asdf")
+        ix, mx = self._index(temp_dir, 12)
+        hints = navdex_core.HintLabels(12, "asdf")
+
+        scripted_keys(list(hints.labels[11]))
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj11")
+
+        scripted_keys(["1", "0"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice.endswith("proj10")
+
+        scripted_keys(["q"])
+        _, choice = navdex_core.promptMatchingEntry(mx, ix)
+        assert choice == "!echo Ctrl+C"
+
+
+class TestHintLabels:
+    """Tests for the menu's prefix-free hint labels."""
+
+    @pytest.mark.parametrize("count", [1, 4, 5, 9, 12, 16, 40])
+    def test_prefix_free_and_short(self, count):
+        """Test labels are unique, at most two keys, and prefix-free."""
+        hints = navdex_core.HintLabels(count, "asdf")
+        labels = hints.labels
+        assert len(labels) == min(count, 16)
+        assert len(set(labels)) == len(labels)
+        assert all(1 <= len(label) <= 2 for label in labels)
+        for label in labels:
+            assert not any(other != label and other.startswith(label) for other in labels)
+        assert all(hints.lookup[label] == n for n, label in enumerate(labels))
+
+    def test_short_labels_go_first(self):
+        """Test the best ranked entries get the one-key labels."""
+        labels = navdex_core.HintLabels(5, "asdf").labels
+        assert labels == ["a", "s", "d", "fa", "fs"]
+
+    def test_alphabet_excludes_command_keys(self):
+        """Test command keys, digits and repeats are dropped from the alphabet."""
+        assert navdex_core.hint_alphabet("aq\\/1 sa") == "as"
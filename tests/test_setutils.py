@@ -1,4 +1,5 @@
 """Tests for setutils.IndexedSet class."""
+import random
 import pytest
 from setutils import IndexedSet
 
@@ -327,6 +328,64 @@ class TestIndexedSetOrdering:
         assert result == [4, 3, 2, 1]
 
 
+class TestIndexedSetAfterDeletions:
+    """Tests for positional access once items have been removed."""
+
+    def _check(self, s, model):
+        assert list(s) == model
+        assert len(s) == len(model)
+        for i in (0, len(model) // 3, len(model) - 1, -1, -len(model)):
+            if model:
+                assert s[i] == model[i]
+        for item in model[::7]:
+            assert s.index(item) == model.index(item)
+        for sl in (slice(3, 40), slice(None, None, 3), slice(-5, None),
+                   slice(30, 2, -2), slice(None, None, -1), slice(8, 8)):
+            assert list(s[sl]) == model[sl]
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_random_deletes(self, seed):
+        """Test indexing, index(), pop(i) and slicing against a list."""
+        rng = random.Random(seed)
+        s = IndexedSet(range(300))
+        model = list(range(300))
+        for step in range(400):
+            op = rng.random()
+            if op < 0.4 and model:
+                i = rng.randrange(-len(model), len(model))
+                assert s.pop(i) == model.pop(i)
+            elif op < 0.7 and model:
+                item = rng.choice(model)
+                s.remove(item)
+                model.remove(item)
+            else:
+                item = rng.randrange(1000)
+                s.add(item)
+                if item not in model:
+                    model.append(item)
+            if step % 20 == 0:
+                self._check(s, model)
+        self._check(s, model)
+
+    def test_adjacent_gaps(self):
+        """Test gaps which run together, removed out of order."""
+        s = IndexedSet(range(100))
+        for item in (10, 12, 14, 11, 13, 9, 15):
+            s.remove(item)
+        model = [i for i in range(100) if not 9 <= i <= 15]
+        self._check(s, model)
+        assert s.index(50) == 43
+
+    def test_pop_out_of_range(self):
+        """Test pop and indexing past the end raise IndexError with gaps."""
+        s = IndexedSet(range(20))
+        s.remove(5)
+        with pytest.raises(IndexError):
+            s.pop(19)
+        with pytest.raises(IndexError):
+            _ = s[-20]
+
+
 class TestIndexedSetComparison:
     """Tests for comparison operations."""
     
@@ -1,6 +1,7 @@
 """Tests for termios_proxy module."""
 import pytest
 from unittest.mock import patch, MagicMock
+import os
 import sys
 
 # Import the module under test
@@ -94,3 +95,102 @@ class TestGetrawKbd:
         
         result = termios_proxy.getraw_kbd()
         mock_windows.assert_called_once()
+
+
+@pytest.mark.skipif(not termios_proxy.use_termios, reason="termios not available")
+class TestRawKbdSession:
+    """Tests for raw_kbd_session, the persistent raw-mode context manager."""
+
+    @pytest.fixture
+    def fake_tty(self, monkeypatch):
+        calls = []
+        settings = [0, 0, 0, 0, 0, 0, [b'\x00'] * 32]
+        monkeypatch.setattr(termios_proxy.termios, 'tcgetattr',
+                            lambda fd: calls.append('get') or list(settings))
+        monkeypatch.setattr(termios_proxy.termios, 'tcsetattr',
+                            lambda fd, when, mode: calls.append(('set', when, mode)))
+        rfd, wfd = os.pipe()
+        os.write(wfd, b'abc')
+        stdin = MagicMock()
+        stdin.fileno.return_value = rfd
+        monkeypatch.setattr(sys, 'stdin', stdin)
+        yield calls, settings
+        os.close(rfd)
+        os.close(wfd)
+
+    def test_one_mode_switch_per_session(self, fake_tty):
+        """Test raw mode is entered once for many keys, then restored."""
+        calls, settings = fake_tty
+        with termios_proxy.raw_kbd_session() as keys:
+            assert [next(keys) for _ in range(3)] == ['a', 'b', 'c']
+        assert calls[0] == 'get'
+        assert len(calls) == 3
+        assert calls[1][1] == termios_proxy.termios.TCSANOW
+        assert calls[2] == ('set', termios_proxy.termios.TCSADRAIN, settings)
+
+    def test_restored_on_interrupt(self, fake_tty):
+        """Test the terminal is restored when Ctrl+C escapes the session."""
+        calls, settings = fake_tty
+        with pytest.raises(KeyboardInterrupt):
+            with termios_proxy.raw_kbd_session() as keys:
+                next(keys)
+                raise KeyboardInterrupt
+        assert calls[-1] == ('set', termios_proxy.termios.TCSADRAIN, settings)
+
+    def test_raw_mode_keeps_output_processing(self):
+        """Test raw_mode disables echo/canonical input but not OPOST."""
+        mode = [0, termios_proxy.termios.OPOST, 0,
+                termios_proxy.termios.ECHO | termios_proxy.termios.ICANON, 0, 0,
+                [b'\x00'] * 32]
+        raw = termios_proxy.raw_mode(mode)
+        assert raw[1] & termios_proxy.termios.OPOST
+        assert not raw[3] & (termios_proxy.termios.ECHO | termios_proxy.termios.ICANON)
+        assert raw[6][termios_proxy.termios.VMIN] == 1
+
+
+@pytest.mark.skipif(not termios_proxy.use_termios, reason="termios not available")
+class TestKeyDecoder:
+    """Tests for KeyDecoder, the buffered raw key reader."""
+
+    @pytest.fixture
+    def pipe(self):
+        rfd, wfd = os.pipe()
+        yield rfd, wfd
+        os.close(rfd)
+        os.close(wfd)
+
+    def keys(self, pipe, data, count):
+        rfd, wfd = pipe
+        os.write(wfd, data)
+        decoder = termios_proxy.KeyDecoder(rfd, timeout=0.01)
+        return [next(decoder) for _ in range(count)]
+
+    def test_plain_and_utf8(self, pipe):
+        """Test plain ASCII and multi-byte UTF-8 characters."""
+        assert self.keys(pipe, "a1\u00e9\u20ac".encode(), 4) == ['a', '1', '\u00e9', '\u20ac']
+
+    @pytest.mark.parametrize("seq,name", [
+        (b'\x1b[A', 'up'), (b'\x1b[B', 'down'), (b'\x1bOC', 'right'), (b'\x1b[D', 'left'),
+        (b'\x1b[5~', 'pgup'), (b'\x1b[6~', 'pgdn'), (b'\x1b[H', 'home'), (b'\x1b[4~', 'end'),
+        (b'\x1b[1;5A', 'up'), (b'\x1b[99~', 'unknown'),
+    ])
+    def test_special_keys(self, pipe, seq, name):
+        """Test CSI/SS3 sequences decode to named SpecialKeys."""
+        key, after = self.keys(pipe, seq + b'x', 2)
+        assert isinstance(key, termios_proxy.SpecialKey)
+        assert key.name == name
+        assert key == seq.decode()
+        assert after == 'x'
+
+    def test_bare_escape(self, pipe):
+        """Test a lone ESC is delivered as Esc once the timeout expires."""
+        assert self.keys(pipe, b'\x1b', 1) == ['\x1b']
+
+    def test_escape_then_key(self, pipe):
+        """Test ESC followed by an ordinary key isn't swallowed."""
+        assert self.keys(pipe, b'\x1bq', 2) == ['\x1b', 'q']
+
+    def test_sequences_in_one_read(self, pipe):
+        """Test several keys arriving in a single read are all decoded."""
+        keys = self.keys(pipe, b'\x1b[B\x1b[B2\r', 4)
+        assert [getattr(k, 'name', k) for k in keys] == ['down', 'down', '2', '\r']